@@ -0,0 +1,196 @@
+"""
+Аналитика для супер админа: показатели мастеров, спрос по часам и дням недели,
+время проверки завершений кураторами.
+
+Каждый раздел - один запрос с GROUP BY или условными агрегатами по Order и
+OrderCompletion за период; готовый результат хранится в кэше
+ANALYTICS_CACHE_SECONDS секунд, поэтому дашборд за год не пересчитывается на
+каждое открытие.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .db_router import read_from_replica
+from .middleware import role_required
+from .models import CustomUser, Order, OrderCompletion
+
+ANALYTICS_MAX_DAYS = 366
+COMPLETED_STATUSES = ['завершен']
+
+# Корзины гистограммы времени проверки: (подпись, верхняя граница)
+APPROVAL_LATENCY_BUCKETS = [
+    ('<1h', timedelta(hours=1)),
+    ('1-4h', timedelta(hours=4)),
+    ('4-12h', timedelta(hours=12)),
+    ('12-24h', timedelta(days=1)),
+    ('1-3d', timedelta(days=3)),
+    ('>3d', None),
+]
+
+
+def _duration(end, start):
+    return ExpressionWrapper(F(end) - F(start), output_field=DurationField())
+
+
+def _hours(value):
+    return round(value.total_seconds() / 3600, 2) if value is not None else None
+
+
+def period_bounds(date_from, date_to):
+    """Границы периода [date_from 00:00, date_to + 1 день) в текущем часовом поясе"""
+    start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()))
+    return start, timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+
+def master_performance(date_from, date_to):
+    """
+    Показатели мастеров по заказам, созданным за период: доля завершённых,
+    средний чек, среднее время от создания до начала работы и до отправки
+    завершения на проверку (часы).
+    """
+    start, end = period_bounds(date_from, date_to)
+    completed = Q(status__in=COMPLETED_STATUSES)
+    rows = (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end, assigned_master__isnull=False)
+        .values('assigned_master_id')
+        .annotate(
+            total_orders=Count('id'),
+            completed_orders=Count('id', filter=completed),
+            average_check=Avg('final_cost', filter=completed & Q(final_cost__isnull=False)),
+            time_to_start=Avg(_duration('started_at', 'created_at'), filter=Q(started_at__isnull=False)),
+            time_to_complete=Avg(_duration('completion__created_at', 'created_at')),
+        )
+        .order_by('assigned_master_id')
+    )
+    rows = list(rows)
+    emails = dict(CustomUser.objects.filter(
+        id__in=[row['assigned_master_id'] for row in rows]
+    ).values_list('id', 'email'))
+    return [
+        {
+            'master_id': row['assigned_master_id'],
+            'master_email': emails.get(row['assigned_master_id']),
+            'total_orders': row['total_orders'],
+            'completed_orders': row['completed_orders'],
+            'completion_rate': round(row['completed_orders'] / row['total_orders'] * 100, 2),
+            'average_check': float(row['average_check']) if row['average_check'] is not None else None,
+            'avg_hours_to_start': _hours(row['time_to_start']),
+            'avg_hours_to_complete': _hours(row['time_to_complete']),
+        }
+        for row in rows
+    ]
+
+
+def demand_heatmap(date_from, date_to):
+    """Число заказов по дню недели (1 - понедельник) и часу создания: матрица 7 x 24"""
+    start, end = period_bounds(date_from, date_to)
+    matrix = [[0] * 24 for _ in range(7)]
+    for weekday, hour, count in (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(weekday=ExtractIsoWeekDay('created_at'), hour=ExtractHour('created_at'))
+        .values('weekday', 'hour')
+        .annotate(count=Count('id'))
+        .values_list('weekday', 'hour', 'count')
+    ):
+        matrix[weekday - 1][hour] = count
+    return {
+        'matrix': matrix,
+        'by_weekday': [sum(row) for row in matrix],
+        'by_hour': [sum(row[hour] for row in matrix) for hour in range(24)],
+    }
+
+
+def approval_latency(date_from, date_to):
+    """Гистограмма времени от отправки завершения до решения куратора (проверенные за период)"""
+    start, end = period_bounds(date_from, date_to)
+    latency = _duration('review_date', 'created_at')
+    aggregates, lower = {}, None
+    for index, (_, upper) in enumerate(APPROVAL_LATENCY_BUCKETS):
+        condition = Q()
+        if lower is not None:
+            condition &= Q(latency__gte=lower)
+        if upper is not None:
+            condition &= Q(latency__lt=upper)
+        aggregates[f'bucket_{index}'] = Count('id', filter=condition)
+        lower = upper
+    totals = (
+        OrderCompletion.objects.filter(review_date__gte=start, review_date__lt=end)
+        .annotate(latency=latency)
+        .aggregate(
+            total=Count('id'),
+            approved=Count('id', filter=Q(status='одобрен')),
+            average=Avg('latency'),
+            **aggregates,
+        )
+    )
+    return {
+        'total_reviewed': totals['total'],
+        'approved': totals['approved'],
+        'avg_hours': _hours(totals['average']),
+        'histogram': [
+            {'bucket': label, 'count': totals[f'bucket_{index}']}
+            for index, (label, _) in enumerate(APPROVAL_LATENCY_BUCKETS)
+        ],
+    }
+
+
+ANALYTICS_SECTIONS = {
+    'masters': master_performance,
+    'demand': demand_heatmap,
+    'approval_latency': approval_latency,
+}
+
+
+def cached_section(name, date_from, date_to):
+    """Раздел аналитики из кэша или посчитанный заново"""
+    key = f'analytics:{name}:{date_from}:{date_to}'
+    result = cache.get(key)
+    if result is None:
+        result = ANALYTICS_SECTIONS[name](date_from, date_to)
+        cache.set(key, result, getattr(settings, 'ANALYTICS_CACHE_SECONDS', 300))
+    return result
+
+
+@api_view(['GET'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@role_required(['super-admin'])
+@read_from_replica
+def get_analytics_dashboard(request):
+    """
+    Аналитика за период ?from=YYYY-MM-DD&to=YYYY-MM-DD (по умолчанию - последние 30 дней).
+    ?sections=masters,demand,approval_latency - только нужные разделы.
+    """
+    try:
+        date_to = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') \
+            else timezone.localdate()
+        date_from = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') \
+            else date_to - timedelta(days=29)
+    except ValueError:
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if date_to < date_from or (date_to - date_from).days >= ANALYTICS_MAX_DAYS:
+        return Response({'error': f'Period must be from 1 to {ANALYTICS_MAX_DAYS} days'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    sections = request.GET.get('sections')
+    sections = sections.split(',') if sections else list(ANALYTICS_SECTIONS)
+    unknown = set(sections) - set(ANALYTICS_SECTIONS)
+    if unknown:
+        return Response({'error': f'Unknown sections: {", ".join(sorted(unknown))}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'from': date_from,
+        'to': date_to,
+        **{name: cached_section(name, date_from, date_to) for name in sections},
+    })
@@ -1,6 +1,9 @@
-from django.apps import AppConfig
-
-
-class Api1Config(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api1'
+from django.apps import AppConfig
+
+
+class Api1Config(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api1'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
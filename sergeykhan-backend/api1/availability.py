@@ -0,0 +1,195 @@
+"""
+Индекс доступности мастеров.
+
+Доступность мастера на дату определяется так:
+1. есть строки MasterAvailability на эту дату - это переопределение дня, берутся они;
+2. иначе есть AvailabilityException - выходной, доступности нет;
+3. иначе слоты еженедельного шаблона AvailabilityTemplate для этого дня недели.
+
+Шаблоны разворачиваются в памяти для запрошенного диапазона дат и не пишутся в
+базу. Любой диапазон обходится тремя запросами независимо от его длины.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.db.models import Max, Q
+
+from .models import AvailabilityException, AvailabilityTemplate, MasterAvailability
+
+
+# Сколько дней вперёд показывать развёрнутые шаблоны, если конец диапазона не задан
+DEFAULT_HORIZON_DAYS = 28
+
+# availability_id и created_at - id и время создания строки MasterAvailability, для слотов из шаблона None
+Slot = namedtuple('Slot', ['master_id', 'date', 'start_time', 'end_time', 'availability_id', 'created_at'],
+                  defaults=(None,))
+
+
+def _ids(masters):
+    if masters is None:
+        return None
+    return [getattr(master, 'pk', master) for master in masters]
+
+
+def template_slot_times(template):
+    """Интервалы (start, end) одного дня шаблона, нарезанные по slot_duration"""
+    day = datetime(2000, 1, 1)
+    current = datetime.combine(day, template.start_time)
+    end = datetime.combine(day, template.end_time)
+    times = []
+    while current + template.slot_duration <= end:
+        times.append((current.time(), (current + template.slot_duration).time()))
+        current += template.slot_duration
+    return times
+
+
+def _date_range(date_from, date_to):
+    day = date_from
+    while day <= date_to:
+        yield day
+        day += timedelta(days=1)
+
+
+def load_templates(masters, date_from, date_to):
+    """{master_id: [(weekday, valid_from, valid_until, [(start, end), ...]), ...]}"""
+    queryset = AvailabilityTemplate.objects.filter(
+        Q(valid_from__isnull=True) | Q(valid_from__lte=date_to),
+        Q(valid_until__isnull=True) | Q(valid_until__gte=date_from),
+    )
+    master_ids = _ids(masters)
+    if master_ids is not None:
+        queryset = queryset.filter(master_id__in=master_ids)
+
+    templates = {}
+    for template in queryset:
+        templates.setdefault(template.master_id, []).append(
+            (template.weekday, template.valid_from, template.valid_until, template_slot_times(template))
+        )
+    return templates
+
+
+def expand_templates(templates, day):
+    """Слоты шаблонов мастера на дату: [(start, end), ...] по возрастанию"""
+    weekday = day.weekday()
+    times = set()
+    for template_weekday, valid_from, valid_until, slot_times in templates:
+        if template_weekday != weekday:
+            continue
+        if (valid_from and day < valid_from) or (valid_until and day > valid_until):
+            continue
+        times.update(slot_times)
+    return sorted(times)
+
+
+def get_availability(masters, date_from, date_to=None):
+    """
+    Доступность мастеров на даты [date_from, date_to].
+
+    masters - мастера или их id; None - все мастера. Возвращает
+    {(master_id, date): [Slot, ...]} по возрастанию времени, дни без
+    доступности в словарь не попадают.
+    """
+    date_to = date_to or date_from
+    master_ids = _ids(masters)
+
+    overrides = MasterAvailability.objects.filter(date__gte=date_from, date__lte=date_to)
+    exceptions = AvailabilityException.objects.filter(date__gte=date_from, date__lte=date_to)
+    if master_ids is not None:
+        overrides = overrides.filter(master_id__in=master_ids)
+        exceptions = exceptions.filter(master_id__in=master_ids)
+
+    result = {}
+    for slot_id, master_id, day, start_time, end_time, created_at in overrides.values_list(
+        'id', 'master_id', 'date', 'start_time', 'end_time', 'created_at'
+    ):
+        result.setdefault((master_id, day), []).append(Slot(master_id, day, start_time, end_time, slot_id, created_at))
+    for slots in result.values():
+        slots.sort(key=lambda slot: slot.start_time)
+
+    days_off = set(exceptions.values_list('master_id', 'date'))
+    for master_id, templates in load_templates(master_ids, date_from, date_to).items():
+        for day in _date_range(date_from, date_to):
+            key = (master_id, day)
+            if key in result or key in days_off:
+                continue
+            slots = [Slot(master_id, day, start, end, None) for start, end in expand_templates(templates, day)]
+            if slots:
+                result[key] = slots
+    return result
+
+
+def get_master_slots(master, date_from, date_to=None):
+    """Доступные слоты одного мастера за период, по дате и времени"""
+    availability = get_availability([master], date_from, date_to)
+    return [slot for key in sorted(availability) for slot in availability[key]]
+
+
+def last_override_date(master, date_from):
+    """
+    Последняя дата с конкретными слотами мастера начиная с date_from (или None).
+    master=None - по всем мастерам.
+    """
+    overrides = MasterAvailability.objects.filter(date__gte=date_from)
+    if master is not None:
+        overrides = overrides.filter(master=master)
+    return overrides.aggregate(last=Max('date'))['last']
+
+
+def default_range_end(master, date_from):
+    """Конец диапазона по умолчанию: горизонт шаблонов или последний конкретный слот"""
+    horizon_end = date_from + timedelta(days=DEFAULT_HORIZON_DAYS - 1)
+    last_override = last_override_date(master, date_from)
+    return max(horizon_end, last_override or horizon_end)
+
+
+def first_free_slots(availability, bookings):
+    """
+    Первый свободный слот каждого мастера.
+
+    availability - результат get_availability, bookings - {master_id: [(date, time), ...]}
+    занятых моментов. Слот свободен, если ни один заказ не начинается в
+    [start_time, end_time). Слоты и заказы мастера обходятся одним проходом
+    двумя указателями (sweep-line): O(слотов + заказов). Возвращает {master_id: Slot}.
+    """
+    slots_by_master = {}
+    for key in sorted(availability):
+        slots_by_master.setdefault(key[0], []).extend(availability[key])
+
+    result = {}
+    for master_id, slots in slots_by_master.items():
+        booked = sorted(bookings.get(master_id, ()))
+        position = 0
+        for slot in slots:
+            # Заказы раньше начала слота дальше не понадобятся: слоты идут по возрастанию
+            while position < len(booked) and booked[position] < (slot.date, slot.start_time):
+                position += 1
+            if position == len(booked) or booked[position] >= (slot.date, slot.end_time):
+                result[master_id] = slot
+                break
+    return result
+
+
+def is_master_available(master, day, at_time):
+    """Есть ли у мастера слот, покрывающий время at_time в день day"""
+    return any(
+        slot.start_time <= at_time < slot.end_time
+        for slot in get_availability([master], day).get((getattr(master, 'pk', master), day), [])
+    )
+
+
+def has_availability_from(master, date_from):
+    """Есть ли у мастера хоть какая-то доступность начиная с date_from"""
+    if MasterAvailability.objects.filter(master=master, date__gte=date_from).exists():
+        return True
+    # Шаблон может действовать, но попадать только на выходные-исключения;
+    # проверяем горизонт планирования
+    return bool(get_availability([master], date_from, date_from + timedelta(days=DEFAULT_HORIZON_DAYS)))
+
+
+def template_days(master, dates):
+    """{дата: множество (start, end)} по шаблону мастера без учёта переопределений"""
+    dates = list(dates)
+    if not dates:
+        return {}
+    templates = load_templates([master], min(dates), max(dates)).get(getattr(master, 'pk', master), [])
+    return {day: set(expand_templates(templates, day)) for day in dates}
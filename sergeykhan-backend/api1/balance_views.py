@@ -3,11 +3,14 @@ from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from datetime import date, datetime, timedelta
 from decimal import Decimal, InvalidOperation
 from django.db import transaction
 
 from .models import CustomUser, Balance, BalanceLog, TransactionLog, CompanyBalance, CompanyBalanceLog
 from .serializers import BalanceLogSerializer, CompanyBalanceSerializer, CompanyBalanceLogSerializer
+from .db_router import read_from_replica
+from .finance_rollups import ROLLUP_MODELS, rollup_report
 
 
 def check_permissions(user, target_user):
@@ -217,6 +220,7 @@ def get_user_permissions(request, user_id):
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def get_all_balances(request):
     """
     Получить балансы всех пользователей (только для супер админа)
@@ -406,3 +410,47 @@ def get_user_balance_detailed_for_super_admin(request, user_id):
         'paid_amount': balance_obj.paid_amount,
         'display_name': 'Личный баланс'
     })
+
+
+FINANCE_REPORT_MAX_DAYS = 366
+
+
+@api_view(['GET'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def get_finance_report(request):
+    """
+    Финансовый отчёт за период по дневным итогам (api1/finance_rollups.py).
+
+    ?scope=company|master|curator&user_id=&from=YYYY-MM-DD&to=YYYY-MM-DD
+    (по умолчанию - компания за последние 30 дней). Компания и чужие итоги -
+    только для супер админа и куратора, мастер и куратор видят свои.
+    """
+    scope = request.GET.get('scope', 'company')
+    if scope not in ROLLUP_MODELS:
+        return Response({'error': f'scope must be one of: {", ".join(ROLLUP_MODELS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        date_to = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') else date.today()
+        date_from = (datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from')
+                     else date_to - timedelta(days=29))
+        user_id = int(request.GET.get('user_id') or request.user.id)
+    except ValueError:
+        return Response({'error': 'Invalid from/to/user_id'}, status=status.HTTP_400_BAD_REQUEST)
+    if date_to < date_from or (date_to - date_from).days >= FINANCE_REPORT_MAX_DAYS:
+        return Response({'error': f'Period must be from 1 to {FINANCE_REPORT_MAX_DAYS} days'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if request.user.role not in ['super-admin', 'curator'] and (scope == 'company' or user_id != request.user.id):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    report = rollup_report(scope, date_from, date_to, None if scope == 'company' else user_id)
+    return Response({
+        'scope': scope,
+        'user_id': None if scope == 'company' else user_id,
+        'from': date_from,
+        'to': date_to,
+        **report,
+    })
+
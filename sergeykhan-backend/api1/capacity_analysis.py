@@ -10,15 +10,20 @@ from django.utils import timezone
 from datetime import datetime, timedelta, time
 from django.db.models import Q, Count, Sum
 from decimal import Decimal
+import math
 
-from .models import CustomUser, Order, MasterAvailability
+from .models import CustomUser, Order
+from .availability import get_availability
+from .demand_forecast import get_demand_forecast
 from .middleware import role_required
+from .db_router import read_from_replica
 
 
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
 @role_required(['super-admin', 'curator', 'operator', 'master'])
+@read_from_replica
 def get_capacity_analysis(request):
     """
     Анализ пропускной способности мастеров и рекомендации по планированию
@@ -40,9 +45,12 @@ def get_capacity_analysis(request):
     total_processing_orders = Order.objects.filter(status='в обработке').count()
     total_pending_orders = total_new_orders + total_processing_orders
     
+    # Прогноз новых заказов (api1/demand_forecast.py)
+    demand = get_demand_forecast([today, tomorrow])
+
     # Рекомендации по планированию
     recommendations = generate_recommendations(
-        today_analysis, tomorrow_analysis, total_pending_orders
+        today_analysis, tomorrow_analysis, total_pending_orders, tomorrow_demand=demand[tomorrow]
     )
     
     return Response({
@@ -53,6 +61,10 @@ def get_capacity_analysis(request):
             'processing_orders': total_processing_orders,
             'total_pending': total_pending_orders
         },
+        'demand_forecast': {
+            'today': demand[today],
+            'tomorrow': demand[tomorrow]
+        },
         'recommendations': recommendations,
         'analysis_timestamp': timezone.now().isoformat()
     })
@@ -62,20 +74,25 @@ def analyze_day_capacity(target_date, masters):
     """
     Анализирует пропускную способность мастеров на конкретный день
     """
-    # Мастера с доступностью на этот день
-    masters_with_availability = masters.filter(
-        availability_slots__date=target_date
-    ).distinct()
-    
-    # Мастера уже с назначенными заказами на этот день
-    masters_with_orders = masters.filter(
-        orders__scheduled_date=target_date
-    ).distinct()
+    masters = list(masters)
+    master_ids = [master.id for master in masters]
+
+    # Доступность всех мастеров на день (конкретные слоты и шаблоны) одним обходом
+    availability = get_availability(master_ids, target_date)
+    slots_by_master = {master_id: len(slots) for (master_id, _), slots in availability.items()}
+
+    # Заказы мастеров на этот день
+    orders_by_master = dict(
+        Order.objects.filter(assigned_master_id__in=master_ids, scheduled_date=target_date)
+        .values('assigned_master_id')
+        .annotate(count=Count('id'))
+        .values_list('assigned_master_id', 'count')
+    )
+
+    masters_with_availability = [master for master in masters if slots_by_master.get(master.id)]
     
     # Подсчет слотов времени
-    total_time_slots = MasterAvailability.objects.filter(
-        date=target_date
-    ).count()
+    total_time_slots = sum(slots_by_master.values())
     
     # Занятые слоты (заказы на этот день)
     occupied_slots = Order.objects.filter(
@@ -102,26 +119,22 @@ def analyze_day_capacity(target_date, masters):
     realistic_capacity = available_slots
     
     # Мастера по статусам
-    free_masters = masters_with_availability.exclude(
-        id__in=masters_with_orders.values_list('id', flat=True)
-    )
+    free_masters = [master for master in masters_with_availability if master.id not in orders_by_master]
     
-    busy_masters = masters_with_orders
+    busy_masters = [master for master in masters if master.id in orders_by_master]
     
     # Мастера без расписания на этот день
-    masters_without_schedule = masters.exclude(
-        availability_slots__date=target_date
-    )
+    masters_without_schedule = [master for master in masters if not slots_by_master.get(master.id)]
     
     return {
         'date': target_date.isoformat(),
         'date_display': target_date.strftime('%Y-%m-%d (%A)'),
         'masters_stats': {
-            'total_masters': masters.count(),
-            'masters_with_availability': masters_with_availability.count(),
-            'free_masters': free_masters.count(),
-            'busy_masters': busy_masters.count(),
-            'masters_without_schedule': masters_without_schedule.count()
+            'total_masters': len(masters),
+            'masters_with_availability': len(masters_with_availability),
+            'free_masters': len(free_masters),
+            'busy_masters': len(busy_masters),
+            'masters_without_schedule': len(masters_without_schedule)
         },
         'capacity': {
             'total_time_slots': total_time_slots,
@@ -138,44 +151,49 @@ def analyze_day_capacity(target_date, masters):
                 'id': master.id,
                 'email': master.email,
                 'name': f"{master.first_name} {master.last_name}".strip(),
-                'availability_slots': MasterAvailability.objects.filter(
-                    master=master, date=target_date
-                ).count(),
-                'assigned_orders': Order.objects.filter(
-                    assigned_master=master,
-                    scheduled_date=target_date
-                ).count(),
-                'status': get_master_status_for_date(master, target_date)
+                'availability_slots': slots_by_master.get(master.id, 0),
+                'assigned_orders': orders_by_master.get(master.id, 0),
+                'status': master_status(slots_by_master.get(master.id), orders_by_master.get(master.id))
             }
             for master in masters
         ]
     }
 
 
+def master_status(has_availability, has_orders):
+    """
+    Статус мастера на дату по наличию доступности и заказов
+    """
+    if not has_availability:
+        return 'no_schedule'  # Нет расписания
+    elif has_orders:
+        return 'busy'  # Занят
+    else:
+        return 'available'  # Доступен
+
+
 def get_master_status_for_date(master, target_date):
     """
     Определяет статус мастера на конкретную дату
     """
-    has_availability = MasterAvailability.objects.filter(
-        master=master, date=target_date
-    ).exists()
+    has_availability = bool(get_availability([master], target_date))
     
     has_orders = Order.objects.filter(
         assigned_master=master,
         scheduled_date=target_date
     ).exists()
     
-    if not has_availability:
-        return 'no_schedule'  # Нет расписания
-    elif has_orders:
-        return 'busy'  # Занят
-    else:
-        return 'available'  # Доступен
+    return master_status(has_availability, has_orders)
+
+
+# Порог «мало мест на завтра», если прогноза спроса нет
+MIN_TOMORROW_CAPACITY = 5
 
 
-def generate_recommendations(today_analysis, tomorrow_analysis, total_pending_orders):
+def generate_recommendations(today_analysis, tomorrow_analysis, total_pending_orders, tomorrow_demand=None):
     """
-    Генерирует рекомендации по планированию заказов
+    Генерирует рекомендации по планированию заказов.
+    tomorrow_demand - прогноз новых заказов на завтра (api1/demand_forecast.py).
     """
     today_capacity = today_analysis['capacity']['realistic_capacity']
     tomorrow_capacity = tomorrow_analysis['capacity']['realistic_capacity']
@@ -213,7 +231,14 @@ def generate_recommendations(today_analysis, tomorrow_analysis, total_pending_or
             'message': 'Срочно составьте расписание для мастеров на завтра!',
             'action': 'Настройте расписание мастеров'
         })
-    elif tomorrow_capacity < 5:
+    elif tomorrow_demand is not None and tomorrow_capacity < math.ceil(tomorrow_demand):
+        recommendations.append({
+            'type': 'warning',
+            'title': 'Мало свободных мест на завтра',
+            'message': f'Завтра доступно {tomorrow_capacity} слотов, ожидается около {math.ceil(tomorrow_demand)} новых заказов',
+            'action': f'Расширьте расписание мастеров на завтра минимум на {math.ceil(tomorrow_demand) - tomorrow_capacity} слотов'
+        })
+    elif tomorrow_demand is None and tomorrow_capacity < MIN_TOMORROW_CAPACITY:
         recommendations.append({
             'type': 'warning',
             'title': 'Мало свободных мест на завтра',
@@ -245,24 +270,31 @@ def generate_recommendations(today_analysis, tomorrow_analysis, total_pending_or
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
 @role_required(['super-admin', 'curator', 'operator', 'master'])
+@read_from_replica
 def get_weekly_capacity_forecast(request):
     """
     Прогноз пропускной способности на неделю вперед
     """
     today = timezone.now().date()
     week_forecast = []
+    masters = list(CustomUser.objects.filter(role='master'))
+    dates = [today + timedelta(days=i) for i in range(7)]
+    # Прогноз спроса считается ночью (задача capacity.demand_forecast)
+    demand = get_demand_forecast(dates)
     
-    for i in range(7):
-        target_date = today + timedelta(days=i)
-        masters = CustomUser.objects.filter(role='master')
+    for target_date in dates:
         day_analysis = analyze_day_capacity(target_date, masters)
+        available_capacity = day_analysis['capacity']['realistic_capacity']
+        projected_demand = math.ceil(demand[target_date] or 0)
         
         week_forecast.append({
             'date': target_date.isoformat(),
             'day_name': target_date.strftime('%A'),
-            'available_capacity': day_analysis['capacity']['realistic_capacity'],
+            'available_capacity': available_capacity,
             'masters_available': day_analysis['masters_stats']['masters_with_availability'],
-            'utilization_percent': day_analysis['capacity']['capacity_utilization_percent']
+            'utilization_percent': day_analysis['capacity']['capacity_utilization_percent'],
+            'projected_demand': projected_demand,
+            'projected_shortfall': max(0, projected_demand - available_capacity)
         })
     
     return Response({
@@ -270,5 +302,7 @@ def get_weekly_capacity_forecast(request):
         'total_week_capacity': sum(day['available_capacity'] for day in week_forecast),
         'avg_daily_capacity': round(
             sum(day['available_capacity'] for day in week_forecast) / 7, 1
-        )
+        ),
+        'total_projected_demand': sum(day['projected_demand'] for day in week_forecast),
+        'total_projected_shortfall': sum(day['projected_shortfall'] for day in week_forecast)
     })
@@ -0,0 +1,220 @@
+"""
+Фотографии завершения заказов.
+
+Оригиналы пишутся в хранилище (default_storage) по частям прямо из загруженного
+файла, без чтения целиком в память, под именем из SHA-256 содержимого
+(PhotoBlob): повторная загрузка того же файла не занимает место и не пишет на
+диск. Неиспользуемые файлы удаляет команда gc_completion_photos.
+
+Превью для списков и веб-версия для просмотра создаются Pillow фоновой задачей
+(api1/jobs.py, manage.py run_workers), поэтому запрос мастера не ждёт
+обработки изображений. Когда все версии готовы,
+у завершения выставляется photo_renditions_ready. Фотографии, загруженные до
+появления очереди, дообрабатывает команда generate_photo_renditions.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+PHOTO_DIR = 'completion_photos'
+MAX_PHOTOS = 5
+MAX_PHOTO_SIZE = 5 * 1024 * 1024
+ALLOWED_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+
+# Имя версии -> максимальный размер (ширина, высота)
+RENDITIONS = {
+    'thumb': (320, 320),
+    'web': (1280, 1280),
+}
+RENDITION_QUALITY = 82
+
+
+def photo_path(path):
+    """Путь фотографии в хранилище (старые записи хранят только имя файла)"""
+    return path if path.startswith(f'{PHOTO_DIR}/') else f'{PHOTO_DIR}/{path}'
+
+
+def rendition_path(path, rendition):
+    """completion_photos/<file>.png -> completion_photos/<rendition>/<file>.jpg"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f'{PHOTO_DIR}/{rendition}/{stem}.jpg'
+
+
+def photo_url(path, request=None, rendition=None):
+    """URL оригинала или версии фотографии (абсолютный, если есть request)"""
+    path = photo_path(path)
+    url = default_storage.url(rendition_path(path, rendition) if rendition else path)
+    return request.build_absolute_uri(url) if request else url
+
+
+def content_digest(photo):
+    """SHA-256 загруженного файла; файл читается по частям и перематывается в начало"""
+    digest = hashlib.sha256()
+    for chunk in photo.chunks():
+        digest.update(chunk)
+    photo.seek(0)
+    return digest.hexdigest()
+
+
+def blob_path(digest, extension):
+    return f'{PHOTO_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+def store_blob(photo, digest, extension, written=None):
+    """
+    Файл с содержимым digest в хранилище; PhotoBlob возвращается с ref_count+1.
+
+    Если такое содержимое уже загружалось, файл не пишется повторно.
+    Пути новых файлов добавляются в written (см. discard_files).
+    """
+    from .models import PhotoBlob
+
+    blob = PhotoBlob.objects.filter(sha256=digest).first()
+    if blob is None or not default_storage.exists(blob.path):
+        path = blob.path if blob else blob_path(digest, extension)
+        saved = default_storage.save(path, photo)
+        if saved != path:
+            # Тот же файл только что записала параллельная загрузка
+            default_storage.delete(saved)
+        elif written is not None:
+            written.append(path)
+        if blob is None:
+            blob, _ = PhotoBlob.objects.get_or_create(sha256=digest, defaults={'path': path, 'size': photo.size})
+
+    # Счётчик увеличивается одним UPDATE; 0 строк - blob только что удалил сборщик мусора
+    if not PhotoBlob.objects.filter(pk=blob.pk).update(
+        ref_count=F('ref_count') + 1, last_referenced_at=timezone.now()
+    ):
+        blob = PhotoBlob.objects.create(sha256=digest, path=blob.path, size=photo.size, ref_count=1)
+        if not default_storage.exists(blob.path):
+            photo.seek(0)
+            default_storage.save(blob.path, photo)
+            if written is not None:
+                written.append(blob.path)
+    return blob
+
+
+def discard_files(paths):
+    """
+    Удаляет файлы, записанные в откатившейся транзакции: без строки PhotoBlob
+    их не найдёт и gc_completion_photos.
+    """
+    from .models import PhotoBlob
+
+    kept = set(PhotoBlob.objects.filter(path__in=paths).values_list('path', flat=True))
+    for path in set(paths) - kept:
+        if default_storage.exists(path):
+            default_storage.delete(path)
+
+
+def release_photos(paths):
+    """
+    Уменьшает счётчики ссылок файлов (например, при удалении завершения).
+    Время последней ссылки обновляется, чтобы файл пережил grace-период сборщика мусора.
+    """
+    from .models import PhotoBlob
+
+    if paths:
+        PhotoBlob.objects.filter(path__in=set(paths), ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, last_referenced_at=timezone.now()
+        )
+
+
+def store_photos(completion, photos, written=None):
+    """
+    Сохраняет загруженные фотографии завершения и возвращает их пути.
+
+    Файлы больше MAX_PHOTO_SIZE и не изображения пропускаются, повторы одного
+    содержимого хранятся один раз. Пути новых файлов добавляются в written.
+    """
+    paths = []
+    for photo in photos:
+        if photo.size > MAX_PHOTO_SIZE:
+            logger.warning('Completion %s: photo %s is too large (%s bytes)', completion.id, photo.name, photo.size)
+            continue
+        if not (photo.content_type or '').startswith('image/'):
+            logger.warning('Completion %s: %s is not an image (%s)', completion.id, photo.name, photo.content_type)
+            continue
+
+        extension = os.path.splitext(photo.name)[1].lower()
+        if extension not in ALLOWED_EXTENSIONS:
+            extension = '.jpg'
+        digest = content_digest(photo)
+        if any(os.path.basename(path).startswith(digest) for path in paths):
+            continue
+        try:
+            paths.append(store_blob(photo, digest, extension, written).path)
+        except OSError as e:
+            logger.error('Completion %s: failed to store photo %s: %s', completion.id, photo.name, e)
+    return paths
+
+
+def generate_renditions(path, force=False):
+    """
+    Создаёт версии одной фотографии. Готовые версии не пересоздаются
+    (файлы адресуются по содержимому), если не указан force.
+    """
+    targets = {rendition: rendition_path(path, rendition) for rendition in RENDITIONS}
+    if not force and all(default_storage.exists(target) for target in targets.values()):
+        return
+    with default_storage.open(photo_path(path), 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        for rendition, size in RENDITIONS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, 'JPEG', quality=RENDITION_QUALITY, optimize=True)
+            target = targets[rendition]
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def process_completion_photos(completion_id, force=False, raise_errors=False):
+    """
+    Создаёт версии всех фотографий завершения и отмечает их готовность.
+
+    raise_errors - ошибку обработки фотографии пробросить (фоновая задача повторит её),
+    иначе вернуть False.
+    """
+    from .models import OrderCompletion
+
+    completion = OrderCompletion.objects.filter(pk=completion_id).only('id', 'completion_photos').first()
+    if completion is None:
+        return False
+    for path in completion.completion_photos:
+        try:
+            generate_renditions(path, force)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            logger.error('Completion %s: cannot process photo %s: %s', completion_id, path, e)
+            if raise_errors:
+                raise
+            return False
+    # Если фотографии успели заменить, готовность отметит следующая обработка
+    return bool(OrderCompletion.objects.filter(
+        pk=completion_id, completion_photos=completion.completion_photos
+    ).update(photo_renditions_ready=True))
+
+
+def enqueue_renditions(completion_id, paths):
+    """Ставит обработку фотографий завершения в фоновую очередь (api1/jobs.py)"""
+    from .jobs import enqueue
+
+    digest = hashlib.sha256('\n'.join(paths).encode()).hexdigest()[:16]
+    return enqueue(
+        'completion_photos.renditions',
+        idempotency_key=f'completion-photos:{completion_id}:{digest}',
+        completion_id=completion_id
+    )
@@ -0,0 +1,109 @@
+"""
+Маршрутизация чтения на реплику.
+
+Вьюхи, помеченные @read_from_replica, читают из алиаса REPLICA_DB_ALIAS, если он
+настроен (DATABASE_REPLICA_URL). Все записи идут в default. Чтобы пользователь
+видел свои изменения несмотря на отставание реплики, после его записи
+ReplicaStickinessMiddleware на DB_REPLICA_STICKY_SECONDS закрепляет его за default.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+
+REPLICA_DB_ALIAS = 'replica'
+
+# Алиас для чтения в текущей вьюхе (None - default)
+_read_alias = ContextVar('read_alias', default=None)
+# Флаг записи за текущий запрос; изменяемый список, чтобы пережить копирование контекста
+_request_writes = ContextVar('request_writes', default=None)
+
+
+def replica_configured():
+    try:
+        connections[REPLICA_DB_ALIAS]
+    except ConnectionDoesNotExist:
+        return False
+    return True
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Закрепляет пользователя за default на время отставания реплики"""
+    cache.set(_pin_key(user.pk), True, getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 15))
+
+
+def is_pinned_to_primary(user):
+    if user is None or not user.is_authenticated:
+        return False
+    return bool(cache.get(_pin_key(user.pk)))
+
+
+class ReplicaRouter:
+    """Чтение - из реплики внутри @read_from_replica, запись - всегда в default"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes.append(model._meta.label)
+        # После записи остаток вьюхи читает из default, а не из отстающей реплики
+        if _read_alias.get() is not None:
+            _read_alias.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+def read_from_replica(view_func):
+    """
+    Декоратор вьюхи только для чтения: запросы внутри идут в реплику.
+
+    Ставится последним (ближе всего к функции), чтобы аутентификация и проверка
+    роли уже прошли на default и request.user был известен.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or is_pinned_to_primary(getattr(request, 'user', None)):
+            return view_func(request, *args, **kwargs)
+        token = _read_alias.set(REPLICA_DB_ALIAS)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Закрепляет пользователя за default после запроса, в котором он что-то записал
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = []
+        token = _request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_writes.reset(token)
+
+        # DRF проставляет пользователя из токена и в исходный request
+        user = getattr(request, 'user', None)
+        if writes and replica_configured() and user is not None and user.is_authenticated:
+            pin_to_primary(user)
+        return response
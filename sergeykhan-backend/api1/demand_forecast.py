@@ -0,0 +1,135 @@
+"""
+Прогноз спроса на заказы на неделю вперёд.
+
+Модель - сезонная, на чистом Python: по числу заказов за последние
+HISTORY_WEEKS недель (по дням и часам создания) считаются недельная
+сезонность (коэффициент дня недели), уровень и тренд - взвешенная линейная
+регрессия по очищенному от сезонности ряду, свежие недели весят больше
+(WEEK_DECAY). Прогноз дня = (уровень + тренд) x коэффициент дня недели,
+распределение по часам - профиль часов этого дня недели, сглаженный общим
+профилем.
+
+Прогноз на FORECAST_DAYS дней хранится в DemandForecast и пересчитывается
+ночной задачей capacity.demand_forecast; эндпоинты читают готовые строки.
+Если строк нет (задача ещё не отработала), эндпоинты считают прогноз в памяти
+и ничего не пишут: они читают с реплики, сохраняет прогноз только задача.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import DemandForecast, Order
+
+HISTORY_WEEKS = 8
+FORECAST_DAYS = 7
+WEEK_DECAY = 0.8
+# Вес общего профиля часов при сглаживании профиля дня недели (в «заказах»)
+HOUR_PROFILE_PRIOR = 20
+
+
+def load_history(today, weeks=HISTORY_WEEKS):
+    """{дата: [заказов по часам 0-23]} за weeks недель до today (не включая)"""
+    start = timezone.make_aware(datetime.combine(today - timedelta(weeks=weeks), datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+    history = defaultdict(lambda: [0] * 24)
+    for day, hour, count in (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end, is_test=False)
+        .annotate(day=TruncDate('created_at'), hour=ExtractHour('created_at'))
+        .values('day', 'hour')
+        .annotate(count=Count('id'))
+        .values_list('day', 'hour', 'count')
+    ):
+        history[day][hour] = count
+    return history
+
+
+def _weighted_line(points):
+    """Взвешенная линейная регрессия [(x, y, w)] -> (a, b) для y = a + b*x"""
+    total = sum(w for _, _, w in points)
+    mean_x = sum(x * w for x, _, w in points) / total
+    mean_y = sum(y * w for _, y, w in points) / total
+    spread = sum(w * (x - mean_x) ** 2 for x, _, w in points)
+    slope = sum(w * (x - mean_x) * (y - mean_y) for x, y, w in points) / spread if spread else 0.0
+    return mean_y - slope * mean_x, slope
+
+
+def fit_forecast(history, today, days=FORECAST_DAYS, weeks=HISTORY_WEEKS):
+    """
+    Прогноз на days дней начиная с today по истории {дата: [по часам]}.
+    Возвращает [(дата, ожидаемое число заказов, [по часам])].
+    """
+    dates = [today - timedelta(days=offset) for offset in range(weeks * 7, 0, -1)]
+    totals = [sum(history.get(day, ())) for day in dates]
+    weights = [WEEK_DECAY ** ((today - day).days // 7) for day in dates]
+    if not any(totals):
+        return [(today + timedelta(days=offset), 0.0, [0.0] * 24) for offset in range(days)]
+
+    # Коэффициенты дней недели: взвешенное среднее дня недели / взвешенное среднее дня
+    overall = sum(t * w for t, w in zip(totals, weights)) / sum(weights)
+    weekday_sum, weekday_weight = [0.0] * 7, [0.0] * 7
+    for day, total, weight in zip(dates, totals, weights):
+        weekday_sum[day.weekday()] += total * weight
+        weekday_weight[day.weekday()] += weight
+    seasonal = [
+        (weekday_sum[w] / weekday_weight[w]) / overall if weekday_weight[w] and overall else 1.0
+        for w in range(7)
+    ]
+
+    # Уровень и тренд по ряду без сезонности; x - дни относительно today
+    deseasonalized = [
+        ((day - today).days, total / seasonal[day.weekday()] if seasonal[day.weekday()] else 0.0, weight)
+        for day, total, weight in zip(dates, totals, weights)
+    ]
+    intercept, slope = _weighted_line(deseasonalized)
+
+    # Профиль часов по дням недели со сглаживанием общим профилем
+    overall_hours = [0.0] * 24
+    weekday_hours = [[0.0] * 24 for _ in range(7)]
+    for day, weight in zip(dates, weights):
+        for hour, count in enumerate(history.get(day, ())):
+            overall_hours[hour] += count * weight
+            weekday_hours[day.weekday()][hour] += count * weight
+    overall_share = [count / sum(overall_hours) for count in overall_hours]
+
+    forecast = []
+    for offset in range(days):
+        day = today + timedelta(days=offset)
+        expected = max(0.0, (intercept + slope * offset) * seasonal[day.weekday()])
+        hours = weekday_hours[day.weekday()]
+        observed = sum(hours)
+        share = [(hours[h] + HOUR_PROFILE_PRIOR * overall_share[h]) / (observed + HOUR_PROFILE_PRIOR)
+                 for h in range(24)]
+        forecast.append((day, round(expected, 2), [round(expected * s, 3) for s in share]))
+    return forecast
+
+
+def refresh_demand_forecast(today=None, days=FORECAST_DAYS):
+    """Пересчитывает и сохраняет прогноз на days дней; возвращает список DemandForecast"""
+    today = today or timezone.localdate()
+    rows = [
+        DemandForecast(date=day, orders=expected, hourly=hourly)
+        for day, expected, hourly in fit_forecast(load_history(today), today, days)
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.filter(date__lt=today).delete()
+        DemandForecast.objects.filter(date__in=[row.date for row in rows]).delete()
+        DemandForecast.objects.bulk_create(rows)
+    return rows
+
+
+def get_demand_forecast(dates):
+    """{дата: ожидаемое число заказов}; если прогноза на какие-то даты нет, он считается в памяти без записи"""
+    forecast = dict(DemandForecast.objects.filter(date__in=dates).values_list('date', 'orders'))
+    missing = set(dates) - set(forecast)
+    if missing:
+        today = timezone.localdate()
+        days = max((max(dates) - today).days + 1, FORECAST_DAYS)
+        forecast.update(
+            (day, expected) for day, expected, _ in fit_forecast(load_history(today), today, days)
+            if day in missing
+        )
+    return {day: forecast.get(day) for day in dates}
@@ -0,0 +1,185 @@
+"""
+Симуляция порогов дистанционки без сохранения настроек.
+
+Показатели всех мастеров (средний чек за последние 10 заказов, сумма заказов
+за сутки, чистый вал за 10 дней - как в check_distance_level) считаются по
+завершённым заказам одним запросом и раскладываются по колонкам. Каждый
+набор порогов затем проверяется по колонкам целиком, без запросов к базе:
+сколько мастеров окажется на каждом уровне, кого повысит или понизит и
+сколько новых заказов будет видно в ленте на каждом уровне.
+"""
+from bisect import bisect_left
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import CustomUser, DistanceSettingsModel, Order
+
+MASTER_ROLES = ['master', 'garant-master', 'warrant-master']
+AVERAGE_CHECK_ORDERS = 10
+NET_TURNOVER_DAYS = 10
+# Без дистанционки мастер видит заказы за последние 24 часа
+DEFAULT_VISIBLE_HOURS = 24
+MAX_CANDIDATES = 50
+
+# Поля кандидата в запросе (как в update_distance_settings) -> поле DistanceSettingsModel
+THRESHOLD_FIELDS = {
+    'averageCheckThreshold': 'average_check_threshold',
+    'dailyOrderSumThreshold': 'daily_order_sum_threshold',
+    'netTurnoverThreshold': 'net_turnover_threshold',
+    'visiblePeriodStandard': 'visible_period_standard',
+    'visiblePeriodDaily': 'visible_period_daily',
+}
+
+
+class MasterMetrics:
+    """Показатели мастеров по колонкам: i-й элемент каждого списка - один мастер"""
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        masters = list(
+            CustomUser.objects.filter(role__in=MASTER_ROLES).order_by('id')
+            .values_list('id', 'dist', 'distance_manual_override', 'email')
+        )
+        self.master_ids = [master_id for master_id, _, _, _ in masters]
+        self.levels = [dist for _, dist, _, _ in masters]
+        self.manual = [manual for _, _, manual, _ in masters]
+        self.emails = [email for _, _, _, email in masters]
+        index = {master_id: i for i, master_id in enumerate(self.master_ids)}
+
+        check_sum = [Decimal(0)] * len(masters)
+        check_count = [0] * len(masters)
+        self.daily_revenue = [Decimal(0)] * len(masters)
+        self.net_turnover = [Decimal(0)] * len(masters)
+        day_start = self.now - timedelta(days=1)
+        period_start = self.now - timedelta(days=NET_TURNOVER_DAYS)
+        for master_id, created_at, final_cost, expenses, rank in self._completed_orders(period_start):
+            i = index.get(master_id)
+            if i is None:
+                continue
+            if rank <= AVERAGE_CHECK_ORDERS:
+                check_sum[i] += final_cost
+                check_count[i] += 1
+            if created_at >= day_start:
+                self.daily_revenue[i] += final_cost
+            if created_at >= period_start and expenses is not None:
+                self.net_turnover[i] += final_cost - expenses
+        self.average_check = [total / count if count else Decimal(0) for total, count in zip(check_sum, check_count)]
+
+    @cached_property
+    def new_orders(self):
+        """Время создания новых неназначенных заказов по возрастанию - для подсчёта ленты"""
+        return list(
+            Order.objects.filter(status='новый', assigned_master__isnull=True)
+            .order_by('created_at').values_list('created_at', flat=True)
+        )
+
+    def _completed_orders(self, period_start):
+        """Последние AVERAGE_CHECK_ORDERS заказов каждого мастера и все заказы за период"""
+        ranked = Order.objects.filter(
+            assigned_master__role__in=MASTER_ROLES, status='завершен', final_cost__isnull=False
+        ).annotate(rank=Window(
+            RowNumber(), partition_by=F('assigned_master_id'), order_by=F('created_at').desc()
+        ))
+        return ranked.filter(Q(rank__lte=AVERAGE_CHECK_ORDERS) | Q(created_at__gte=period_start)).values_list(
+            'assigned_master_id', 'created_at', 'final_cost', 'expenses', 'rank'
+        )
+
+    def visible_orders(self, hours):
+        """Сколько новых заказов видно в ленте с окном hours часов"""
+        return len(self.new_orders) - bisect_left(self.new_orders, self.now - timedelta(hours=hours))
+
+    def simulate(self, thresholds):
+        """
+        Уровни мастеров при пороговых значениях thresholds (поля DistanceSettingsModel).
+        Мастера с ручной дистанционкой остаются на своём уровне.
+        """
+        average_check = thresholds['average_check_threshold']
+        daily_sum = thresholds['daily_order_sum_threshold']
+        net_turnover = thresholds['net_turnover_threshold']
+        levels = [
+            current if manual else
+            2 if revenue >= daily_sum or turnover >= net_turnover else
+            1 if check >= average_check else 0
+            for current, manual, check, revenue, turnover in zip(
+                self.levels, self.manual, self.average_check, self.daily_revenue, self.net_turnover
+            )
+        ]
+
+        summary = self.summary(levels, {
+            0: DEFAULT_VISIBLE_HOURS,
+            1: thresholds['visible_period_standard'],
+            2: thresholds['visible_period_daily'],
+        })
+        summary['changes'] = {
+            'promoted': sum(new > old for new, old in zip(levels, self.levels)),
+            'demoted': sum(new < old for new, old in zip(levels, self.levels)),
+        }
+        return summary
+
+    def summary(self, levels, hours):
+        """Число мастеров на уровнях и лента при окнах видимости hours {уровень: часы}"""
+        visible = {level: self.visible_orders(period) for level, period in hours.items()}
+        return {
+            'levels': {level: levels.count(level) for level in hours},
+            'visibility': {
+                'hours': hours,
+                'visible_new_orders': visible,
+                'avg_visible_per_master': round(
+                    sum(visible.get(level, 0) for level in levels) / len(levels), 2
+                ) if levels else 0,
+            },
+        }
+
+
+def candidate_thresholds(candidate, settings):
+    """Пороги кандидата поверх текущих настроек; ValueError при неверных значениях"""
+    unknown = set(candidate) - set(THRESHOLD_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+    thresholds = {field: getattr(settings, field) for field in THRESHOLD_FIELDS.values()}
+    for key, field in THRESHOLD_FIELDS.items():
+        if key not in candidate:
+            continue
+        try:
+            value = int(candidate[key]) if field.startswith('visible_period') else Decimal(str(candidate[key]))
+        except (TypeError, ValueError, InvalidOperation):
+            raise ValueError(f'{key} must be a number')
+        if value < 0:
+            raise ValueError(f'{key} must not be negative')
+        thresholds[field] = value
+    return thresholds
+
+
+def simulate_distance_settings(candidates, now=None):
+    """Результат simulate для каждого набора порогов; настройки и мастера не меняются"""
+    # Без get_settings: симуляция ничего не создаёт, при пустой таблице - значения по умолчанию
+    settings = DistanceSettingsModel.objects.filter(id=1).first() or DistanceSettingsModel()
+    thresholds = [candidate_thresholds(candidate, settings) for candidate in candidates]
+    metrics = MasterMetrics(now)
+    current = metrics.summary(metrics.levels, {
+        0: DEFAULT_VISIBLE_HOURS, 1: settings.visible_period_standard, 2: settings.visible_period_daily
+    })
+    results = []
+    for values in thresholds:
+        result = metrics.simulate(values)
+        result['visibility']['avg_visible_change'] = round(
+            result['visibility']['avg_visible_per_master'] - current['visibility']['avg_visible_per_master'], 2
+        )
+        results.append({
+            'thresholds': {
+                key: values[field] if isinstance(values[field], int) else float(values[field])
+                for key, field in THRESHOLD_FIELDS.items()
+            },
+            **result,
+        })
+    return {
+        'total_masters': len(metrics.master_ids),
+        'manual_override': sum(metrics.manual),
+        'current': current,
+        'candidates': results,
+    }
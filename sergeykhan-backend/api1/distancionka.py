@@ -9,6 +9,8 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from .models import Order, CustomUser, Balance, DistanceSettingsModel
+from .db_router import read_from_replica
+from .distance_simulation import MAX_CANDIDATES, MasterMetrics, simulate_distance_settings
 
 
 def calculate_average_check(master_id, orders_count=10):
@@ -77,11 +79,9 @@ def calculate_net_turnover(master_id, days=10):
         created_at__gte=period_start
     )
     
-    # Чистый вал = доходы - расходы
-    total_revenue = orders.aggregate(total=Sum('final_cost'))['total'] or 0
-    total_expenses = orders.aggregate(total=Sum('expenses'))['total'] or 0
-    
-    return total_revenue - total_expenses
+    # Чистый вал = доходы - расходы (одним запросом)
+    totals = orders.aggregate(revenue=Sum('final_cost'), expenses=Sum('expenses'))
+    return (totals['revenue'] or 0) - (totals['expenses'] or 0)
 
 
 def check_distance_level(master_id):
@@ -231,6 +231,30 @@ def update_distance_settings(request):
         return Response({'error': f'Failed to update settings: {str(e)}'}, status=400)
 
 
+@api_view(['POST'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def simulate_distance_settings_view(request):
+    """
+    Что будет при других порогах дистанционки: {"candidates": [{averageCheckThreshold, ...}, ...]}.
+    Не указанные поля берутся из текущих настроек; ничего не сохраняется.
+    """
+    if request.user.role != 'super-admin':
+        return Response({'error': 'Access denied'}, status=403)
+
+    candidates = request.data.get('candidates')
+    if not isinstance(candidates, list) or not candidates or not all(isinstance(c, dict) for c in candidates):
+        return Response({'error': 'candidates must be a non-empty list of settings'}, status=400)
+    if len(candidates) > MAX_CANDIDATES:
+        return Response({'error': f'At most {MAX_CANDIDATES} candidates per request'}, status=400)
+
+    try:
+        return Response(simulate_distance_settings(candidates))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
@@ -292,36 +316,32 @@ def get_master_distance_info(request, master_id=None):
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def get_all_masters_distance(request):
     """Получение информации о дистанционке всех мастеров"""
     if request.user.role != 'super-admin':
         return Response({'error': 'Access denied'}, status=403)
     
-    masters = CustomUser.objects.filter(
-        role__in=['master', 'garant-master', 'warrant-master']
-    )
+    # Показатели всех мастеров - одним запросом (как в симуляции порогов), настройки - один раз
+    metrics = MasterMetrics()
+    settings = DistanceSettingsModel.get_settings()
     result = []
     
-    for master in masters:
-        master.refresh_from_db()
-        
-        avg_check = calculate_average_check(master.id)
-        daily_revenue = calculate_daily_revenue(master.id)
-        net_turnover = calculate_net_turnover(master.id)
-        
-        # Получаем настройки дистанционки
-        settings = DistanceSettingsModel.get_settings()
+    for i, master_id in enumerate(metrics.master_ids):
+        avg_check = metrics.average_check[i]
+        daily_revenue = metrics.daily_revenue[i]
+        net_turnover = metrics.net_turnover[i]
         
         result.append({
-            'master_id': master.id,
-            'master_email': master.email,
-            'distance_level': master.dist,
-            'manual_override': master.distance_manual_override,
+            'master_id': master_id,
+            'master_email': metrics.emails[i],
+            'distance_level': metrics.levels[i],
+            'manual_override': metrics.manual[i],
             'distance_level_name': {
                 0: 'Нет дистанционки',
                 1: 'Обычная дистанционка (+4 часа)',
                 2: 'Суточная дистанционка (+24 часа)'
-            }.get(master.dist, 'Неизвестно'),
+            }.get(metrics.levels[i], 'Неизвестно'),
             'statistics': {
                 'average_check': float(avg_check),
                 'daily_revenue': float(daily_revenue),
@@ -385,6 +405,19 @@ def force_update_all_masters_distance(request):
     masters = CustomUser.objects.filter(
         role__in=['master', 'garant-master', 'warrant-master']
     )
+    
+    # Пересчёт в фоновой очереди: ответ не ждёт обхода всех мастеров
+    if request.data.get('background'):
+        from django.db import transaction
+        from .jobs import enqueue
+        with transaction.atomic():
+            for master_id in masters.values_list('id', flat=True):
+                enqueue('distance.update_master', master_id=master_id)
+        return Response({
+            'message': 'Distance update queued',
+            'total_masters': masters.count()
+        }, status=202)
+    
     updated_count = 0
     
     for master in masters:
@@ -0,0 +1,172 @@
+"""
+Дневные финансовые итоги по мастерам, кураторам и компании.
+
+distribute_completion_funds добавляет суммы распределённого завершения к
+строкам дня (UPDATE ... SET x = x + ...), поэтому отчёт за любой период читает
+не больше одной строки на день вместо завершений и транзакций. День - дата
+проверки завершения куратором (review_date, TIME_ZONE).
+
+rebuild_rollups пересчитывает итоги за период по OrderCompletion и
+FinancialTransaction (включая архивные заказы) - команда rebuild_finance_rollups.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import (
+    ArchivedOrder, CompanyDailyFinance, CuratorDailyFinance, FinancialTransaction, MasterDailyFinance,
+    OrderCompletion
+)
+
+AMOUNT_FIELDS = [
+    'gross', 'expenses', 'net_profit', 'master_paid', 'master_balance', 'curator_share', 'company_share'
+]
+ROLLUP_MODELS = {
+    'master': (MasterDailyFinance, 'master_id'),
+    'curator': (CuratorDailyFinance, 'curator_id'),
+    'company': (CompanyDailyFinance, None),
+}
+
+
+def rollup_day(completion):
+    return timezone.localdate(completion.review_date or timezone.now())
+
+
+def _increment(model, keys, values):
+    changes = {field: F(field) + value for field, value in values.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **values)
+    except IntegrityError:
+        # Строку дня только что создал параллельный запрос
+        model.objects.filter(**keys).update(**changes)
+
+
+def record_distribution(completion, curator, shares):
+    """
+    Добавляет распределённое завершение к итогам дня.
+
+    shares - master_paid, master_balance, curator_share, company_share.
+    """
+    values = {
+        'orders_count': 1,
+        'gross': completion.total_received,
+        'expenses': completion.total_expenses,
+        'net_profit': completion.net_profit,
+        **{field: Decimal(str(shares.get(field, 0))) for field in AMOUNT_FIELDS[3:]},
+    }
+    day = rollup_day(completion)
+    with transaction.atomic():
+        if completion.master_id:
+            _increment(MasterDailyFinance, {'master_id': completion.master_id, 'date': day}, values)
+        if curator is not None:
+            _increment(CuratorDailyFinance, {'curator_id': curator.id, 'date': day}, values)
+        _increment(CompanyDailyFinance, {'date': day}, values)
+
+
+DISTRIBUTION_TRANSACTION_TYPES = ['master_payment', 'master_balance_total', 'curator_payment', 'company_income']
+# Архивных завершений (и id их транзакций в одном IN) за раз при пересчёте
+ARCHIVE_CHUNK_SIZE = 500
+
+
+def _shares(amounts):
+    return {
+        'master_paid': amounts['master_payment'],
+        # master_balance_total - выплата и отложенная часть вместе
+        'master_balance': amounts['master_balance_total'] - amounts['master_payment'],
+        'curator_share': amounts['curator_payment'],
+        'company_share': amounts['company_income'],
+    }
+
+
+def _distributed_completions(date_from, date_to):
+    """(master_id, curator_id, review_date, gross, expenses, net_profit, доли) распределённых завершений"""
+    completions = OrderCompletion.objects.filter(
+        status='одобрен', is_distributed=True, review_date__date__range=(date_from, date_to)
+    )
+    rows = list(completions.values_list(
+        'id', 'master_id', 'curator_id', 'review_date', 'total_received', 'total_expenses', 'net_profit'
+    ))
+    amounts = defaultdict(lambda: defaultdict(Decimal))
+    # Транзакции выбираются подзапросом по тем же условиям, без списка id в параметрах
+    for completion_id, transaction_type, amount in FinancialTransaction.objects.filter(
+        order_completion__in=completions, transaction_type__in=DISTRIBUTION_TRANSACTION_TYPES
+    ).values('order_completion_id', 'transaction_type').annotate(amount=Sum('amount')).values_list(
+        'order_completion_id', 'transaction_type', 'amount'
+    ):
+        amounts[completion_id][transaction_type] += amount
+    for completion_id, *row in rows:
+        yield (*row, _shares(amounts[completion_id]))
+
+    # Завершения архивных заказов (api1/order_archive.py): ссылки транзакций обнулены, их id хранятся в архиве.
+    # Период отбирается по индексированной колонке review_date (только распределённые завершения)
+    archived = ArchivedOrder.objects.filter(review_date__date__range=(date_from, date_to)).values_list(
+        'review_date', 'completion'
+    ).iterator(chunk_size=ARCHIVE_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(archived, ARCHIVE_CHUNK_SIZE))
+        if not chunk:
+            return
+        transaction_ids = [transaction_id for _, data in chunk for transaction_id in data.get('transactions', [])]
+        transactions = {}
+        for start in range(0, len(transaction_ids), ARCHIVE_CHUNK_SIZE):
+            transactions.update(
+                (transaction_id, (transaction_type, amount))
+                for transaction_id, transaction_type, amount in FinancialTransaction.objects.filter(
+                    id__in=transaction_ids[start:start + ARCHIVE_CHUNK_SIZE],
+                    transaction_type__in=DISTRIBUTION_TRANSACTION_TYPES
+                ).values_list('id', 'transaction_type', 'amount')
+            )
+        for review_date, data in chunk:
+            fields = data['fields']
+            merged = defaultdict(Decimal)
+            for transaction_type, amount in filter(None, map(transactions.get, data.get('transactions', []))):
+                merged[transaction_type] += amount
+            yield (
+                fields['master'], fields['curator'], review_date, Decimal(fields['total_received']),
+                Decimal(fields['total_expenses']), Decimal(fields['net_profit']), _shares(merged)
+            )
+
+
+def rebuild_rollups(date_from, date_to):
+    """Пересчитывает итоги за период [date_from, date_to]; возвращает число дней с данными"""
+    totals = {scope: defaultdict(lambda: defaultdict(Decimal)) for scope in ROLLUP_MODELS}
+    for master_id, curator_id, review_date, gross, expenses, net_profit, shares in _distributed_completions(
+        date_from, date_to
+    ):
+        day = timezone.localdate(review_date)
+        values = {'orders_count': 1, 'gross': gross, 'expenses': expenses, 'net_profit': net_profit, **shares}
+        keys = {'company': (day, None), 'master': (day, master_id), 'curator': (day, curator_id)}
+        for scope, key in keys.items():
+            if scope != 'company' and key[1] is None:
+                continue
+            for field, value in values.items():
+                totals[scope][key][field] += value
+
+    with transaction.atomic():
+        for scope, (model, owner_field) in ROLLUP_MODELS.items():
+            model.objects.filter(date__range=(date_from, date_to)).delete()
+            model.objects.bulk_create([
+                model(date=day, **({owner_field: owner_id} if owner_field else {}),
+                      **{field: (int(value) if field == 'orders_count' else value) for field, value in values.items()})
+                for (day, owner_id), values in totals[scope].items()
+            ], batch_size=1000)
+    return len(totals['company'])
+
+
+def rollup_report(scope, date_from, date_to, owner_id=None):
+    """Итоги за период и строки по дням из таблиц итогов"""
+    model, owner_field = ROLLUP_MODELS[scope]
+    rows = model.objects.filter(date__range=(date_from, date_to))
+    if owner_field:
+        rows = rows.filter(**{owner_field: owner_id})
+    fields = ['orders_count'] + AMOUNT_FIELDS
+    days = list(rows.order_by('date').values('date', *fields))
+    totals = {field: sum(day[field] for day in days) for field in fields}
+    return {'totals': totals, 'days': days}
@@ -0,0 +1,207 @@
+"""
+Фоновая очередь задач на таблице BackgroundJob.
+
+Задача регистрируется декоратором @job('имя') и ставится в очередь через
+enqueue('имя', аргументы...). Строка задачи пишется в текущей транзакции,
+поэтому задача появляется в очереди только вместе с данными, которые её
+породили. Воркеры (manage.py run_workers) забирают задачи через
+SELECT ... FOR UPDATE SKIP LOCKED и не мешают друг другу; упавшая задача
+повторяется с экспоненциальной задержкой до max_attempts раз, задача
+зависшего воркера возвращается в очередь через JOB_LOCK_TIMEOUT секунд.
+
+idempotency_key - одна задача на ключ: повторная постановка (например, при
+повторе запроса клиентом) вернёт уже существующую задачу.
+
+@job('имя', daily_at=time(3, 0)) - ежедневная задача: следующий запуск
+ставится в очередь при старте run_workers и после каждого выполнения, ключ
+идемпотентности по времени запуска не даёт нескольким воркерам создать дубли.
+
+JOBS_RUN_INLINE=True - задачи выполняются сразу после commit в том же
+процессе (тесты, локальная разработка без воркеров).
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 30
+
+_registry = {}
+_daily = {}
+
+
+class JobError(Exception):
+    """Задача не зарегистрирована или не может быть поставлена в очередь"""
+
+
+def job(name, max_attempts=3, daily_at=None):
+    """
+    Регистрирует функцию как фоновую задачу; аргументы передаются именованными из payload.
+
+    daily_at - время (datetime.time, в TIME_ZONE) ежедневного запуска без аргументов.
+    """
+    def register(func):
+        _registry[name] = (func, max_attempts)
+        if daily_at is not None:
+            _daily[name] = daily_at
+        return func
+    return register
+
+
+def registered_jobs():
+    return dict(_registry)
+
+
+def enqueue(name, idempotency_key=None, run_at=None, max_attempts=None, **payload):
+    """
+    Ставит задачу в очередь и возвращает BackgroundJob.
+
+    Аргументы задачи должны сериализоваться в JSON.
+    """
+    if name not in _registry:
+        raise JobError(f'Unknown job: {name}')
+    fields = {
+        'name': name,
+        'payload': payload,
+        'run_at': run_at or timezone.now(),
+        'max_attempts': max_attempts or _registry[name][1],
+    }
+
+    if idempotency_key is None:
+        background_job = BackgroundJob.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                background_job, created = BackgroundJob.objects.get_or_create(
+                    idempotency_key=idempotency_key, defaults=fields
+                )
+        except IntegrityError:
+            # Параллельная постановка с тем же ключом
+            return BackgroundJob.objects.get(idempotency_key=idempotency_key)
+        if not created:
+            return background_job
+
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        transaction.on_commit(lambda: run_pending(names=[name]))
+    return background_job
+
+
+def next_daily_run(at, now=None):
+    """Ближайший момент времени at после now"""
+    now = timezone.localtime(now)
+    run_at = timezone.make_aware(datetime.combine(now.date(), at))
+    return run_at if run_at > now else timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), at))
+
+
+def schedule_daily(names=None, now=None):
+    """Ставит в очередь следующий запуск ежедневных задач; возвращает созданные BackgroundJob"""
+    scheduled = []
+    for name, at in _daily.items():
+        if names is not None and name not in names:
+            continue
+        run_at = next_daily_run(at, now)
+        scheduled.append(enqueue(name, idempotency_key=f'{name}@{run_at.isoformat()}', run_at=run_at))
+    return scheduled
+
+
+def claim_jobs(worker_id, limit=1, names=None):
+    """Забирает до limit готовых к выполнению задач и помечает их как выполняемые"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 600))
+    with transaction.atomic():
+        queryset = BackgroundJob.objects.filter(
+            Q(status='pending', run_at__lte=now) | Q(status='running', locked_at__lt=stale)
+        )
+        if names is not None:
+            queryset = queryset.filter(name__in=names)
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        job_ids = list(queryset.order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+        if not job_ids:
+            return []
+        BackgroundJob.objects.filter(id__in=job_ids).update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1
+        )
+    return list(BackgroundJob.objects.filter(id__in=job_ids).order_by('run_at', 'id'))
+
+
+def execute(background_job):
+    """Выполняет забранную задачу и записывает результат; True - успешно"""
+    func = _registry.get(background_job.name, (None, None))[0]
+    try:
+        if func is None:
+            raise JobError(f'Unknown job: {background_job.name}')
+        func(**background_job.payload)
+    except Exception as e:
+        retry = background_job.attempts < background_job.max_attempts and not isinstance(e, JobError)
+        logger.warning('Job %s #%s failed (attempt %s): %s',
+                       background_job.name, background_job.id, background_job.attempts, e)
+        BackgroundJob.objects.filter(pk=background_job.pk, locked_by=background_job.locked_by).update(
+            status='pending' if retry else 'failed',
+            run_at=timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (background_job.attempts - 1)),
+            last_error=traceback.format_exc()[-4000:],
+            finished_at=None if retry else timezone.now(),
+            locked_by='', locked_at=None,
+        )
+        if not retry:
+            _schedule_next(background_job)
+        return False
+
+    BackgroundJob.objects.filter(pk=background_job.pk, locked_by=background_job.locked_by).update(
+        status='done', finished_at=timezone.now(), locked_by='', locked_at=None
+    )
+    _schedule_next(background_job)
+    return True
+
+
+def _schedule_next(background_job):
+    if background_job.name in _daily:
+        try:
+            schedule_daily(names=[background_job.name])
+        except Exception:
+            logger.exception('Failed to schedule next run of %s', background_job.name)
+
+
+def worker_name(suffix=''):
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}{suffix}'
+
+
+def run_pending(limit=None, names=None):
+    """Выполняет готовые задачи в текущем потоке, пока они есть; возвращает число выполненных"""
+    worker_id = worker_name(':inline')
+    processed = 0
+    while limit is None or processed < limit:
+        claimed = claim_jobs(worker_id, names=names)
+        if not claimed:
+            break
+        execute(claimed[0])
+        processed += 1
+    return processed
+
+
+def work(stop_event, poll_interval=2.0, batch_size=1, names=None):
+    """Цикл воркера: забирает и выполняет задачи до stop_event"""
+    worker_id = worker_name()
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            claimed = claim_jobs(worker_id, limit=batch_size, names=names)
+        except Exception:
+            logger.exception('Worker %s: failed to claim jobs', worker_id)
+            claimed = []
+        for background_job in claimed:
+            execute(background_job)
+        if not claimed:
+            stop_event.wait(poll_interval)
+    connection.close()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api1.order_archive import ARCHIVE_BATCH_SIZE, archivable_orders, archive_cutoff, archive_orders, restore_order
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые завершённые и отклонённые заказы в архив (или возвращает заказ из архива)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Архивировать заказы старше N дней (по умолчанию ORDER_ARCHIVE_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help='Заказов в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать заказы')
+        parser.add_argument('--restore', type=int, metavar='ORDER_ID', help='Вернуть заказ из архива')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            if not restore_order(options['restore']):
+                raise CommandError(f'Заказ {options["restore"]} в архиве не найден')
+            self.stdout.write(self.style.SUCCESS(f'Заказ {options["restore"]} возвращён из архива'))
+            return
+
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть не меньше 1')
+        cutoff = archive_cutoff(options['days'])
+        if options['dry_run']:
+            self.stdout.write(f'Будет перенесено заказов: {archivable_orders(cutoff).count()}')
+            return
+        archived = archive_orders(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено в архив заказов: {archived}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api1.slot_reservation import CLEANUP_BATCH_SIZE, completed_order_slots, delete_completed_order_slots
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из расписания слоты завершённых заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=CLEANUP_BATCH_SIZE,
+            help='Удалять частями по N строк (0 - одним запросом)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать слоты')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'Будет удалено слотов: {completed_order_slots().count()}')
+            return
+        deleted = delete_completed_order_slots(batch_size=options['batch_size'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Удалено слотов: {deleted}'))
@@ -0,0 +1,74 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api1.completion_photos import RENDITIONS, rendition_path
+from api1.models import ArchivedOrder, OrderCompletion, PhotoBlob
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы фотографий завершений, на которые больше не ссылается ни одно завершение'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=int, default=24,
+            help='Не трогать файлы, на которые ссылались позже, чем N часов назад'
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Пересчитать счётчики ссылок по OrderCompletion перед сборкой'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.recount(options['dry_run'])
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        with transaction.atomic():
+            garbage = list(
+                PhotoBlob.objects.select_for_update()
+                .filter(ref_count=0, last_referenced_at__lt=cutoff)
+                .values_list('id', 'path', 'size')
+            )
+            if not options['dry_run']:
+                PhotoBlob.objects.filter(id__in=[blob_id for blob_id, _, _ in garbage], ref_count=0).delete()
+
+        freed = 0
+        for _, path, size in garbage:
+            freed += size
+            if options['dry_run']:
+                self.stdout.write(f'  {path}')
+                continue
+            # Файлы удаляются после commit: строка уже не выдаётся новым загрузкам
+            for name in [path] + [rendition_path(path, rendition) for rendition in RENDITIONS]:
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} файлов: {len(garbage)}, {freed / 1024 / 1024:.1f} МБ'))
+
+    def recount(self, dry_run):
+        references = Counter()
+        for photos in OrderCompletion.objects.exclude(completion_photos=[]).values_list(
+            'completion_photos', flat=True
+        ).iterator():
+            references.update(set(photos))
+        # Завершения архивных заказов тоже ссылаются на файлы
+        for completion in ArchivedOrder.objects.filter(completion__isnull=False).values_list(
+            'completion', flat=True
+        ).iterator():
+            references.update(set(completion['fields'].get('completion_photos') or []))
+
+        changed = []
+        for blob in PhotoBlob.objects.only('id', 'path', 'ref_count').iterator():
+            if blob.ref_count != references[blob.path]:
+                blob.ref_count = references[blob.path]
+                changed.append(blob)
+        if not dry_run:
+            PhotoBlob.objects.bulk_update(changed, ['ref_count'], batch_size=1000)
+        self.stdout.write(f'Исправлено счётчиков ссылок: {len(changed)}')
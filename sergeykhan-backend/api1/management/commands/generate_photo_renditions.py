@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api1.completion_photos import process_completion_photos
+from api1.models import OrderCompletion
+
+
+class Command(BaseCommand):
+    help = 'Создаёт превью и веб-версии фотографий завершений, у которых они ещё не готовы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересоздать версии для всех завершений с фотографиями')
+        parser.add_argument('--limit', type=int, default=None, help='Обработать не больше N завершений')
+
+    def handle(self, *args, **options):
+        completions = OrderCompletion.objects.exclude(completion_photos=[]).order_by('id')
+        if not options['all']:
+            completions = completions.filter(photo_renditions_ready=False)
+        completion_ids = list(completions.values_list('id', flat=True)[:options['limit']])
+
+        processed = failed = 0
+        for completion_id in completion_ids:
+            if process_completion_photos(completion_id, force=options['all']):
+                processed += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано завершений: {processed}, с ошибками: {failed}'))
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from api1.finance_rollups import rebuild_rollups
+from api1.models import ArchivedOrder, OrderCompletion
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные финансовые итоги мастеров, кураторов и компании'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Начало периода YYYY-MM-DD (по умолчанию - первое завершение)')
+        parser.add_argument('--to', dest='date_to', help='Конец периода YYYY-MM-DD (по умолчанию - сегодня)')
+
+    def handle(self, *args, **options):
+        try:
+            date_to = datetime.strptime(options['date_to'], '%Y-%m-%d').date() if options['date_to'] else date.today()
+            if options['date_from']:
+                date_from = datetime.strptime(options['date_from'], '%Y-%m-%d').date()
+            else:
+                first = min(filter(None, [
+                    OrderCompletion.objects.aggregate(first=Min('review_date'))['first'],
+                    ArchivedOrder.objects.aggregate(first=Min('created_at'))['first'],
+                ]), default=None)
+                date_from = first.date() if first else date_to
+        except ValueError:
+            raise CommandError('Даты в формате YYYY-MM-DD')
+        if date_to < date_from:
+            raise CommandError('--to раньше --from')
+
+        days = rebuild_rollups(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f'Итоги пересчитаны за {date_from} - {date_to}: дней с данными {days}'))
@@ -0,0 +1,103 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+
+from api1.models import CustomUser, DistanceSettingsModel, ProfitDistributionSettings
+from api1.synthetic_data import build_dataset
+from benchmarks import runner
+from benchmarks import scenarios  # noqa: F401 - регистрирует сценарии
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарки основных эндпоинтов на отдельной тестовой базе (SQLite или PostgreSQL из DATABASE_URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            choices=sorted(runner.SCENARIOS),
+                            help='Сценарий (можно несколько раз); по умолчанию все')
+        parser.add_argument('--iterations', type=int, default=50, help='Замеряемых вызовов на сценарий')
+        parser.add_argument('--warmup', type=int, default=5, help='Вызовов прогрева на сценарий')
+        parser.add_argument('--masters', type=int, default=200, help='Мастеров в наборе данных')
+        parser.add_argument('--orders', type=int, default=5000, help='Заказов в наборе данных')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--compare', help='JSON с базовой линией для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p50/p95 относительно базовой линии (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(runner.SCENARIOS)
+        baseline = runner.load_report(options['compare']) if options['compare'] else None
+
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f'📦 Генерация данных: {options["masters"]} мастеров, {options["orders"]} заказов...')
+            context = self.prepare_context(options)
+            results = runner.run_all(
+                context, names, options['iterations'], options['warmup'],
+                progress=lambda name: self.stdout.write(f'⏱  {name}...'),
+                skipped=lambda name, vendors: self.stdout.write(f'⏭  {name}: только для {", ".join(vendors)}')
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = runner.build_report(
+            results,
+            masters=options['masters'],
+            orders=options['orders'],
+            seed=options['seed'],
+            iterations=options['iterations'],
+        )
+        self.print_results(results)
+
+        if options['output']:
+            runner.save_report(report, options['output'])
+            self.stdout.write(self.style.SUCCESS(f'✅ Результаты сохранены в {options["output"]}'))
+
+        if baseline:
+            rows = runner.compare_reports(baseline, report, options['threshold'])
+            regressions = self.print_comparison(rows)
+            if regressions:
+                raise CommandError(f'Регрессия производительности в {regressions} метриках')
+
+    def prepare_context(self, options):
+        dataset = build_dataset(masters=options['masters'], orders=options['orders'], seed=options['seed'])
+        DistanceSettingsModel.get_settings()
+        ProfitDistributionSettings.get_settings()
+        admin = CustomUser.objects.create_user(email='bench-admin@load.test', password=None, role='super-admin')
+        return {
+            'client': Client(),
+            'dataset': dataset,
+            'tokens': {
+                'admin': Token.objects.create(user=admin),
+                'curator': Token.objects.create(user=dataset['curators'][0]),
+                'master': Token.objects.create(user=dataset['masters'][0]),
+            },
+        }
+
+    def print_results(self, results):
+        self.stdout.write(f'\n{"scenario":45} {"p50 ms":>10} {"p95 ms":>10} {"req/s":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:45} {result["p50_ms"]:>10.2f} {result["p95_ms"]:>10.2f} {result["throughput_per_s"]:>10.2f}'
+            )
+
+    def print_comparison(self, rows):
+        regressions = 0
+        self.stdout.write('\nСравнение с базовой линией:')
+        for row in rows:
+            if row['metric'] is None:
+                self.stdout.write(f'  {row["scenario"]}: нет в базовой линии')
+                continue
+            line = (f'  {row["scenario"]} {row["metric"]}: {row["baseline"]:.2f} → '
+                    f'{row["current"]:.2f} ({row["change"] * 100:+.1f}%)')
+            if row['regression']:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
@@ -0,0 +1,85 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api1.jobs import registered_jobs, run_pending, schedule_daily, work
+
+
+def run_threads(threads, poll_interval, batch_size, names):
+    """Запускает потоки-воркеры и ждёт SIGINT/SIGTERM"""
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop_event.set())
+
+    workers = [
+        threading.Thread(
+            target=work, args=(stop_event, poll_interval, batch_size, names),
+            name=f'job-worker-{number}'
+        )
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры фоновой очереди задач (BackgroundJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None,
+                            help='Потоков в каждом процессе (по умолчанию JOB_WORKERS)')
+        parser.add_argument('--processes', type=int, default=1, help='Количество процессов')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Пауза между опросами пустой очереди, секунд')
+        parser.add_argument('--batch-size', type=int, default=1, help='Сколько задач забирать за раз')
+        parser.add_argument('--job', action='append', dest='names',
+                            help='Выполнять только задачи с этим именем (можно несколько)')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи в текущем процессе и выйти')
+
+    def handle(self, *args, **options):
+        names = options['names']
+        unknown = set(names or ()) - set(registered_jobs())
+        if unknown:
+            raise CommandError(f'Неизвестные задачи: {", ".join(sorted(unknown))}')
+
+        if options['once']:
+            processed = run_pending(names=names)
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {processed}'))
+            return
+
+        schedule_daily()
+        threads = options['threads'] or settings.JOB_WORKERS
+        if threads < 1 or options['processes'] < 1:
+            raise CommandError('--threads и --processes должны быть не меньше 1')
+        args = (threads, options['poll_interval'], options['batch_size'], names)
+        self.stdout.write(f'Воркеры: {options["processes"]} процесс(ов) x {threads} поток(ов)')
+
+        if options['processes'] == 1:
+            run_threads(*args)
+            return
+
+        # Соединения родителя не должны наследоваться дочерними процессами
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_threads, args=args, name=f'job-workers-{number}')
+            for number in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        # SIGTERM от платформы обрабатываем как Ctrl+C: дочерние процессы завершаются штатно
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
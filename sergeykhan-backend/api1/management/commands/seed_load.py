@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api1.models import CustomUser
+from api1.synthetic_data import build_dataset
+
+
+class Command(BaseCommand):
+    help = 'Генерирует нагрузочные данные пачками через bulk_create (детерминированно по --seed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--masters', type=int, default=500, help='Количество мастеров')
+        parser.add_argument('--warranty-masters', type=int, default=20, help='Количество гарантийных мастеров')
+        parser.add_argument('--curators', type=int, default=10, help='Количество кураторов')
+        parser.add_argument('--operators', type=int, default=10, help='Количество операторов')
+        parser.add_argument('--orders', type=int, default=100000, help='Количество заказов')
+        parser.add_argument('--days', type=int, default=14, help='Дней расписания вперёд')
+        parser.add_argument('--slots-per-day', type=int, default=8, help='Часовых слотов в день (с 09:00, максимум 12)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора; разные seed не конфликтуют по email')
+        parser.add_argument('--no-ledger', action='store_true', help='Не создавать финансовые записи')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['slots_per_day'] <= 12:
+            raise CommandError('--slots-per-day должно быть от 1 до 12')
+        if CustomUser.objects.filter(email__startswith=f's{options["seed"]}-').exists():
+            raise CommandError(f'Данные с seed={options["seed"]} уже сгенерированы, укажите другой --seed')
+
+        started = time.monotonic()
+        # Каждая пачка фиксируется отдельно (build_dataset), поэтому транзакция
+        # не растёт с объёмом; после сбоя запустите команду с другим --seed
+        dataset = build_dataset(
+            masters=options['masters'],
+            warrant_masters=options['warranty_masters'],
+            curators=options['curators'],
+            operators=options['operators'],
+            orders=options['orders'],
+            days=options['days'],
+            slots_per_day=options['slots_per_day'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            ledger=not options['no_ledger'],
+            progress=lambda message: self.stdout.write(f'  {message}'),
+        )
+
+        counts = dataset['counts']
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Сгенерировано за {time.monotonic() - started:.1f} с: '
+            f'{counts["orders"]} заказов, {counts["completions"]} завершений, '
+            f'{counts["slots"]} слотов, {counts["availability"]} записей расписания, '
+            f'{counts["ledger"]} финансовых записей'
+        ))
@@ -9,9 +9,17 @@ from django.db import transaction
 from django.db.models import Q, Count
 from django.core.exceptions import ValidationError
 
-from .models import MasterAvailability, Order, CustomUser
-from .serializers import MasterAvailabilitySerializer, MasterWorkloadSerializer
+from .models import MasterAvailability, AvailabilityTemplate, AvailabilityException, Order, CustomUser
+from .serializers import (
+    MasterAvailabilitySerializer, MasterWorkloadSerializer,
+    AvailabilityTemplateSerializer, AvailabilityExceptionSerializer
+)
 from .middleware import role_required
+from .availability import (
+    is_master_available, get_availability, get_master_slots, default_range_end, first_free_slots,
+    DEFAULT_HORIZON_DAYS
+)
+from .schedule_cache import bump_schedule_version
 
 
 @api_view(['GET', 'POST'])
@@ -94,6 +102,138 @@ def master_availability_detail(request, master_id, availability_id):
         return Response({'message': 'Availability slot deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
 
+def get_master_or_none(master_id):
+    return CustomUser.objects.filter(
+        id=master_id,
+        role__in=['master', 'garant-master', 'warrant-master']
+    ).first()
+
+
+@api_view(['GET', 'PUT'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@role_required(['curator', 'super-admin'])
+def master_availability_templates(request, master_id):
+    """
+    GET: Weekly availability templates of a master
+    PUT: Replace the whole weekly template set (list of templates)
+    """
+    master = get_master_or_none(master_id)
+    if master is None:
+        return Response({'error': 'Master not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        templates = AvailabilityTemplate.objects.filter(master=master)
+        return Response(AvailabilityTemplateSerializer(templates, many=True).data)
+
+    serializer = AvailabilityTemplateSerializer(data=request.data, many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    templates = [AvailabilityTemplate(master=master, **data) for data in serializer.validated_data]
+    for i, template in enumerate(templates):
+        for other in templates[i + 1:]:
+            if template.overlaps(other):
+                return Response(
+                    {'error': f'Templates overlap: {template.get_weekday_display()} '
+                              f'{template.start_time:%H:%M}-{template.end_time:%H:%M} and '
+                              f'{other.start_time:%H:%M}-{other.end_time:%H:%M}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+    with transaction.atomic():
+        AvailabilityTemplate.objects.filter(master=master).delete()
+        templates = AvailabilityTemplate.objects.bulk_create(templates)
+        # bulk_create не отправляет сигналы - кэш расписания сбрасываем явно
+        bump_schedule_version(master.id)
+    return Response(AvailabilityTemplateSerializer(templates, many=True).data)
+
+
+@api_view(['GET', 'POST', 'DELETE'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@role_required(['curator', 'super-admin'])
+def master_availability_exceptions(request, master_id):
+    """
+    GET: Upcoming days off of a master
+    POST: Add a day off ({date, reason})
+    DELETE: Remove a day off (?date=YYYY-MM-DD)
+    """
+    master = get_master_or_none(master_id)
+    if master is None:
+        return Response({'error': 'Master not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        exceptions = AvailabilityException.objects.filter(master=master, date__gte=timezone.now().date())
+        return Response(AvailabilityExceptionSerializer(exceptions, many=True).data)
+
+    if request.method == 'POST':
+        serializer = AvailabilityExceptionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        exception, created = AvailabilityException.objects.update_or_create(
+            master=master,
+            date=serializer.validated_data['date'],
+            defaults={'reason': serializer.validated_data.get('reason', '')}
+        )
+        return Response(
+            AvailabilityExceptionSerializer(exception).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    try:
+        day = datetime.strptime(request.query_params.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    AvailabilityException.objects.filter(master=master, date=day).delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@role_required(['curator', 'super-admin'])
+def master_availability_calendar(request, master_id):
+    """
+    GET: Effective availability of a master for ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    (concrete slots, days off and expanded weekly templates)
+    """
+    master = get_master_or_none(master_id)
+    if master is None:
+        return Response({'error': 'Master not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        date_from = request.query_params.get('from')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else timezone.now().date()
+        date_to = request.query_params.get('to')
+        date_to = (
+            datetime.strptime(date_to, '%Y-%m-%d').date() if date_to
+            else date_from + timedelta(days=DEFAULT_HORIZON_DAYS - 1)
+        )
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if date_to < date_from:
+        return Response({'error': '"to" must not be before "from"'}, status=status.HTTP_400_BAD_REQUEST)
+    if (date_to - date_from).days >= 366:
+        return Response({'error': 'Range is limited to one year'}, status=status.HTTP_400_BAD_REQUEST)
+
+    slots = [
+        {
+            'date': slot.date.isoformat(),
+            'start_time': slot.start_time.strftime('%H:%M'),
+            'end_time': slot.end_time.strftime('%H:%M'),
+            'source': 'override' if slot.availability_id else 'template',
+            'availability_id': slot.availability_id,
+        }
+        for slot in get_master_slots(master, date_from, date_to)
+    ]
+    return Response({
+        'master_id': master.id,
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'slots': slots,
+    })
+
+
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
@@ -112,59 +252,57 @@ def master_workload_detail(request, master_id):
     
     today = timezone.now().date()
     
-    # Get availability slots for future dates
-    availability_slots = MasterAvailability.objects.filter(
-        master=master,
-        date__gte=today
-    ).order_by('date', 'start_time')
+    # Concrete availability rows for future dates (template slots are added below)
+    overrides = {
+        slot.id: slot
+        for slot in MasterAvailability.objects.filter(master=master, date__gte=today).select_related('master')
+    }
     
-    # Get orders count by date
-    orders = Order.objects.filter(
+    # Future orders of the master in one query: counts by date and booked times
+    orders = list(Order.objects.filter(
         assigned_master=master,
         scheduled_date__gte=today
-    ).values('scheduled_date').annotate(count=Count('id'))
+    ).values_list('scheduled_date', 'scheduled_time'))
     
-    orders_count_by_date = {
-        str(order['scheduled_date']): order['count'] 
-        for order in orders if order['scheduled_date']
-    }
+    orders_count_by_date = {}
+    for scheduled_date, _ in orders:
+        orders_count_by_date[str(scheduled_date)] = orders_count_by_date.get(str(scheduled_date), 0) + 1
     
-    # Calculate next available slot
+    # Next available slot (concrete slots and weekly templates)
+    availability = get_availability([master], today, default_range_end(master, today))
+    availability_slots = [
+        dict(MasterAvailabilitySerializer(overrides[slot.availability_id]).data, source='override')
+        if slot.availability_id in overrides else {
+            'id': None,
+            'master': master.id,
+            'master_email': master.email,
+            'date': slot.date.isoformat(),
+            'start_time': slot.start_time.isoformat(),
+            'end_time': slot.end_time.isoformat(),
+            'created_at': None,
+            'updated_at': None,
+            'source': 'template',
+        }
+        for key in sorted(availability) for slot in availability[key]
+    ]
+    bookings = {master.id: [(day, at) for day, at in orders if at is not None]}
+    slot = first_free_slots(availability, bookings).get(master.id)
     next_available_slot = None
-    for slot in availability_slots:
-        date_str = str(slot.date)
-        orders_on_date = orders_count_by_date.get(date_str, 0)
-        
-        # Check if this slot has conflicts with existing orders
-        conflicting_orders = Order.objects.filter(
-            assigned_master=master,
-            scheduled_date=slot.date,
-            scheduled_time__gte=slot.start_time,
-            scheduled_time__lt=slot.end_time
-        ).count()
-        
-        if conflicting_orders == 0:
-            next_available_slot = {
-                'date': slot.date,
-                'start_time': slot.start_time,
-                'end_time': slot.end_time,
-                'orders_on_date': orders_on_date
-            }
-            break
-    
-    # Count today's orders
-    total_orders_today = Order.objects.filter(
-        assigned_master=master,
-        scheduled_date=today
-    ).count()
+    if slot:
+        next_available_slot = {
+            'date': slot.date,
+            'start_time': slot.start_time,
+            'end_time': slot.end_time,
+            'orders_on_date': orders_count_by_date.get(str(slot.date), 0)
+        }
     
     workload_data = {
         'master_id': master.id,
         'master_email': master.email,
-        'availability_slots': MasterAvailabilitySerializer(availability_slots, many=True).data,
+        'availability_slots': availability_slots,
         'orders_count_by_date': orders_count_by_date,
         'next_available_slot': next_available_slot,
-        'total_orders_today': total_orders_today
+        'total_orders_today': orders_count_by_date.get(str(today), 0)
     }
     
     return Response(workload_data)
@@ -177,50 +315,45 @@ def master_workload_detail(request, master_id):
 def all_masters_workload(request):
     """
     GET: Get workload summary for all masters
+
+    Fixed number of queries: masters, future availability (get_availability)
+    and future orders are loaded once, the next free slot of every master is
+    found by a sweep over its slots and booked times.
     """
-    masters = CustomUser.objects.filter(
+    masters = list(CustomUser.objects.filter(
         role__in=['master', 'garant-master', 'warrant-master']
-    )
-    masters_workload = []
+    ))
+    master_ids = [master.id for master in masters]
     
     today = timezone.now().date()
     
+    availability = get_availability(master_ids, today, default_range_end(None, today))
+    
+    bookings = {}
+    total_orders_today = {}
+    for master_id, scheduled_date, scheduled_time in Order.objects.filter(
+        assigned_master_id__in=master_ids,
+        scheduled_date__gte=today
+    ).values_list('assigned_master_id', 'scheduled_date', 'scheduled_time'):
+        if scheduled_time is not None:
+            bookings.setdefault(master_id, []).append((scheduled_date, scheduled_time))
+        if scheduled_date == today:
+            total_orders_today[master_id] = total_orders_today.get(master_id, 0) + 1
+    
+    free_slots = first_free_slots(availability, bookings)
+    
+    masters_workload = []
     for master in masters:
-        # Get next available slot
-        availability_slots = MasterAvailability.objects.filter(
-            master=master,
-            date__gte=today
-        ).order_by('date', 'start_time')
-        
-        next_available_slot = None
-        for slot in availability_slots:
-            # Check if this slot has conflicts with existing orders
-            conflicting_orders = Order.objects.filter(
-                assigned_master=master,
-                scheduled_date=slot.date,
-                scheduled_time__gte=slot.start_time,
-                scheduled_time__lt=slot.end_time
-            ).count()
-            
-            if conflicting_orders == 0:
-                next_available_slot = {
-                    'date': slot.date,
-                    'start_time': slot.start_time,
-                    'end_time': slot.end_time
-                }
-                break
-        
-        # Count today's orders
-        total_orders_today = Order.objects.filter(
-            assigned_master=master,
-            scheduled_date=today
-        ).count()
-        
+        slot = free_slots.get(master.id)
         masters_workload.append({
             'master_id': master.id,
             'master_email': master.email,
-            'next_available_slot': next_available_slot,
-            'total_orders_today': total_orders_today
+            'next_available_slot': {
+                'date': slot.date,
+                'start_time': slot.start_time,
+                'end_time': slot.end_time
+            } if slot else None,
+            'total_orders_today': total_orders_today.get(master.id, 0)
         })
     
     return Response(masters_workload)
@@ -257,15 +390,8 @@ def validate_order_scheduling(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Check if master has availability at this time
-    availability_slots = MasterAvailability.objects.filter(
-        master=master,
-        date=schedule_date,
-        start_time__lte=schedule_time,
-        end_time__gt=schedule_time
-    )
-    
-    if not availability_slots.exists():
+    # Check if master has availability at this time (слоты или шаблон)
+    if not is_master_available(master, schedule_date, schedule_time):
         return Response({
             'valid': False,
             'error': 'Master is not available at the requested time'
@@ -288,3 +414,136 @@ def validate_order_scheduling(request):
         'valid': True,
         'message': 'Time slot is available for scheduling'
     })
+
+
+SCHEDULING_BATCH_MAX_CANDIDATES = 500
+SCHEDULING_BATCH_MAX_DAYS = 31
+
+SCHEDULING_ERRORS = {
+    'unavailable': 'Master is not available at the requested time',
+    'booked': 'Master already has an order scheduled at this time',
+}
+
+
+def scheduling_error(availability, booked, master_id, day, at_time):
+    """Причина, по которой время нельзя занять ('unavailable'/'booked'), или None"""
+    slots = availability.get((master_id, day), [])
+    if not any(slot.start_time <= at_time < slot.end_time for slot in slots):
+        return 'unavailable'
+    if (master_id, day, at_time) in booked:
+        return 'booked'
+    return None
+
+
+def load_scheduling_state(master_ids, date_from, date_to):
+    """Доступность и занятые моменты мастеров за период: один обход индекса и один запрос заказов"""
+    availability = get_availability(master_ids, date_from, date_to)
+    booked = set(Order.objects.filter(
+        assigned_master_id__in=master_ids,
+        scheduled_date__range=(date_from, date_to),
+        scheduled_time__isnull=False
+    ).values_list('assigned_master_id', 'scheduled_date', 'scheduled_time'))
+    return availability, booked
+
+
+@api_view(['POST'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@role_required(['curator', 'super-admin'])
+def validate_order_scheduling_batch(request):
+    """
+    POST: Validate many (master, date, time) candidates at once
+
+    Either {"candidates": [{"master_id", "scheduled_date", "scheduled_time"}, ...]}
+    -> results in the same order, or {"date_from", "date_to", "master_ids"?}
+    -> validity matrix of every available slot start per master and date
+    (all masters when master_ids is omitted).
+    """
+    candidates = request.data.get('candidates')
+    if candidates is not None:
+        if not isinstance(candidates, list) or not candidates:
+            return Response({'error': 'candidates must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(candidates) > SCHEDULING_BATCH_MAX_CANDIDATES:
+            return Response(
+                {'error': f'At most {SCHEDULING_BATCH_MAX_CANDIDATES} candidates per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            parsed = [
+                (
+                    int(candidate['master_id']),
+                    datetime.strptime(candidate['scheduled_date'], '%Y-%m-%d').date(),
+                    datetime.strptime(candidate['scheduled_time'], '%H:%M:%S').time(),
+                )
+                for candidate in candidates
+            ]
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {'error': 'Every candidate needs master_id, scheduled_date (YYYY-MM-DD) and scheduled_time (HH:MM:SS)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        master_ids = set(CustomUser.objects.filter(
+            id__in={master_id for master_id, _, _ in parsed},
+            role__in=['master', 'garant-master', 'warrant-master']
+        ).values_list('id', flat=True))
+        availability, booked = load_scheduling_state(
+            master_ids, min(day for _, day, _ in parsed), max(day for _, day, _ in parsed)
+        )
+
+        results = []
+        for master_id, day, at_time in parsed:
+            reason = 'unknown_master' if master_id not in master_ids else scheduling_error(
+                availability, booked, master_id, day, at_time
+            )
+            result = {
+                'master_id': master_id,
+                'scheduled_date': day.strftime('%Y-%m-%d'),
+                'scheduled_time': at_time.strftime('%H:%M:%S'),
+                'valid': reason is None,
+            }
+            if reason:
+                result['error'] = SCHEDULING_ERRORS.get(reason, 'Master not found')
+            results.append(result)
+        return Response({'results': results})
+
+    try:
+        date_from = datetime.strptime(request.data.get('date_from', ''), '%Y-%m-%d').date()
+        date_to = datetime.strptime(request.data.get('date_to', ''), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'Provide candidates, or date_from and date_to in YYYY-MM-DD format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if date_to < date_from or (date_to - date_from).days >= SCHEDULING_BATCH_MAX_DAYS:
+        return Response(
+            {'error': f'date_to must be within {SCHEDULING_BATCH_MAX_DAYS} days after date_from'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    masters = CustomUser.objects.filter(role__in=['master', 'garant-master', 'warrant-master'])
+    if request.data.get('master_ids'):
+        try:
+            masters = masters.filter(id__in=[int(master_id) for master_id in request.data['master_ids']])
+        except (TypeError, ValueError):
+            return Response({'error': 'master_ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+    master_ids = list(masters.values_list('id', flat=True))
+    availability, booked = load_scheduling_state(master_ids, date_from, date_to)
+
+    matrix = {}
+    for (master_id, day), slots in sorted(availability.items()):
+        matrix.setdefault(str(master_id), {})[day.strftime('%Y-%m-%d')] = [
+            {
+                'start_time': slot.start_time.strftime('%H:%M:%S'),
+                'end_time': slot.end_time.strftime('%H:%M:%S'),
+                'valid': scheduling_error(availability, booked, master_id, day, slot.start_time) is None,
+            }
+            for slot in slots
+        ]
+    return Response({
+        'date_from': date_from.strftime('%Y-%m-%d'),
+        'date_to': date_to.strftime('%Y-%m-%d'),
+        'master_ids': master_ids,
+        'matrix': matrix,
+    })
+
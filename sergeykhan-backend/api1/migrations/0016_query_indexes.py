@@ -0,0 +1,53 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0015_merge_20250717_0839'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='masteravailability',
+            index=models.Index(fields=['master', 'date', 'start_time', 'end_time'], name='availability_master_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='masteravailability',
+            index=models.Index(fields=['date', 'master'], name='availability_date_master_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['assigned_master', 'status'], name='order_master_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['assigned_master', 'scheduled_date'], name='order_master_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['transferred_to', 'status'], name='order_transferred_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['scheduled_date', 'status'], name='order_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('assigned_master__isnull', True), ('status', 'новый')), fields=['-created_at'], name='order_new_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderslot',
+            index=models.Index(fields=['master', 'slot_date', 'status'], name='orderslot_master_date_st_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderslot',
+            index=models.Index(fields=['slot_date', 'status'], name='orderslot_date_status_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:03
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0016_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('master', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_exceptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Исключение из шаблона доступности',
+                'verbose_name_plural': 'Исключения из шаблона доступности',
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('master', 'date'), name='unique_master_availability_exception')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilityTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота'), (6, 'Воскресенье')], verbose_name='День недели')),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('slot_duration', models.DurationField(default=datetime.timedelta(seconds=3600), verbose_name='Длительность слота')),
+                ('valid_from', models.DateField(blank=True, null=True, verbose_name='Действует с')),
+                ('valid_until', models.DateField(blank=True, null=True, verbose_name='Действует по')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('master', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_templates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Шаблон доступности',
+                'verbose_name_plural': 'Шаблоны доступности',
+                'ordering': ['master', 'weekday', 'start_time'],
+                'indexes': [models.Index(fields=['master', 'weekday'], name='availability_tpl_master_idx')],
+            },
+        ),
+    ]
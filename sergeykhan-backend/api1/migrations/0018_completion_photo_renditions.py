@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0017_availability_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordercompletion',
+            name='photo_renditions_ready',
+            field=models.BooleanField(default=False, verbose_name='Превью фотографий готовы'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0020_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(max_length=25, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(verbose_name='Создан')),
+                ('assigned_master_id', models.BigIntegerField(blank=True, null=True, verbose_name='Мастер')),
+                ('transferred_to_id', models.BigIntegerField(blank=True, null=True, verbose_name='Гарантийный мастер')),
+                ('client_phone', models.CharField(max_length=20, verbose_name='Телефон клиента')),
+                ('final_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('data', models.JSONField(verbose_name='Заказ')),
+                ('completion', models.JSONField(blank=True, null=True, verbose_name='Завершение')),
+                ('slot', models.JSONField(blank=True, null=True, verbose_name='Слот')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Перенесён в архив')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архивные заказы',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='archived_order_status_idx'), models.Index(fields=['assigned_master_id', 'created_at'], name='archived_order_master_idx'), models.Index(fields=['client_phone'], name='archived_order_phone_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderLog',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('action', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('data', models.JSONField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='logs', to='api1.archivedorder')),
+            ],
+            options={
+                'verbose_name': 'Лог архивного заказа',
+                'verbose_name_plural': 'Логи архивных заказов',
+                'indexes': [models.Index(fields=['order', 'created_at'], name='archived_order_log_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0021_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyDailyFinance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Получено')),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Расходы')),
+                ('net_profit', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Чистая прибыль')),
+                ('master_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Мастеру к выплате')),
+                ('master_balance', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Мастеру на баланс')),
+                ('curator_share', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Куратору')),
+                ('company_share', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Компании')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Финансы компании за день',
+                'verbose_name_plural': 'Финансы компании по дням',
+            },
+        ),
+        migrations.AlterField(
+            model_name='archivedorderlog',
+            name='action',
+            field=models.CharField(max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='orderlog',
+            name='action',
+            field=models.CharField(choices=[('created', 'Заказ создан'), ('status_changed', 'Статус изменен'), ('master_assigned', 'Мастер назначен'), ('master_removed', 'Мастер снят'), ('transferred', 'Переведен на гарантию'), ('completed', 'Завершен'), ('deleted', 'Удален'), ('updated', 'Обновлен'), ('cost_updated', 'Стоимость обновлена'), ('approved', 'Одобрен')], max_length=30),
+        ),
+        migrations.CreateModel(
+            name='CuratorDailyFinance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Получено')),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Расходы')),
+                ('net_profit', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Чистая прибыль')),
+                ('master_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Мастеру к выплате')),
+                ('master_balance', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Мастеру на баланс')),
+                ('curator_share', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Куратору')),
+                ('company_share', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Компании')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('curator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_curator_finance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Финансы куратора за день',
+                'verbose_name_plural': 'Финансы кураторов по дням',
+                'constraints': [models.UniqueConstraint(fields=('curator', 'date'), name='unique_curator_daily_finance')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MasterDailyFinance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Получено')),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Расходы')),
+                ('net_profit', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Чистая прибыль')),
+                ('master_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Мастеру к выплате')),
+                ('master_balance', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Мастеру на баланс')),
+                ('curator_share', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Куратору')),
+                ('company_share', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Компании')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('master', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_finance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Финансы мастера за день',
+                'verbose_name_plural': 'Финансы мастеров по дням',
+                'constraints': [models.UniqueConstraint(fields=('master', 'date'), name='unique_master_daily_finance')],
+            },
+        ),
+    ]
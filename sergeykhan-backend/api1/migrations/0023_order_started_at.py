@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0022_daily_finance_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Начат'),
+        ),
+    ]
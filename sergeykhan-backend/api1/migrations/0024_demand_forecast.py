@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0023_order_started_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('orders', models.FloatField(verbose_name='Ожидаемое число заказов')),
+                ('hourly', models.JSONField(default=list, verbose_name='По часам (0-23)')),
+                ('generated_at', models.DateTimeField(auto_now=True, verbose_name='Рассчитан')),
+            ],
+            options={
+                'verbose_name': 'Прогноз спроса',
+                'verbose_name_plural': 'Прогнозы спроса',
+                'ordering': ['date'],
+            },
+        ),
+    ]
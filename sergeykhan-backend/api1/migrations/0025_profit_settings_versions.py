@@ -0,0 +1,64 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+PERCENT_FIELDS = ['master_paid_percent', 'master_balance_percent', 'curator_percent', 'company_percent']
+
+
+def create_initial_versions(apps, schema_editor):
+    """
+    Первые версии из текущих настроек: глобальные - с даты последнего изменения
+    (более ранние даты тоже разрешаются в самую раннюю глобальную версию),
+    индивидуальные - с даты создания настроек мастера.
+    """
+    ProfitDistributionSettings = apps.get_model('api1', 'ProfitDistributionSettings')
+    MasterProfitSettings = apps.get_model('api1', 'MasterProfitSettings')
+    ProfitSettingsVersion = apps.get_model('api1', 'ProfitSettingsVersion')
+
+    versions = [
+        ProfitSettingsVersion(effective_from=settings.updated_at,
+                              **{field: getattr(settings, field) for field in PERCENT_FIELDS})
+        for settings in ProfitDistributionSettings.objects.filter(id=1)
+    ]
+    versions += [
+        ProfitSettingsVersion(master_id=settings.master_id, effective_from=settings.created_at,
+                              is_active=settings.is_active, settings_id=settings.id,
+                              **{field: getattr(settings, field) for field in PERCENT_FIELDS})
+        for settings in MasterProfitSettings.objects.all()
+    ]
+    ProfitSettingsVersion.objects.bulk_create(versions)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0024_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfitSettingsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateTimeField(verbose_name='Действует с')),
+                ('master_paid_percent', models.PositiveIntegerField(default=0)),
+                ('master_balance_percent', models.PositiveIntegerField(default=0)),
+                ('curator_percent', models.PositiveIntegerField(default=0)),
+                ('company_percent', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('settings_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('master', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='profit_settings_versions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Версия настроек распределения прибыли',
+                'verbose_name_plural': 'Версии настроек распределения прибыли',
+                'ordering': ['effective_from', 'id'],
+                'indexes': [models.Index(fields=['master', 'effective_from'], name='profit_version_master_idx')],
+            },
+        ),
+        migrations.RunPython(create_initial_versions, migrations.RunPython.noop),
+    ]
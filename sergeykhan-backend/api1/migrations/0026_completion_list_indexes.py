@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0025_profit_settings_versions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordercompletion',
+            index=models.Index(condition=models.Q(('status', 'ожидает_проверки')), fields=['-created_at', '-id'], name='completion_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordercompletion',
+            index=models.Index(fields=['master', '-created_at', '-id'], name='completion_master_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordercompletion',
+            index=models.Index(fields=['-created_at', '-id'], name='completion_created_idx'),
+        ),
+    ]
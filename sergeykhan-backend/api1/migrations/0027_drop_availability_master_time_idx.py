@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0026_completion_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='masteravailability',
+            name='availability_master_time_idx',
+        ),
+    ]
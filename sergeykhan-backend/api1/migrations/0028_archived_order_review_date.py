@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-19 13:34
+
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def fill_review_dates(apps, schema_editor):
+    """review_date уже архивированных распределённых завершений - из JSON завершения"""
+    ArchivedOrder = apps.get_model('api1', 'ArchivedOrder')
+    changed = []
+    for archived in ArchivedOrder.objects.filter(completion__isnull=False).only('id', 'completion').iterator():
+        fields = archived.completion['fields']
+        if fields['status'] == 'одобрен' and fields['is_distributed'] and fields['review_date']:
+            archived.review_date = parse_datetime(fields['review_date'])
+            changed.append(archived)
+    ArchivedOrder.objects.bulk_update(changed, ['review_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api1', '0027_drop_availability_master_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='review_date',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Завершение проверено'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(condition=models.Q(('review_date__isnull', False)), fields=['review_date'], name='archived_order_review_idx'),
+        ),
+        migrations.RunPython(fill_review_dates, migrations.RunPython.noop),
+    ]
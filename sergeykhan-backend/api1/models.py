@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager, Permission
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from decimal import Decimal
@@ -160,6 +161,24 @@ class Order(models.Model):
     final_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     expenses = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Когда мастер начал работу (start_order); для аналитики времени до начала
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начат')
+
+    class Meta:
+        # Индексы под фильтры, которые реально используют вьюхи
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['assigned_master', 'status'], name='order_master_status_idx'),
+            models.Index(fields=['assigned_master', 'scheduled_date'], name='order_master_date_idx'),
+            models.Index(fields=['transferred_to', 'status'], name='order_transferred_status_idx'),
+            models.Index(fields=['scheduled_date', 'status'], name='order_date_status_idx'),
+            # Лента новых заказов для мастеров (get_visible_orders_for_master)
+            models.Index(
+                fields=['-created_at'],
+                name='order_new_feed_idx',
+                condition=models.Q(status='новый', assigned_master__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.client_name} ({self.status})"
@@ -197,18 +216,9 @@ class Order(models.Model):
         Использует индивидуальные настройки мастера, если есть и активны,
         иначе глобальные настройки.
         """
-        if self.assigned_master:
-            return MasterProfitSettings.get_settings_for_master(self.assigned_master)
-        else:
-            # Если мастер не назначен, используем глобальные настройки
-            global_settings = ProfitDistributionSettings.get_settings()
-            return {
-                'master_paid_percent': global_settings.master_paid_percent,
-                'master_balance_percent': global_settings.master_balance_percent,
-                'curator_percent': global_settings.curator_percent,
-                'company_percent': global_settings.company_percent,
-                'is_individual': False,
-                'settings_id': None            }
+        # Если мастер не назначен, используем глобальные настройки
+        from .profit_settings import resolve_profit_settings
+        return resolve_profit_settings(self.assigned_master_id)
 
 
 class BalanceLog(models.Model):
@@ -513,7 +523,8 @@ class OrderLog(models.Model):
     )
     
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='logs')
-    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    # Вьюхи пишут и действия вне ACTION_CHOICES (distribution_completed, completed_transferred ...)
+    action = models.CharField(max_length=30, choices=ACTION_CHOICES)
     performed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     description = models.TextField()
     old_value = models.TextField(null=True, blank=True)  # Старое значение
@@ -577,6 +588,11 @@ class MasterAvailability(models.Model):
                 name='unique_master_availability'
             )
         ]
+        # Поиск слота мастера по дате и времени покрывает unique_master_availability
+        indexes = [
+            # Сводки по всем мастерам на дату
+            models.Index(fields=['date', 'master'], name='availability_date_master_idx'),
+        ]
     
     def clean(self):
         from django.core.exceptions import ValidationError
@@ -611,6 +627,110 @@ class MasterAvailability(models.Model):
         return f"{self.master.email} - {self.date} ({self.start_time}-{self.end_time})"
 
 
+class AvailabilityTemplate(models.Model):
+    """
+    Еженедельный шаблон доступности мастера (например, Пн-Сб 09:00-21:00).
+
+    Шаблон не создаёт строк MasterAvailability: слоты разворачиваются по запросу
+    (см. api1/availability.py). Конкретные MasterAvailability на дату и
+    AvailabilityException переопределяют шаблон на эту дату.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+        (6, 'Воскресенье'),
+    ]
+
+    master = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='availability_templates'
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name='День недели')
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_duration = models.DurationField(default=timedelta(hours=1), verbose_name='Длительность слота')
+    valid_from = models.DateField(null=True, blank=True, verbose_name='Действует с')
+    valid_until = models.DateField(null=True, blank=True, verbose_name='Действует по')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['master', 'weekday', 'start_time']
+        indexes = [
+            models.Index(fields=['master', 'weekday'], name='availability_tpl_master_idx'),
+        ]
+        verbose_name = 'Шаблон доступности'
+        verbose_name_plural = 'Шаблоны доступности'
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValidationError("End time must be after start time")
+        if self.slot_duration is not None and self.slot_duration <= timedelta(0):
+            raise ValidationError("Slot duration must be positive")
+        if self.valid_from and self.valid_until and self.valid_from > self.valid_until:
+            raise ValidationError("valid_until must not be before valid_from")
+
+        # Шаблоны мастера на тот же день недели не должны пересекаться по времени и сроку действия
+        if self.master_id and self.start_time and self.end_time:
+            overlapping = AvailabilityTemplate.objects.filter(
+                master_id=self.master_id,
+                weekday=self.weekday,
+                start_time__lt=self.end_time,
+                end_time__gt=self.start_time
+            ).exclude(pk=self.pk)
+            if self.valid_until:
+                overlapping = overlapping.filter(models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=self.valid_until))
+            if self.valid_from:
+                overlapping = overlapping.filter(models.Q(valid_until__isnull=True) | models.Q(valid_until__gte=self.valid_from))
+            if overlapping.exists():
+                raise ValidationError("This template overlaps with an existing template")
+
+    def overlaps(self, other):
+        """Пересекается ли шаблон с other: тот же день недели, время и срок действия"""
+        return (
+            self.weekday == other.weekday
+            and self.start_time < other.end_time and other.start_time < self.end_time
+            and (not self.valid_until or not other.valid_from or other.valid_from <= self.valid_until)
+            and (not self.valid_from or not other.valid_until or other.valid_until >= self.valid_from)
+        )
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.master.email} - {self.get_weekday_display()} ({self.start_time}-{self.end_time})"
+
+
+class AvailabilityException(models.Model):
+    """Выходной мастера: шаблон доступности на эту дату не применяется"""
+    master = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='availability_exceptions'
+    )
+    date = models.DateField()
+    reason = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['master', 'date'], name='unique_master_availability_exception')
+        ]
+        verbose_name = 'Исключение из шаблона доступности'
+        verbose_name_plural = 'Исключения из шаблона доступности'
+
+    def __str__(self):
+        return f"{self.master.email} - {self.date} (выходной)"
+
+
 # Order Completion Model - новая модель для завершения заказов мастером
 class OrderCompletion(models.Model):
     COMPLETION_STATUS_CHOICES = [
@@ -625,6 +745,8 @@ class OrderCompletion(models.Model):
     # Данные о завершении работы
     work_description = models.TextField(verbose_name="Описание выполненных работ")
     completion_photos = models.JSONField(default=list, blank=True, verbose_name="Фотографии выполненных работ")
+    # Превью и веб-версии фотографий создаются фоновыми воркерами (api1/completion_photos.py)
+    photo_renditions_ready = models.BooleanField(default=False, verbose_name="Превью фотографий готовы")
     
     # Финансовые данные
     parts_expenses = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Расходы на запчасти (₸)")
@@ -664,8 +786,8 @@ class OrderCompletion(models.Model):
         if not master:
             return None
             
-        # Получаем индивидуальные настройки мастера или глобальные
-        settings = MasterProfitSettings.get_settings_for_master(master)
+        # Получаем индивидуальные настройки мастера или глобальные, действовавшие на момент проверки
+        settings = MasterProfitSettings.get_settings_for_master(master, at=self.review_date)
         
         # Используем новые поля для распределения
         master_immediate = self.net_profit * (Decimal(settings['master_paid_percent']) / 100)
@@ -696,11 +818,85 @@ class OrderCompletion(models.Model):
     class Meta:
         verbose_name = "Завершение заказа"
         verbose_name_plural = "Завершения заказов"
+        indexes = [
+            # Очередь куратора: только ожидающие проверки, в порядке keyset-пагинации
+            models.Index(fields=['-created_at', '-id'], name='completion_pending_idx',
+                         condition=models.Q(status='ожидает_проверки')),
+            models.Index(fields=['master', '-created_at', '-id'], name='completion_master_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='completion_created_idx'),
+        ]
     
     def __str__(self):
         return f"Завершение заказа {self.order.id} мастером {self.master.email if self.master else 'не указан'}"
 
 
+class PhotoBlob(models.Model):
+    """
+    Файл фотографии в хранилище, адресуемый по SHA-256 содержимого.
+
+    Одинаковые загрузки ссылаются на один файл. ref_count - число завершений
+    заказов, в completion_photos которых есть этот путь; файлы без ссылок
+    удаляет команда gc_completion_photos.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255, unique=True, verbose_name="Путь в хранилище")
+    size = models.PositiveIntegerField(verbose_name="Размер (байт)")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Число ссылок")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(auto_now_add=True, verbose_name="Последняя ссылка")
+
+    class Meta:
+        verbose_name = "Файл фотографии"
+        verbose_name_plural = "Файлы фотографий"
+
+    def __str__(self):
+        return f"{self.path} ({self.ref_count})"
+
+
+class BackgroundJob(models.Model):
+    """
+    Задача фоновой очереди (api1/jobs.py). Воркеры забирают задачи через
+    SELECT ... FOR UPDATE SKIP LOCKED, поэтому внешний брокер не нужен.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Аргументы")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    idempotency_key = models.CharField(
+        max_length=255, unique=True, null=True, blank=True,
+        verbose_name="Ключ идемпотентности"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name="Максимум попыток")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Выполнить не раньше")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            # Очередь на выборку: только незавершённые задачи
+            models.Index(
+                fields=['run_at', 'id'], name='job_queue_idx',
+                condition=models.Q(status__in=['pending', 'running'])
+            ),
+        ]
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
 # Модель для логирования финансовых транзакций
 class FinancialTransaction(models.Model):
     TRANSACTION_TYPES = [
@@ -853,39 +1049,67 @@ class MasterProfitSettings(models.Model):
         return self.master_paid_percent + self.master_balance_percent
     
     @staticmethod
-    def get_settings_for_master(master):
+    def get_settings_for_master(master, at=None):
         """
         Получить настройки распределения для конкретного мастера.
         Если у мастера нет индивидуальных настроек или они неактивны,
-        возвращает глобальные настройки.
+        возвращает глобальные настройки. at - момент времени (по умолчанию - сейчас).
         """
-        try:
-            settings = MasterProfitSettings.objects.get(master=master, is_active=True)
-            return {
-                'master_paid_percent': settings.master_paid_percent,
-                'master_balance_percent': settings.master_balance_percent,
-                'curator_percent': settings.curator_percent,
-                'company_percent': settings.company_percent,
-                'is_individual': True,
-                'settings_id': settings.id
-            }
-        except MasterProfitSettings.DoesNotExist:
-            # Используем глобальные настройки
-            global_settings = ProfitDistributionSettings.get_settings()
-            return {
-                'master_paid_percent': global_settings.master_paid_percent,
-                'master_balance_percent': global_settings.master_balance_percent,
-                'curator_percent': global_settings.curator_percent,
-                'company_percent': global_settings.company_percent,
-                'is_individual': False,
-                'settings_id': None
-            }
+        from .profit_settings import resolve_profit_settings
+        return resolve_profit_settings(master.id, at)
+
+    @staticmethod
+    def get_settings_for_masters(master_ids, at=None):
+        """
+        Настройки распределения для нескольких мастеров: {master_id: настройки}.
+        Берутся из версий настроек в памяти (api1/profit_settings.py) без запросов;
+        ключ None - глобальные настройки.
+        """
+        from .profit_settings import get_resolver
+        resolver = get_resolver()
+        return {master_id: resolver.resolve(master_id, at) for master_id in set(master_ids)}
     
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
 
 
+class ProfitSettingsVersion(models.Model):
+    """
+    Версия настроек распределения прибыли, действующая с effective_from.
+    master=None - глобальные настройки. Версия мастера с is_active=False -
+    с этого момента мастер работает по глобальным настройкам.
+    Версии пишут сигналы сохранения ProfitDistributionSettings и MasterProfitSettings
+    (api1/signals.py), читает - api1/profit_settings.py.
+    """
+    master = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='profit_settings_versions'
+    )
+    effective_from = models.DateTimeField(verbose_name='Действует с')
+    master_paid_percent = models.PositiveIntegerField(default=0)
+    master_balance_percent = models.PositiveIntegerField(default=0)
+    curator_percent = models.PositiveIntegerField(default=0)
+    company_percent = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    # id MasterProfitSettings, из которых создана версия мастера
+    settings_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Версия настроек распределения прибыли'
+        verbose_name_plural = 'Версии настроек распределения прибыли'
+        ordering = ['effective_from', 'id']
+        indexes = [models.Index(fields=['master', 'effective_from'], name='profit_version_master_idx')]
+
+    def __str__(self):
+        owner = f'мастер {self.master_id}' if self.master_id else 'глобальные'
+        return f'Настройки прибыли ({owner}) с {self.effective_from}'
+
+
 # Website Content Management Models
 class Service(models.Model):
     """Модель для услуг сайта"""
@@ -1060,6 +1284,10 @@ class OrderSlot(models.Model):
                 name='unique_master_daily_slot'
             )
         ]
+        indexes = [
+            models.Index(fields=['master', 'slot_date', 'status'], name='orderslot_master_date_st_idx'),
+            models.Index(fields=['slot_date', 'status'], name='orderslot_date_status_idx'),
+        ]
         verbose_name = 'Слот заказа'
         verbose_name_plural = 'Слоты заказов'
     
@@ -1216,18 +1444,146 @@ class MasterDailySchedule(models.Model):
         slots = self.get_all_slots()
         return len([slot for slot in slots if slot['is_occupied']])
     
+    # Расписание дня, пока мастер его не менял
+    DAY_DEFAULTS = {
+        'work_start_time': time(9, 0),   # 09:00
+        'work_end_time': time(21, 0),    # 21:00 (изменено с 17:00)
+        'slot_duration': timedelta(hours=2),
+        'max_slots': 12,  # Увеличено с 8 до 12 слотов (6 слотов по 2 часа = 12 часов)
+        'is_working_day': True
+    }
+    
+    def get_slot_count(self):
+        """Число слотов дня - столько же, сколько перебирает get_all_slots"""
+        from datetime import datetime
+        
+        if self.slot_duration <= timedelta(0):
+            return self.max_slots
+        day_length = datetime.combine(self.date, self.work_end_time) - datetime.combine(self.date, self.work_start_time)
+        return max(0, min(self.max_slots, day_length // self.slot_duration))
+    
     @classmethod
     def get_or_create_for_master_date(cls, master, date):
         """Получить или создать расписание для мастера на дату"""
         schedule, created = cls.objects.get_or_create(
             master=master,
             date=date,
-            defaults={
-                'work_start_time': time(9, 0),   # 09:00
-                'work_end_time': time(21, 0),    # 21:00 (изменено с 17:00)
-                'slot_duration': timedelta(hours=2),
-                'max_slots': 12,  # Увеличено с 8 до 12 слотов (6 слотов по 2 часа = 12 часов)
-                'is_working_day': True
-            }
+            defaults=cls.DAY_DEFAULTS
         )
         return schedule
+
+
+class ArchivedOrder(models.Model):
+    """
+    Заказ, перенесённый из Order в архив (api1/order_archive.py).
+
+    id совпадает с id исходного заказа. Строки заказа, завершения и слота
+    хранятся в data/completion/slot в формате django.core.serializers, поля
+    для фильтрации продублированы колонками.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    status = models.CharField(max_length=25, verbose_name="Статус")
+    created_at = models.DateTimeField(verbose_name="Создан")
+    assigned_master_id = models.BigIntegerField(null=True, blank=True, verbose_name="Мастер")
+    transferred_to_id = models.BigIntegerField(null=True, blank=True, verbose_name="Гарантийный мастер")
+    client_phone = models.CharField(max_length=20, verbose_name="Телефон клиента")
+    final_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Дата проверки распределённого завершения - для пересчёта финансовых итогов за период
+    review_date = models.DateTimeField(null=True, blank=True, verbose_name="Завершение проверено")
+    data = models.JSONField(verbose_name="Заказ")
+    completion = models.JSONField(null=True, blank=True, verbose_name="Завершение")
+    slot = models.JSONField(null=True, blank=True, verbose_name="Слот")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Перенесён в архив")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='archived_order_status_idx'),
+            models.Index(fields=['assigned_master_id', 'created_at'], name='archived_order_master_idx'),
+            models.Index(fields=['client_phone'], name='archived_order_phone_idx'),
+            models.Index(fields=['review_date'], name='archived_order_review_idx',
+                         condition=models.Q(review_date__isnull=False)),
+        ]
+        verbose_name = "Архивный заказ"
+        verbose_name_plural = "Архивные заказы"
+
+    def __str__(self):
+        return f"Archived order {self.id} ({self.status})"
+
+
+class ArchivedOrderLog(models.Model):
+    """Лог архивного заказа; id совпадает с id исходной строки OrderLog"""
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='logs')
+    action = models.CharField(max_length=30)
+    created_at = models.DateTimeField()
+    data = models.JSONField()
+
+    class Meta:
+        indexes = [models.Index(fields=['order', 'created_at'], name='archived_order_log_idx')]
+        verbose_name = "Лог архивного заказа"
+        verbose_name_plural = "Логи архивных заказов"
+
+
+class DailyFinanceRollup(models.Model):
+    """
+    Дневные суммы распределённых завершений (api1/finance_rollups.py).
+    Обновляются при распределении средств, пересобираются командой rebuild_finance_rollups.
+    """
+    date = models.DateField(verbose_name="Дата")
+    orders_count = models.PositiveIntegerField(default=0, verbose_name="Заказов")
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Получено")
+    expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Расходы")
+    net_profit = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Чистая прибыль")
+    master_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Мастеру к выплате")
+    master_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Мастеру на баланс")
+    curator_share = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Куратору")
+    company_share = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Компании")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class MasterDailyFinance(DailyFinanceRollup):
+    master = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_finance')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['master', 'date'], name='unique_master_daily_finance')]
+        verbose_name = "Финансы мастера за день"
+        verbose_name_plural = "Финансы мастеров по дням"
+
+
+class CuratorDailyFinance(DailyFinanceRollup):
+    curator = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_curator_finance')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['curator', 'date'], name='unique_curator_daily_finance')]
+        verbose_name = "Финансы куратора за день"
+        verbose_name_plural = "Финансы кураторов по дням"
+
+
+class CompanyDailyFinance(DailyFinanceRollup):
+    date = models.DateField(unique=True, verbose_name="Дата")
+
+    class Meta:
+        verbose_name = "Финансы компании за день"
+        verbose_name_plural = "Финансы компании по дням"
+
+
+class DemandForecast(models.Model):
+    """
+    Прогноз числа новых заказов на день (api1/demand_forecast.py);
+    пересчитывается ночной задачей capacity.demand_forecast.
+    """
+    date = models.DateField(unique=True, verbose_name="Дата")
+    orders = models.FloatField(verbose_name="Ожидаемое число заказов")
+    hourly = models.JSONField(default=list, verbose_name="По часам (0-23)")
+    generated_at = models.DateTimeField(auto_now=True, verbose_name="Рассчитан")
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = "Прогноз спроса"
+        verbose_name_plural = "Прогнозы спроса"
+
+    def __str__(self):
+        return f"{self.date}: {self.orders:.1f}"
@@ -0,0 +1,187 @@
+"""
+Архив старых заказов.
+
+Завершённые и отклонённые заказы старше ORDER_ARCHIVE_DAYS дней переносятся
+вместе с OrderCompletion, OrderSlot и OrderLog в ArchivedOrder/ArchivedOrderLog,
+чтобы списки, счётчики и агрегаты по Order работали только с «горячими»
+строками. Перенос идёт частями по batch_size заказов, каждая часть - в своей
+транзакции: строки архива пишутся bulk_create, исходные удаляются DELETE по id
+без загрузки связанных объектов.
+
+Финансовые транзакции и логи транзакций остаются на месте: ссылка на
+завершение/заказ обнуляется, а их id сохраняются в архиве. Фотографии
+архивных завершений продолжают учитываться в PhotoBlob.ref_count.
+
+Читать архив - через OrderRepository (api1/order_repository.py) и только для
+запросов истории; restore_order возвращает заказ в горячие таблицы.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedOrder, ArchivedOrderLog, FinancialTransaction, Order, OrderCompletion, OrderLog, OrderSlot,
+    TransactionLog
+)
+from .raw_delete import delete_rows
+from .schedule_cache import bump_schedule_version
+
+ARCHIVABLE_STATUSES = ['завершен', 'отклонен']
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_cutoff(days=None):
+    """Заказы, созданные раньше этого момента, можно переносить в архив"""
+    if days is None:
+        days = settings.ORDER_ARCHIVE_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    """Заказы для архива: финальный статус, старше cutoff, завершение проверено и распределено"""
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff).exclude(
+        Q(completion__status='ожидает_проверки')
+        | Q(completion__status='одобрен', completion__is_distributed=False)
+    )
+
+
+def _serialize(objects):
+    """{pk: строка в формате django.core.serializers}"""
+    return {row['pk']: row for row in json.loads(serializers.serialize('json', objects))}
+
+
+def archive_orders(cutoff=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """Переносит подходящие заказы в архив; возвращает число перенесённых заказов"""
+    cutoff = cutoff or archive_cutoff()
+    archived = 0
+    while True:
+        moved = _archive_batch(cutoff, batch_size)
+        if not moved:
+            return archived
+        archived += moved
+
+
+def _distributed_review_date(order):
+    """Дата проверки распределённого завершения заказа (по ней пересчитываются финансовые итоги)"""
+    completion = getattr(order, 'completion', None)
+    if completion is not None and completion.status == 'одобрен' and completion.is_distributed:
+        return completion.review_date
+    return None
+
+
+def _archive_batch(cutoff, batch_size):
+    with transaction.atomic():
+        orders = list(
+            archivable_orders(cutoff).select_for_update(of=('self',))
+            .select_related('completion', 'slot').order_by('id')[:batch_size]
+        )
+        if not orders:
+            return 0
+        order_ids = [order.id for order in orders]
+        completions = [order.completion for order in orders if hasattr(order, 'completion')]
+        slots = [order.slot for order in orders if hasattr(order, 'slot')]
+        logs = list(OrderLog.objects.filter(order_id__in=order_ids).order_by('id'))
+
+        order_rows = _serialize(orders)
+        completion_rows = _serialize(completions)
+        slot_rows = _serialize(slots)
+        transaction_ids = {}
+        for completion_id, transaction_id in FinancialTransaction.objects.filter(
+            order_completion_id__in=completion_rows
+        ).values_list('order_completion_id', 'id'):
+            transaction_ids.setdefault(completion_id, []).append(transaction_id)
+        transaction_log_ids = {}
+        for order_id, log_id in TransactionLog.objects.filter(order_id__in=order_ids).values_list('order_id', 'id'):
+            transaction_log_ids.setdefault(order_id, []).append(log_id)
+
+        for completion in completions:
+            completion_rows[completion.id]['transactions'] = transaction_ids.get(completion.id, [])
+        for order in orders:
+            order_rows[order.id]['transaction_logs'] = transaction_log_ids.get(order.id, [])
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order.id,
+                status=order.status,
+                created_at=order.created_at,
+                assigned_master_id=order.assigned_master_id,
+                transferred_to_id=order.transferred_to_id,
+                client_phone=order.client_phone,
+                final_cost=order.final_cost,
+                review_date=_distributed_review_date(order),
+                data=order_rows[order.id],
+                completion=completion_rows[order.completion.id] if hasattr(order, 'completion') else None,
+                slot=slot_rows[order.slot.id] if hasattr(order, 'slot') else None,
+            )
+            for order in orders
+        ])
+        ArchivedOrderLog.objects.bulk_create([
+            ArchivedOrderLog(id=log.id, order_id=log.order_id, action=log.action,
+                             created_at=log.created_at, data=row)
+            for log, row in zip(logs, _serialize(logs).values())
+        ])
+
+        # Ссылки на удаляемые строки из таблиц, которые остаются в горячем хранилище
+        FinancialTransaction.objects.filter(order_completion_id__in=completion_rows).update(order_completion=None)
+        TransactionLog.objects.filter(order_id__in=order_ids).update(order=None)
+
+        # DELETE без сигналов (api1/raw_delete.py), зависимые строки раньше заказов.
+        # completion_deleted намеренно не выполняется: ref_count фотографий не уменьшается,
+        # файлы остаются на учёте у архивного завершения (их учитывает gc_completion_photos --recount).
+        # masters_changed тоже не выполняется - кэш расписания сбрасывается ниже явно
+        for model, field in ((OrderLog, 'order_id'), (OrderSlot, 'order_id'), (OrderCompletion, 'order_id'),
+                             (Order, 'id')):
+            delete_rows(model.objects.filter(**{f'{field}__in': order_ids}))
+
+        bump_schedule_version(
+            *(slot.master_id for slot in slots),
+            *(order.assigned_master_id for order in orders),
+            *(order.transferred_to_id for order in orders),
+        )
+    return len(orders)
+
+
+def archived_order_instance(archived):
+    """
+    Несохраняемый Order из архивной строки с завершением и слотом в кэше связей,
+    чтобы сериализаторы заказов работали без запросов к горячим таблицам.
+    """
+    order = next(serializers.deserialize('python', [archived.data])).object
+    order.is_archived = True
+    for relation, row in (('completion', archived.completion), ('slot', archived.slot)):
+        related = next(serializers.deserialize('python', [row])).object if row else None
+        if related is not None:
+            related._state.fields_cache['order'] = order
+        order._state.fields_cache[relation] = related
+    return order
+
+
+def archived_order_logs(order_id):
+    """Логи архивного заказа (несохраняемые OrderLog), новые первыми"""
+    rows = ArchivedOrderLog.objects.filter(order_id=order_id).order_by('-created_at').values_list('data', flat=True)
+    return [deserialized.object for deserialized in serializers.deserialize('python', list(rows))]
+
+
+def restore_order(order_id):
+    """Возвращает заказ из архива в горячие таблицы; False, если в архиве его нет"""
+    with transaction.atomic():
+        archived = ArchivedOrder.objects.select_for_update().filter(id=order_id).first()
+        if archived is None:
+            return False
+        rows = [archived.data] + [row for row in (archived.completion, archived.slot) if row]
+        rows += list(archived.logs.order_by('id').values_list('data', flat=True))
+        for deserialized in serializers.deserialize('python', rows):
+            deserialized.save()
+
+        if archived.completion:
+            FinancialTransaction.objects.filter(id__in=archived.completion.get('transactions', [])).update(
+                order_completion_id=archived.completion['pk']
+            )
+        TransactionLog.objects.filter(id__in=archived.data.get('transaction_logs', [])).update(order_id=order_id)
+        archived.delete()
+    return True
@@ -0,0 +1,60 @@
+"""
+Чтение заказов с учётом архива (api1/order_archive.py).
+
+Обычные запросы работают только с горячей таблицей Order. Архив читается,
+когда его явно просят - запросы истории (?include_archived=1): сначала
+горячая таблица, затем ArchivedOrder.
+"""
+from .models import ArchivedOrder, Order, OrderLog
+from .order_archive import archived_order_instance, archived_order_logs
+
+# Поля, по которым можно фильтровать и горячие, и архивные заказы
+ARCHIVE_FILTER_FIELDS = {'id', 'status', 'created_at', 'assigned_master_id', 'transferred_to_id', 'client_phone'}
+
+
+def wants_history(request):
+    return request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+class OrderRepository:
+    """Заказы из горячей таблицы и, если include_archive, из архива"""
+
+    def __init__(self, include_archive=False):
+        self.include_archive = include_archive
+
+    @classmethod
+    def for_request(cls, request):
+        return cls(include_archive=wants_history(request))
+
+    def get(self, order_id):
+        """Заказ по id или None; архивный заказ - несохраняемый Order с is_archived=True"""
+        order = Order.objects.select_related('completion').filter(id=order_id).first()
+        if order is None and self.include_archive:
+            archived = ArchivedOrder.objects.filter(id=order_id).first()
+            if archived is not None:
+                order = archived_order_instance(archived)
+        return order
+
+    def filter(self, *, order_by='-created_at', **filters):
+        """
+        Список заказов по фильтрам; для архива допустимы только поля ARCHIVE_FILTER_FIELDS
+        (с lookup'ами: status__in, created_at__gte ...). Архивные заказы идут после горячих.
+        """
+        orders = list(Order.objects.filter(**filters).select_related('completion').order_by(order_by))
+        if self.include_archive:
+            unknown = {lookup.split('__')[0] for lookup in filters} - ARCHIVE_FILTER_FIELDS
+            if unknown:
+                raise ValueError(f'Archive cannot be filtered by: {", ".join(sorted(unknown))}')
+            orders += [
+                archived_order_instance(archived)
+                for archived in ArchivedOrder.objects.filter(**filters).order_by(order_by)
+            ]
+        return orders
+
+    def logs(self, order_id):
+        """Логи заказа (новые первыми) или None, если заказа нет"""
+        if Order.objects.filter(id=order_id).exists():
+            return list(OrderLog.objects.filter(order_id=order_id).select_related('performed_by').order_by('-created_at'))
+        if self.include_archive and ArchivedOrder.objects.filter(id=order_id).exists():
+            return archived_order_logs(order_id)
+        return None
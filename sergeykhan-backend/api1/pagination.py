@@ -0,0 +1,58 @@
+"""
+Keyset-пагинация списков по (created_at, id), новые первыми.
+
+Курсор - created_at и id последней строки страницы; следующая страница
+читается условием «строго раньше курсора» по индексу, без OFFSET, поэтому
+скорость не зависит от номера страницы, а новые строки не сдвигают страницы.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+def encode_cursor(row):
+    value = f'{row.created_at.isoformat()}|{row.id}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidPage('Invalid cursor') from e
+
+
+def wants_page(request):
+    """Постраничный ответ, только если клиент передал limit или cursor"""
+    return 'limit' in request.query_params or 'cursor' in request.query_params
+
+
+def keyset_page(queryset, request):
+    """
+    Страница queryset по ?limit=&cursor=: (строки, курсор следующей страницы или None).
+    InvalidPage при неверных параметрах.
+    """
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        raise InvalidPage('limit must be a number') from e
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise InvalidPage(f'limit must be from 1 to {MAX_PAGE_SIZE}')
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=row_id))
+
+    rows = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,132 @@
+"""
+Настройки распределения прибыли на любой момент времени.
+
+Каждое сохранение глобальных (ProfitDistributionSettings) или индивидуальных
+(MasterProfitSettings) настроек добавляет ProfitSettingsVersion с датой начала
+действия. Все версии загружаются одним запросом в резолвер в памяти процесса:
+настройки мастера на момент at - последняя версия мастера не позже at (если
+она активна), иначе последняя глобальная версия. Текущие настройки берутся из
+словаря, исторические - двоичным поиском, в обоих случаях без запросов.
+
+Версии только добавляются, поэтому резолвер привязан к отпечатку таблицы версий:
+id и дате начала последней строки (дата отличает строку с тем же id после отката на
+SQLite) - одна выборка по первичному ключу. Отпечаток сверяется с базой один раз за
+HTTP-запрос (request_started, см. api1/signals.py), вне запросов - не чаще раза в
+PROFIT_SETTINGS_RECHECK_SECONDS; сами разрешения запросов не делают. Так процесс
+видит изменения, сделанные любым другим процессом, без общего кэша.
+"""
+import threading
+import time
+from bisect import bisect_right
+
+from django.conf import settings as django_settings
+from django.utils import timezone
+
+from .models import ProfitDistributionSettings, ProfitSettingsVersion
+
+PERCENT_FIELDS = ['master_paid_percent', 'master_balance_percent', 'curator_percent', 'company_percent']
+_resolver = None
+# Сверка резолвера с базой в текущем потоке: время последней сверки и признак HTTP-запроса
+_check = threading.local()
+
+
+def profit_settings_version():
+    """Отпечаток набора версий - общий для всех процессов: (id, effective_from) последней версии"""
+    return ProfitSettingsVersion.objects.order_by('-id').values_list('id', 'effective_from').first()
+
+
+def start_request(**kwargs):
+    """Начало HTTP-запроса: отпечаток сверяется при первом разрешении и до конца запроса больше не сверяется"""
+    _check.checked_at = None
+    _check.in_request = True
+
+
+def finish_request(**kwargs):
+    _check.checked_at = None
+    _check.in_request = False
+
+
+def _resolver_is_fresh():
+    checked_at = getattr(_check, 'checked_at', None)
+    if _resolver is None or checked_at is None:
+        return False
+    if getattr(_check, 'in_request', False):
+        return True
+    return time.monotonic() - checked_at < django_settings.PROFIT_SETTINGS_RECHECK_SECONDS
+
+
+def record_version(master_id=None, settings=None, is_active=True):
+    """Новая версия с текущего момента: глобальная (master_id=None) или мастера"""
+    ProfitSettingsVersion.objects.create(
+        master_id=master_id,
+        effective_from=timezone.now(),
+        is_active=is_active,
+        settings_id=settings.id if master_id and settings else None,
+        **{field: getattr(settings, field) for field in PERCENT_FIELDS} if settings else {}
+    )
+    # Изменение в этом процессе видно сразу, не дожидаясь следующей сверки
+    _check.checked_at = None
+
+
+class SettingsResolver:
+    """Версии настроек по мастерам: {master_id или None: (даты начала, настройки)}"""
+
+    def __init__(self, versions, version):
+        self.version = version
+        self.timelines = {}
+        for row in versions:
+            starts, values = self.timelines.setdefault(row.master_id, ([], []))
+            starts.append(row.effective_from)
+            values.append(self._settings(row))
+        self.current = {master_id: values[-1] for master_id, (_, values) in self.timelines.items()}
+
+    @staticmethod
+    def _settings(row):
+        if row.master_id is not None and not row.is_active:
+            return None
+        return {
+            **{field: getattr(row, field) for field in PERCENT_FIELDS},
+            'is_individual': row.master_id is not None,
+            'settings_id': row.settings_id,
+        }
+
+    def _at(self, master_id, at):
+        starts, values = self.timelines[master_id]
+        index = bisect_right(starts, at) - 1
+        if index < 0:
+            # Раньше первой версии: для мастера - глобальные, для глобальных - самая ранняя версия
+            return None if master_id is not None else values[0]
+        return values[index]
+
+    def resolve(self, master_id, at=None):
+        """Настройки мастера (None - глобальные) на момент at (None - сейчас)"""
+        if master_id in self.timelines:
+            individual = self.current[master_id] if at is None else self._at(master_id, at)
+            if individual is not None:
+                return dict(individual)
+        return dict(self.current[None] if at is None else self._at(None, at))
+
+
+def get_resolver():
+    """Резолвер текущей версии настроек; версии перечитываются, только если отпечаток изменился"""
+    global _resolver
+    if _resolver_is_fresh():
+        return _resolver
+    version = profit_settings_version()
+    if _resolver is None or _resolver.version != version:
+        versions = list(ProfitSettingsVersion.objects.order_by('effective_from', 'id'))
+        if not any(row.master_id is None for row in versions):
+            # Глобальных версий ещё нет: get_settings создаёт настройки (сигнал пишет версию)
+            settings = ProfitDistributionSettings.get_settings()
+            if not ProfitSettingsVersion.objects.filter(master__isnull=True).exists():
+                record_version(settings=settings)
+            version = profit_settings_version()
+            versions = list(ProfitSettingsVersion.objects.order_by('effective_from', 'id'))
+        _resolver = SettingsResolver(versions, version)
+    _check.checked_at = time.monotonic()
+    return _resolver
+
+
+def resolve_profit_settings(master_id=None, at=None):
+    """Настройки распределения мастера на момент at в формате get_settings_for_master"""
+    return get_resolver().resolve(master_id, at)
@@ -0,0 +1,28 @@
+"""
+Массовое удаление строк одним DELETE без загрузки объектов.
+
+QuerySet.delete() сначала выбирает строки, чтобы отправить сигналы
+pre_delete/post_delete и выполнить каскады, - для очистки больших таблиц это
+лишние запросы и память. delete_rows выполняет
+DELETE FROM <таблица> WHERE <pk> IN (<запрос queryset>) через cursor.execute:
+сигналы и каскады Django НЕ выполняются. Вызывающий код сам сбрасывает кэш
+расписания (bump_schedule_version), удаляет зависимые строки раньше родительских
+и решает судьбу связанных данных (например, счётчиков ссылок фотографий).
+"""
+from django.db import connections
+
+
+def delete_rows(queryset):
+    """Удаляет строки queryset одним запросом без сигналов; возвращает число удалённых строк"""
+    model = queryset.model
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    if not queryset.query.is_sliced:
+        queryset = queryset.order_by()
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({sql})',
+            params
+        )
+        return cursor.rowcount
@@ -0,0 +1,60 @@
+"""
+Кэш ответов get_master_schedule.
+
+У каждого мастера есть версия расписания в кэше. Ключ ответа включает версию
+и окно дат, поэтому при изменении доступности, слотов или назначений мастера
+достаточно сменить версию - старые ответы больше не читаются и истекают сами.
+
+Версию меняют сигналы моделей (api1/signals.py) и явные вызовы после массовых
+записей (bulk_create, queryset.delete), которые сигналов не отправляют.
+Внутри транзакции версия меняется сразу и ещё раз после commit, чтобы ответ,
+собранный параллельным запросом по незафиксированным данным, не остался в кэше.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(master_id):
+    return f'master-schedule-version:{master_id}'
+
+
+def schedule_version(master_id):
+    """Текущая версия расписания мастера"""
+    key = _version_key(master_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _set_new_versions(master_ids):
+    cache.set_many({_version_key(master_id): uuid4().hex for master_id in master_ids}, None)
+
+
+def bump_schedule_version(*master_ids):
+    """Сбросить кэш расписания мастеров (id; None пропускаются)"""
+    master_ids = {master_id for master_id in master_ids if master_id is not None}
+    if not master_ids:
+        return
+    _set_new_versions(master_ids)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _set_new_versions(master_ids))
+
+
+def cached_schedule(master_id, date_from, date_to, build):
+    """
+    JSON-ответ расписания мастера за окно дат из кэша или собранный build().
+
+    build() возвращает bytes готового JSON или None, если ответ кэшировать нельзя.
+    """
+    key = f'master-schedule:{master_id}:{schedule_version(master_id)}:{date_from}:{date_to or ""}'
+    content = cache.get(key)
+    if content is None:
+        content = build()
+        if content is not None:
+            cache.set(key, content, getattr(settings, 'SCHEDULE_CACHE_SECONDS', 600))
+    return content
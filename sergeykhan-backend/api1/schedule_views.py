@@ -1,4 +1,4 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -6,8 +6,10 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.db import transaction
 import json
-from .models import CustomUser as User, MasterAvailability
+from .models import CustomUser as User, MasterAvailability, AvailabilityException
 from .serializers import MasterAvailabilitySerializer
+from .availability import default_range_end, get_master_slots, template_days
+from .schedule_cache import bump_schedule_version, cached_schedule
 from datetime import datetime, date
 import logging
 
@@ -51,7 +53,11 @@ def master_schedule_view(request, master_id=None):
             target_user = user
 
         if request.method == 'GET':
-            return get_master_schedule(target_user)
+            try:
+                date_from, date_to = parse_schedule_window(request)
+            except ValueError as e:
+                return JsonResponse({'error': f'Invalid date window: {e}'}, status=400)
+            return get_master_schedule(target_user, date_from, date_to)
         elif request.method == 'POST':
             # Только кураторы и супер-админы могут сохранять расписание
             if user.role not in ['curator', 'super-admin']:
@@ -62,56 +68,73 @@ def master_schedule_view(request, master_id=None):
         logger.error(f"Error in master_schedule_view: {str(e)}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
-def get_master_schedule(master_user):
-    """Получить расписание мастера из базы данных с реальными статусами слотов"""
+def parse_schedule_window(request):
+    """Окно дат из ?from=YYYY-MM-DD&to=YYYY-MM-DD; по умолчанию - с сегодняшнего дня без конца"""
+    date_from = request.GET.get('from')
+    date_to = request.GET.get('to')
+    date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else date.today()
+    date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+    if date_to and date_to < date_from:
+        raise ValueError('"to" must not be before "from"')
+    return date_from, date_to
+
+
+def get_master_schedule(master_user, date_from=None, date_to=None):
+    """
+    Расписание мастера с реальными статусами слотов за окно [date_from, date_to].
+
+    Без date_to - все конкретные слоты с date_from и шаблон на горизонт
+    планирования. Готовый JSON кэшируется до изменения расписания мастера.
+    """
+    date_from = date_from or date.today()
+    content = cached_schedule(
+        master_user.id, date_from, date_to,
+        lambda: build_master_schedule(master_user, date_from, date_to)
+    )
+    if content is None:
+        return JsonResponse({'error': 'Failed to get schedule'}, status=500)
+    return HttpResponse(content, content_type='application/json')
+
+
+def build_master_schedule(master_user, date_from, date_to):
+    """JSON-ответ расписания мастера (bytes) или None при ошибке"""
     try:
         from .models import Order, OrderSlot
         
-        # Получаем все доступные слоты мастера
-        availability_slots = MasterAvailability.objects.filter(
-            master=master_user,
-            date__gte=date.today()
-        ).order_by('date', 'start_time')
+        # Доступные слоты мастера: конкретные - все в окне, шаблон - на горизонт планирования
+        if date_to is None:
+            date_to = default_range_end(master_user, date_from)
+        availability_slots = get_master_slots(master_user, date_from, date_to)
         
-        # Получаем все заказы мастера со слотами (для обычных и гарантийных мастеров)
+        # Заказы мастера со слотами и без слотов, но с назначенным временем
+        # (для гарантийных мастеров - переданные им заказы)
+        order_slots = OrderSlot.objects.filter(
+            master=master_user,
+            slot_date__range=(date_from, date_to),
+            status__in=['reserved', 'confirmed', 'in_progress']
+        ).select_related('order')
         if master_user.role == 'warrant-master':
-            order_slots = OrderSlot.objects.filter(
-                master=master_user,
-                slot_date__gte=date.today(),
-                status__in=['reserved', 'confirmed', 'in_progress']
-            ).select_related('order')
-            
-            # Получаем заказы без OrderSlot но с назначенным временем для гарантийных мастеров
             orders_without_slots = Order.objects.filter(
                 transferred_to=master_user,
-                scheduled_date__gte=date.today(),
                 status__in=['передан на гарантию', 'выполняется', 'ожидает_подтверждения']
-            ).exclude(
-                id__in=order_slots.values_list('order_id', flat=True)
             )
         else:
-            order_slots = OrderSlot.objects.filter(
-                master=master_user,
-                slot_date__gte=date.today(),
-                status__in=['reserved', 'confirmed', 'in_progress']
-            ).select_related('order')
-            
-            # Получаем заказы без OrderSlot но с назначенным временем для обычных мастеров
             orders_without_slots = Order.objects.filter(
                 assigned_master=master_user,
-                scheduled_date__gte=date.today(),
                 status__in=['назначен', 'выполняется', 'ожидает_подтверждения']
-            ).exclude(
-                id__in=order_slots.values_list('order_id', flat=True)
             )
+        orders_without_slots = orders_without_slots.filter(
+            scheduled_date__range=(date_from, date_to)
+        ).exclude(
+            id__in=order_slots.values_list('order_id', flat=True)
+        )
         
-        # Создаем карту занятых слотов
+        # Карта занятых слотов по (дата, время начала с точностью до минуты)
         occupied_slots = {}
         
         # Добавляем слоты из OrderSlot
         for order_slot in order_slots:
-            slot_key = f"{order_slot.slot_date}_{order_slot.slot_time.strftime('%H:%M')}"
-            occupied_slots[slot_key] = {
+            occupied_slots[(order_slot.slot_date, order_slot.slot_time.replace(second=0, microsecond=0))] = {
                 'order_id': order_slot.order.id,
                 'client_name': order_slot.order.client_name,
                 'description': order_slot.order.description,
@@ -120,59 +143,51 @@ def get_master_schedule(master_user):
                 'slot_number': order_slot.slot_number
             }
         
-        # Добавляем заказы без OrderSlot
+        # Добавляем заказы без OrderSlot, не перезаписывая существующие OrderSlot
         for order in orders_without_slots:
             if order.scheduled_time:
-                slot_key = f"{order.scheduled_date}_{order.scheduled_time.strftime('%H:%M')}"
-                if slot_key not in occupied_slots:  # Не перезаписываем существующие OrderSlot
-                    occupied_slots[slot_key] = {
-                        'order_id': order.id,
-                        'client_name': order.client_name,
-                        'description': order.description,
-                        'status': 'reserved',  # По умолчанию зарезервирован
-                        'order_status': order.status,
-                        'slot_number': None
-                    }
+                occupied_slots.setdefault((order.scheduled_date, order.scheduled_time.replace(second=0, microsecond=0)), {
+                    'order_id': order.id,
+                    'client_name': order.client_name,
+                    'description': order.description,
+                    'status': 'reserved',  # По умолчанию зарезервирован
+                    'order_status': order.status,
+                    'slot_number': None
+                })
         
         # Группируем слоты по датам с правильными статусами
         schedule_by_date = {}
         for slot in availability_slots:
-            date_str = slot.date.strftime('%Y-%m-%d')
-            if date_str not in schedule_by_date:
-                schedule_by_date[date_str] = []
-            
-            slot_key = f"{slot.date}_{slot.start_time.strftime('%H:%M')}"
-            is_occupied = slot_key in occupied_slots
-            
+            order = occupied_slots.get((slot.date, slot.start_time.replace(second=0, microsecond=0)))
             slot_data = {
-                'id': slot.id,
+                'id': slot.availability_id,
                 'start_time': slot.start_time.strftime('%H:%M'),
                 'end_time': slot.end_time.strftime('%H:%M'),
-                'status': 'occupied' if is_occupied else 'free',
-                'created_at': slot.created_at.isoformat() if slot.created_at else None
+                'status': 'occupied' if order else 'free',
+                'created_at': slot.created_at.isoformat() if slot.created_at else None,
+                # Слоты шаблона не хранятся в базе: id и created_at у них null
+                'source': 'override' if slot.availability_id else 'template'
             }
             
             # Добавляем информацию о заказе если слот занят
-            if is_occupied:
-                slot_data['order'] = occupied_slots[slot_key]
+            if order:
+                slot_data['order'] = order
             
-            schedule_by_date[date_str].append(slot_data)
+            schedule_by_date.setdefault(slot.date, []).append(slot_data)
         
         # Формируем итоговое расписание
         schedule = []
-        for date_str, slots in schedule_by_date.items():
+        for slot_date, slots in schedule_by_date.items():
             # Подсчитываем статистику для дня
-            total_slots = len(slots)
-            occupied_slots_count = len([s for s in slots if s['status'] == 'occupied'])
-            free_slots_count = total_slots - occupied_slots_count
+            occupied_slots_count = sum(1 for s in slots if s['status'] == 'occupied')
             
             schedule.append({
-                'date': date_str,
+                'date': slot_date.strftime('%Y-%m-%d'),
                 'slots': slots,
                 'stats': {
-                    'total': total_slots,
+                    'total': len(slots),
                     'occupied': occupied_slots_count,
-                    'free': free_slots_count
+                    'free': len(slots) - occupied_slots_count
                 }
             })
         
@@ -181,11 +196,79 @@ def get_master_schedule(master_user):
             'schedule': schedule,
             'master_id': master_user.id,
             'master_email': master_user.email,
-            'total_slots': availability_slots.count()
-        })
+            'total_slots': len(availability_slots),
+            'from': date_from.strftime('%Y-%m-%d'),
+            'to': date_to.strftime('%Y-%m-%d')
+        }).content
     except Exception as e:
         logger.error(f"Error getting schedule for master {master_user.id}: {str(e)}")
-        return JsonResponse({'error': 'Failed to get schedule'}, status=500)
+        return None
+
+def find_overlapping_slots(slots):
+    """Первая пара пересекающихся интервалов (start, end) или None"""
+    ordered = sorted(slots)
+    for previous, current in zip(ordered, ordered[1:]):
+        if current[0] < previous[1]:
+            return previous, current
+    return None
+
+
+def replace_master_availability(master_user, days):
+    """
+    Приводит слоты мастера на переданные даты к нужному набору.
+
+    days - {дата: множество (start_time, end_time)}. Строки пишутся только для
+    переопределений: день, совпадающий с еженедельным шаблоном, хранится как
+    шаблон, а пустой день при непустом шаблоне - как AvailabilityException.
+
+    Существующие слоты читаются одним запросом, совпадающие остаются как есть,
+    лишние удаляются одним DELETE ... WHERE id IN, новые добавляются через
+    bulk_create. Число запросов не зависит от размера сетки.
+    Вызывать внутри transaction.atomic().
+    """
+    template = template_days(master_user, days)
+    days_off = [day for day, slots in days.items() if not slots and template[day]]
+    days = {day: set() if slots == template[day] else slots for day, slots in days.items()}
+
+    existing = MasterAvailability.objects.filter(
+        master=master_user,
+        date__in=list(days)
+    ).values_list('id', 'date', 'start_time', 'end_time')
+
+    keep = set()
+    stale_ids = []
+    for slot_id, slot_date, start_time, end_time in existing:
+        key = (slot_date, start_time, end_time)
+        if (start_time, end_time) in days[slot_date] and key not in keep:
+            keep.add(key)
+        else:
+            stale_ids.append(slot_id)
+
+    new_slots = [
+        MasterAvailability(master=master_user, date=slot_date, start_time=start_time, end_time=end_time)
+        for slot_date, slots in days.items()
+        for start_time, end_time in sorted(slots)
+        if (slot_date, start_time, end_time) not in keep
+    ]
+
+    # Сначала удаление: слот с тем же началом, но другим концом занимает тот же уникальный ключ
+    if stale_ids:
+        MasterAvailability.objects.filter(id__in=stale_ids).delete()
+    # bulk_create не вызывает save()/clean(), пересечения проверены до записи
+    MasterAvailability.objects.bulk_create(new_slots)
+
+    AvailabilityException.objects.filter(
+        master=master_user, date__in=list(days)
+    ).exclude(date__in=days_off).delete()
+    AvailabilityException.objects.bulk_create(
+        [AvailabilityException(master=master_user, date=day) for day in days_off],
+        ignore_conflicts=True
+    )
+    # bulk_create не отправляет сигналы - кэш расписания сбрасываем явно
+    bump_schedule_version(master_user.id)
+
+    return {'created': len(new_slots), 'deleted': len(stale_ids), 'unchanged': len(keep), 'days_off': len(days_off)}
+
 
 def save_master_schedule(request, master_user):
     """Сохранить расписание мастера в базу данных"""
@@ -195,21 +278,23 @@ def save_master_schedule(request, master_user):
         
         logger.info(f"Saving schedule for master {master_user.id}: {schedule_data}")
         
-        # Валидируем данные
+        # Валидируем данные и собираем нужный набор слотов по датам
+        days = {}
         for day_schedule in schedule_data:
             if 'date' not in day_schedule or 'slots' not in day_schedule:
                 return JsonResponse({'error': 'Invalid schedule format'}, status=400)
             
             # Проверяем формат даты
             try:
-                datetime.strptime(day_schedule['date'], '%Y-%m-%d')
+                schedule_date = datetime.strptime(day_schedule['date'], '%Y-%m-%d').date()
             except ValueError:
                 return JsonResponse({'error': 'Invalid date format'}, status=400)
             
             # Проверяем слоты
             if not isinstance(day_schedule['slots'], list):
                 return JsonResponse({'error': 'Slots must be a list'}, status=400)
-                
+            
+            day_slots = set()
             # Валидируем каждый слот
             for slot in day_schedule['slots']:
                 if 'start_time' not in slot or 'end_time' not in slot:
@@ -222,45 +307,36 @@ def save_master_schedule(request, master_user):
                         return JsonResponse({'error': 'End time must be after start time'}, status=400)
                 except ValueError:
                     return JsonResponse({'error': 'Invalid time format. Use HH:MM'}, status=400)
+                day_slots.add((start_time, end_time))
+            
+            # Прошлые даты не меняем
+            if schedule_date < date.today():
+                continue
+            days.setdefault(schedule_date, set()).update(day_slots)
+        
+        # Пересечения проверяем в памяти вместо clean() на каждый слот
+        for schedule_date, day_slots in days.items():
+            overlap = find_overlapping_slots(day_slots)
+            if overlap:
+                (start_a, end_a), (start_b, end_b) = overlap
+                return JsonResponse({
+                    'error': f'Slots {start_a:%H:%M}-{end_a:%H:%M} and {start_b:%H:%M}-{end_b:%H:%M} '
+                             f'overlap on {schedule_date}'
+                }, status=400)
         
         # Сохраняем в базу данных с транзакцией
         with transaction.atomic():
-            # Удаляем существующие слоты для будущих дат
-            dates_to_update = [day_schedule['date'] for day_schedule in schedule_data]
-            MasterAvailability.objects.filter(
-                master=master_user,
-                date__in=dates_to_update,
-                date__gte=date.today()
-            ).delete()
-            
-            # Создаем новые слоты
-            created_slots = []
-            for day_schedule in schedule_data:
-                schedule_date = datetime.strptime(day_schedule['date'], '%Y-%m-%d').date()
-                
-                # Проверяем, что дата не в прошлом
-                if schedule_date < date.today():
-                    continue
-                    
-                for slot in day_schedule['slots']:
-                    start_time = datetime.strptime(slot['start_time'], '%H:%M').time()
-                    end_time = datetime.strptime(slot['end_time'], '%H:%M').time()
-                    
-                    # Создаем слот
-                    availability_slot = MasterAvailability.objects.create(
-                        master=master_user,
-                        date=schedule_date,
-                        start_time=start_time,
-                        end_time=end_time
-                    )
-                    created_slots.append(availability_slot)
-            
-            logger.info(f"Successfully created {len(created_slots)} availability slots for master {master_user.id}")
+            result = replace_master_availability(master_user, days)
+        
+        logger.info(f"Saved schedule for master {master_user.id}: {result}")
         
         return JsonResponse({
             'success': True, 
-            'message': f'Schedule saved successfully. Created {len(created_slots)} slots.',
-            'created_slots': len(created_slots),
+            'message': f'Schedule saved successfully. Created {result["created"]} slots.',
+            'created_slots': result['created'],
+            'deleted_slots': result['deleted'],
+            'unchanged_slots': result['unchanged'],
+            'days_off': result['days_off'],
             'master_id': master_user.id
         })
         
@@ -269,16 +345,3 @@ def save_master_schedule(request, master_user):
     except Exception as e:
         logger.error(f"Error saving schedule for master {master_user.id}: {str(e)}")
         return JsonResponse({'error': f'Failed to save schedule: {str(e)}'}, status=500)
-        
-        return JsonResponse({
-            'success': True,
-            'message': 'Schedule saved successfully',
-            'master_id': master_user.id,
-            'saved_days': len(schedule_data)
-        })
-        
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
-    except Exception as e:
-        logger.error(f"Error saving schedule for master {master_user.id}: {str(e)}")
-        return JsonResponse({'error': 'Failed to save schedule'}, status=500)
@@ -1,8 +1,12 @@
 from rest_framework import serializers
 from django.utils import timezone
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from .completion_photos import MAX_PHOTOS, discard_files, enqueue_renditions, photo_url, store_photos
 from .models import (
     Order, CustomUser, Balance, BalanceLog, CalendarEvent, Contact, OrderLog, 
-    TransactionLog, MasterAvailability, CompanyBalance, CompanyBalanceLog, 
+    TransactionLog, MasterAvailability, AvailabilityTemplate, AvailabilityException,
+    CompanyBalance, CompanyBalanceLog, 
     OrderCompletion, FinancialTransaction, SystemLog, MasterProfitSettings,
     ProfitDistributionSettings, SiteSettings, Service, FeedbackRequest
 )
@@ -211,6 +215,31 @@ class MasterAvailabilitySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class AvailabilityTemplateSerializer(serializers.ModelSerializer):
+    weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+
+    class Meta:
+        model = AvailabilityTemplate
+        fields = ['id', 'weekday', 'weekday_display', 'start_time', 'end_time', 'slot_duration',
+                  'valid_from', 'valid_until', 'created_at', 'updated_at']
+        read_only_fields = ('created_at', 'updated_at')
+
+    def validate(self, data):
+        template = AvailabilityTemplate(**data)
+        try:
+            template.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return data
+
+
+class AvailabilityExceptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AvailabilityException
+        fields = ['id', 'date', 'reason', 'created_at']
+        read_only_fields = ('created_at',)
+
+
 class CompanyBalanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = CompanyBalance
@@ -248,12 +277,13 @@ class OrderCompletionSerializer(serializers.ModelSerializer):
     total_expenses = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     net_profit = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     completion_photos = serializers.SerializerMethodField()
+    photo_renditions = serializers.SerializerMethodField()
     submitted_at = serializers.SerializerMethodField()
     
     class Meta:
         model = OrderCompletion
         fields = [
-            'id', 'order', 'master', 'work_description', 'completion_photos', 
+            'id', 'order', 'master', 'work_description', 'completion_photos', 'photo_renditions',
             'parts_expenses', 'transport_costs', 'total_received', 'total_expenses', 
             'net_profit', 'completion_date', 'status', 'curator', 'curator_email', 
             'review_date', 'curator_notes', 'is_distributed', 'created_at', 
@@ -296,26 +326,72 @@ class OrderCompletionSerializer(serializers.ModelSerializer):
         return None
     
     def get_completion_photos(self, obj):
-        """Преобразуем относительные пути в полные URL"""
+        """
+        Полные URL фотографий: в списках - превью (если уже готовы),
+        в детальном ответе - оригиналы
+        """
         if not obj.completion_photos:
             return []
         
         request = self.context.get('request')
-        if request:
-            # Строим полные URL для каждой фотографии
-            photo_urls = []
-            for photo_path in obj.completion_photos:
-                if photo_path.startswith('completion_photos/'):
-                    # Путь уже содержит папку
-                    full_url = request.build_absolute_uri(f'/media/{photo_path}')
-                else:
-                    # Добавляем папку к пути
-                    full_url = request.build_absolute_uri(f'/media/completion_photos/{photo_path}')
-                photo_urls.append(full_url)
-            return photo_urls
-        
-        # Fallback: если нет request в контексте, возвращаем относительные пути
-        return obj.completion_photos
+        in_list = isinstance(self.parent, serializers.ListSerializer)
+        rendition = 'thumb' if in_list and obj.photo_renditions_ready else None
+        return [photo_url(path, request, rendition) for path in obj.completion_photos]
+    
+    def get_photo_renditions(self, obj):
+        """Оригинал, веб-версия и превью каждой фотографии (null, пока версии не готовы)"""
+        request = self.context.get('request')
+        return [
+            {
+                'original': photo_url(path, request),
+                'web': photo_url(path, request, 'web') if obj.photo_renditions_ready else None,
+                'thumb': photo_url(path, request, 'thumb') if obj.photo_renditions_ready else None,
+            }
+            for path in obj.completion_photos or []
+        ]
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Версии фотографий нужны только в детальном ответе
+        if isinstance(self.parent, serializers.ListSerializer):
+            data.pop('photo_renditions', None)
+        return data
+
+
+class OrderCompletionListSerializer(serializers.ModelSerializer):
+    """Короткое представление завершения для постраничных списков: без описания работ, только превью фото"""
+    order = serializers.SerializerMethodField()
+    master = serializers.SerializerMethodField()
+    photo_thumbs = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = OrderCompletion
+        fields = [
+            'id', 'order', 'master', 'status', 'total_received', 'total_expenses', 'net_profit',
+            'completion_date', 'review_date', 'is_distributed', 'created_at', 'photo_thumbs'
+        ]
+    
+    def get_order(self, obj):
+        return {
+            'id': obj.order.id,
+            'client_name': obj.order.client_name,
+            'address': obj.order.address,
+            'status': obj.order.status,
+        }
+    
+    def get_master(self, obj):
+        if not obj.master:
+            return None
+        return {
+            'id': obj.master.id,
+            'full_name': f"{obj.master.first_name} {obj.master.last_name}".strip() or obj.master.email,
+        }
+    
+    def get_photo_thumbs(self, obj):
+        """Превью фотографий (оригиналы, пока превью не готовы)"""
+        request = self.context.get('request')
+        rendition = 'thumb' if obj.photo_renditions_ready else None
+        return [photo_url(path, request, rendition) for path in obj.completion_photos or []]
 
 
 class OrderCompletionCreateSerializer(serializers.ModelSerializer):
@@ -343,13 +419,16 @@ class OrderCompletionCreateSerializer(serializers.ModelSerializer):
         
         return value
     
+    def validate(self, data):
+        """Количество фотографий проверяем до создания завершения"""
+        request = self.context.get('request')
+        if request and len(request.FILES.getlist('completion_photos')) > MAX_PHOTOS:
+            raise serializers.ValidationError({'completion_photos': f"Максимум {MAX_PHOTOS} фотографий"})
+        return data
+    
     def create(self, validated_data):
         """Создаем завершение заказа и обновляем статус заказа"""
-        import os
-        from django.conf import settings
         from django.utils import timezone
-        from datetime import datetime
-        import uuid
         
         request = self.context.get('request')
         validated_data['master'] = request.user
@@ -361,70 +440,26 @@ class OrderCompletionCreateSerializer(serializers.ModelSerializer):
         # Получаем фотографии из request.FILES напрямую
         completion_photos = request.FILES.getlist('completion_photos') if request else []
         
-        # Создаем завершение сначала без фотографий
-        completion = super().create(validated_data)
-        
-        # Валидация и сохранение фотографий (если есть)
-        if completion_photos:
-            # Проверяем количество фотографий
-            if len(completion_photos) > 5:
-                raise serializers.ValidationError("Максимум 5 фотографий")
-            
-            try:
-                # Создаем папку для фотографий завершения заказов, если её нет
-                completion_photos_dir = os.path.join(settings.MEDIA_ROOT, 'completion_photos')
-                os.makedirs(completion_photos_dir, exist_ok=True)
-                
-                photo_paths = []
-                for i, photo in enumerate(completion_photos):
-                    # Валидация файла
-                    if photo.size > 5 * 1024 * 1024:
-                        print(f"Файл {photo.name} слишком большой: {photo.size} байт")
-                        continue
-                    
-                    if not photo.content_type.startswith('image/'):
-                        print(f"Файл {photo.name} не является изображением: {photo.content_type}")
-                        continue
-                    
-                    # Генерируем уникальное имя файла
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    unique_id = str(uuid.uuid4())[:8]
-                    file_extension = os.path.splitext(photo.name)[1].lower()
-                    
-                    # Ограничиваем допустимые расширения
-                    allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-                    if file_extension not in allowed_extensions:
-                        file_extension = '.jpg'
-                    
-                    filename = f"completion_{completion.id}_{timestamp}_{unique_id}_{i}{file_extension}"
-                    file_path = os.path.join(completion_photos_dir, filename)
-                    
-                    # Сохраняем файл
-                    try:
-                        with open(file_path, 'wb') as f:
-                            for chunk in photo.chunks():
-                                f.write(chunk)
-                        
-                        # Сохраняем относительный путь (для URL)
-                        relative_path = f"completion_photos/{filename}"
-                        photo_paths.append(relative_path)
-                        print(f"Сохранен файл: {relative_path}")
-                    except Exception as e:
-                        print(f"Ошибка сохранения файла {photo.name}: {e}")
-                        continue
-                
-                # Обновляем completion с путями к фотографиям
-                completion.completion_photos = photo_paths
-                completion.save()
-                print(f"Сохранено {len(photo_paths)} фотографий")
-                
-            except Exception as e:
-                print(f"Ошибка обработки фотографий: {e}")
-                # Продолжаем без фотографий, если произошла ошибка
-        
-        # Обновляем статус заказа
-        completion.order.status = 'ожидает_подтверждения'
-        completion.order.save()
+        # Файлы, записанные в хранилище, удаляем, если транзакция откатится
+        written = []
+        try:
+            with transaction.atomic():
+                # Создаем завершение сначала без фотографий
+                completion = super().create(validated_data)
+
+                # Оригиналы пишутся в хранилище сразу, превью - фоновыми воркерами
+                if completion_photos:
+                    completion.completion_photos = store_photos(completion, completion_photos, written)
+                    if completion.completion_photos:
+                        completion.save(update_fields=['completion_photos'])
+                        enqueue_renditions(completion.id, completion.completion_photos)
+
+                # Обновляем статус заказа
+                completion.order.status = 'ожидает_подтверждения'
+                completion.order.save()
+        except Exception:
+            discard_files(written)
+            raise
         
         return completion
 
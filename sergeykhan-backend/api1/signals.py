@@ -0,0 +1,78 @@
+"""
+Сигналы моделей: сброс кэша расписания мастеров при изменении доступности,
+слотов и назначений; освобождение файлов фотографий удалённых завершений;
+версии настроек распределения прибыли и их сверка в начале запроса
+"""
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .completion_photos import release_photos
+from .models import (
+    AvailabilityException, AvailabilityTemplate, MasterAvailability, MasterProfitSettings, Order, OrderCompletion,
+    OrderSlot, ProfitDistributionSettings
+)
+from .profit_settings import finish_request, record_version, start_request
+from .schedule_cache import bump_schedule_version
+
+
+# Поля с id мастеров, чьё расписание зависит от строки модели
+SCHEDULE_MASTER_FIELDS = {
+    MasterAvailability: ('master_id',),
+    AvailabilityTemplate: ('master_id',),
+    AvailabilityException: ('master_id',),
+    OrderSlot: ('master_id',),
+    Order: ('assigned_master_id', 'transferred_to_id'),
+}
+
+
+def _master_ids(instance):
+    # Через __dict__, чтобы отложенные (.only/.defer) поля не подгружались запросом
+    return [instance.__dict__.get(field) for field in SCHEDULE_MASTER_FIELDS[type(instance)]]
+
+
+def remember_masters(sender, instance, **kwargs):
+    """Запоминает исходных мастеров, чтобы при переназначении сбросить и старого"""
+    instance._schedule_master_ids = _master_ids(instance)
+
+
+def masters_changed(sender, instance, **kwargs):
+    bump_schedule_version(*_master_ids(instance), *getattr(instance, '_schedule_master_ids', ()))
+    instance._schedule_master_ids = _master_ids(instance)
+
+
+for model in SCHEDULE_MASTER_FIELDS:
+    post_init.connect(remember_masters, sender=model, dispatch_uid=f'schedule-remember-{model.__name__}')
+    post_save.connect(masters_changed, sender=model, dispatch_uid=f'schedule-save-{model.__name__}')
+    post_delete.connect(masters_changed, sender=model, dispatch_uid=f'schedule-delete-{model.__name__}')
+
+
+def completion_deleted(sender, instance, **kwargs):
+    release_photos(instance.completion_photos)
+
+
+post_delete.connect(completion_deleted, sender=OrderCompletion, dispatch_uid='completion-photos-release')
+
+
+def global_profit_settings_saved(sender, instance, **kwargs):
+    # Действующие глобальные настройки - строка id=1 (ProfitDistributionSettings.get_settings)
+    if instance.pk == 1:
+        record_version(settings=instance)
+
+
+def master_profit_settings_saved(sender, instance, **kwargs):
+    record_version(instance.master_id, instance, is_active=instance.is_active)
+
+
+def master_profit_settings_deleted(sender, instance, **kwargs):
+    # Без индивидуальных настроек мастер с этого момента на глобальных
+    record_version(instance.master_id, is_active=False)
+
+
+post_save.connect(global_profit_settings_saved, sender=ProfitDistributionSettings,
+                  dispatch_uid='profit-settings-version-global')
+post_save.connect(master_profit_settings_saved, sender=MasterProfitSettings,
+                  dispatch_uid='profit-settings-version-master')
+post_delete.connect(master_profit_settings_deleted, sender=MasterProfitSettings,
+                    dispatch_uid='profit-settings-version-master-delete')
+request_started.connect(start_request, dispatch_uid='profit-settings-request-start')
+request_finished.connect(finish_request, dispatch_uid='profit-settings-request-finish')
@@ -0,0 +1,159 @@
+"""
+Атомарное резервирование слотов мастера.
+
+Проверка занятости и создание OrderSlot выполняются в одной транзакции под
+блокировкой строки MasterDailySchedule (select_for_update), поэтому параллельные
+назначения на один день мастера выполняются по очереди и видят слоты друг друга.
+Уникальный индекс unique_master_daily_slot остаётся последней линией защиты:
+IntegrityError перехватывается и резервирование повторяется.
+
+Слоты завершённых заказов удаляются одним запросом
+DELETE ... WHERE id IN (SELECT ...) (api1/raw_delete.py) или частями по batch_size строк
+(delete_completed_order_slots): команда cleanup_schedule и ночная задача
+schedule.cleanup_completed.
+"""
+from datetime import datetime
+
+from django.db import IntegrityError, models, transaction
+
+from .models import MasterDailySchedule, Order, OrderSlot
+from .raw_delete import delete_rows
+from .schedule_cache import bump_schedule_version
+
+
+ACTIVE_SLOT_STATUSES = ['reserved', 'confirmed', 'in_progress']
+RESERVE_ATTEMPTS = 3
+COMPLETED_ORDER_STATUSES = ['завершен', 'completed', 'принят']
+CLEANUP_BATCH_SIZE = 1000
+
+
+class SlotUnavailable(Exception):
+    """Слот уже занят или у мастера нет свободных слотов"""
+
+
+def slot_start_time(schedule, slot_number):
+    """Время начала слота по расписанию дня"""
+    start = datetime.combine(schedule.date, schedule.work_start_time)
+    return (start + schedule.slot_duration * (slot_number - 1)).time()
+
+
+def reserve_slot(order, master, slot_date, slot_numbers, slot_time=None, status='reserved',
+                 slot_duration=None, notes='', move_existing=False, check_time_conflict=False):
+    """
+    Занимает для заказа первый свободный слот из slot_numbers (в порядке предпочтения).
+
+    slot_time - время слота; если не указано, вычисляется по расписанию дня.
+    move_existing - если у заказа уже есть слот, перенести его, иначе SlotUnavailable.
+    check_time_conflict - не назначать, если у мастера уже есть заказ на это же время.
+
+    Заказу проставляются scheduled_date/scheduled_time слота, сохраняет его
+    вызывающий код в той же транзакции. Возвращает OrderSlot.
+    """
+    for attempt in range(RESERVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _reserve(order, master, slot_date, list(slot_numbers), slot_time, status,
+                                slot_duration, notes, move_existing, check_time_conflict)
+        except IntegrityError:
+            # Слот занят параллельной транзакцией, которую не остановила блокировка
+            # (SQLite без select_for_update или только что созданное расписание дня)
+            if attempt == RESERVE_ATTEMPTS - 1:
+                raise SlotUnavailable(f'Не удалось занять слот мастера {master.email} на {slot_date}')
+
+
+def _reserve(order, master, slot_date, slot_numbers, slot_time, status,
+             slot_duration, notes, move_existing, check_time_conflict):
+    # Сначала заказ, потом день мастера - единый порядок блокировок без взаимоблокировок
+    Order.objects.select_for_update().filter(pk=order.pk).first()
+    schedule = MasterDailySchedule.get_or_create_for_master_date(master, slot_date)
+    schedule = MasterDailySchedule.objects.select_for_update().get(pk=schedule.pk)
+
+    existing = OrderSlot.objects.filter(order=order).first()
+    if existing and not move_existing:
+        raise SlotUnavailable(f'Заказ {order.id} уже назначен на слот {existing.slot_number}')
+
+    day_slots = {
+        slot.slot_number: slot
+        for slot in OrderSlot.objects.filter(master=master, slot_date=slot_date).exclude(order=order)
+    }
+    free = [
+        number for number in slot_numbers
+        if number not in day_slots or day_slots[number].status not in ACTIVE_SLOT_STATUSES
+    ]
+    if not free:
+        if len(slot_numbers) == 1:
+            raise SlotUnavailable(f'Слот {slot_numbers[0]} мастера {master.email} на {slot_date} уже занят')
+        raise SlotUnavailable(f'У мастера {master.email} нет свободных слотов на {slot_date}')
+    slot_number = free[0]
+    if slot_time is None:
+        slot_time = slot_start_time(schedule, slot_number)
+
+    if check_time_conflict:
+        conflict = Order.objects.filter(
+            models.Q(assigned_master=master) | models.Q(transferred_to=master),
+            scheduled_date=slot_date,
+            scheduled_time=slot_time
+        ).exclude(id=order.id).exists()
+        if conflict:
+            raise SlotUnavailable(f'У мастера {master.email} уже есть заказ на {slot_date} в {slot_time}')
+
+    # Отменённый или завершённый слот освобождает номер (уникальный индекс его не различает)
+    stale = day_slots.get(slot_number)
+    if stale is not None:
+        stale.delete()
+
+    fields = {
+        'master': master,
+        'slot_date': slot_date,
+        'slot_time': slot_time,
+        'slot_number': slot_number,
+        'status': status,
+    }
+    if slot_duration is not None:
+        fields['slot_duration'] = slot_duration
+    if existing:
+        for name, value in fields.items():
+            setattr(existing, name, value)
+        existing.save()
+        order_slot = existing
+    else:
+        order_slot = OrderSlot.objects.create(order=order, notes=notes, **fields)
+
+    order.scheduled_date = slot_date
+    order.scheduled_time = slot_time
+    return order_slot
+
+
+def completed_order_slots():
+    """Слоты, всё ещё занятые завершёнными заказами"""
+    return OrderSlot.objects.filter(
+        order_id__in=Order.objects.filter(status__in=COMPLETED_ORDER_STATUSES).values('id')
+    )
+
+
+def delete_completed_order_slots(batch_size=None):
+    """
+    Удаляет слоты завершённых заказов и возвращает число удалённых строк.
+
+    batch_size=None - одним DELETE; иначе частями по batch_size строк, каждая
+    часть в своей транзакции, чтобы не держать блокировки на всю таблицу.
+    Удаление идёт без загрузки объектов и сигналов (api1/raw_delete.py), поэтому
+    кэш расписания мастеров сбрасывается явно.
+    """
+    slots = completed_order_slots()
+    if batch_size is None:
+        with transaction.atomic():
+            master_ids = set(slots.values_list('master_id', flat=True).distinct())
+            deleted = delete_rows(slots)
+            bump_schedule_version(*master_ids)
+        return deleted
+
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            batch = list(slots.order_by('id').values_list('id', 'master_id')[:batch_size])
+            if not batch:
+                return deleted
+            deleted += delete_rows(OrderSlot.objects.filter(id__in=[slot_id for slot_id, _ in batch]))
+            bump_schedule_version(*{master_id for _, master_id in batch})
+
@@ -14,6 +14,7 @@ from django.utils import timezone
 
 from .models import CustomUser, Order, OrderSlot, MasterDailySchedule
 from .serializers import OrderSerializer
+from .slot_reservation import reserve_slot, SlotUnavailable
 
 
 @api_view(['GET'])
@@ -164,41 +165,21 @@ def assign_order_to_slot(request):
                 'error': f'Invalid slot number. Must be between 1 and {daily_schedule.max_slots}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Проверяем, что слот свободен
-        existing_slot = OrderSlot.objects.filter(
-            master=master,
-            slot_date=slot_date,
-            slot_number=slot_number,
-            status__in=['reserved', 'confirmed', 'in_progress']
-        ).first()
-        
-        if existing_slot:
-            return Response({
-                'error': f'Slot {slot_number} on {slot_date} is already occupied by order {existing_slot.order.id}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Вычисляем время слота, если не указано
+        # Время слота; если не указано, вычисляется по номеру слота
+        slot_time = None
         if slot_time_str:
             try:
                 slot_time = datetime.strptime(slot_time_str, '%H:%M').time()
             except ValueError:
                 return Response({'error': 'Invalid time format. Use HH:MM'}, 
                               status=status.HTTP_400_BAD_REQUEST)
-        else:
-            # Автоматически вычисляем время на основе номера слота
-            start_datetime = datetime.combine(slot_date, daily_schedule.work_start_time)
-            slot_datetime = start_datetime + (daily_schedule.slot_duration * (slot_number - 1))
-            slot_time = slot_datetime.time()
         
-        # Создаем слот в транзакции
+        # Занимаем слот атомарно: занятость проверяется под блокировкой дня мастера
         with transaction.atomic():
-            order_slot = OrderSlot.create_slot_for_order(
-                order=order,
-                master=master,
-                slot_date=slot_date,
-                slot_number=slot_number,
-                slot_time=slot_time
-            )
+            try:
+                order_slot = reserve_slot(order, master, slot_date, [slot_number], slot_time=slot_time)
+            except SlotUnavailable as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             # Обновляем статус заказа
             order.status = 'назначен'
@@ -424,22 +405,36 @@ def get_all_masters_slots_summary(request, schedule_date=None):
             target_date = date.today()
         
         # Получаем всех мастеров
-        masters = CustomUser.objects.filter(
-            role__in=['master', 'garant-master', 'warrant-master']
-        )
+        master_roles = ['master', 'garant-master', 'warrant-master']
+        masters = list(CustomUser.objects.filter(role__in=master_roles))
+        # Расписания дня и занятые номера слотов всех мастеров - по одному запросу.
+        # Мастеру без расписания на дату подставляются значения по умолчанию (без записи)
+        schedules = {
+            schedule.master_id: schedule
+            for schedule in MasterDailySchedule.objects.filter(date=target_date, master__role__in=master_roles)
+        }
+        occupied_numbers = {}
+        for master_id, slot_number in OrderSlot.objects.filter(
+            slot_date=target_date, master__role__in=master_roles
+        ).values_list('master_id', 'slot_number'):
+            occupied_numbers.setdefault(master_id, set()).add(slot_number)
         masters_summary = []
         
         for master in masters:
-            daily_schedule = MasterDailySchedule.get_or_create_for_master_date(master, target_date)
+            daily_schedule = schedules.get(master.id) or MasterDailySchedule(
+                master=master, date=target_date, **MasterDailySchedule.DAY_DEFAULTS
+            )
+            slot_count = daily_schedule.get_slot_count()
+            occupied = sum(1 for number in occupied_numbers.get(master.id, ()) if 1 <= number <= slot_count)
             
             summary = {
                 'master_id': master.id,
                 'master_name': master.get_full_name() if hasattr(master, 'get_full_name') else master.email,
                 'master_email': master.email,
                 'total_slots': daily_schedule.max_slots,
-                'occupied_slots': daily_schedule.get_occupied_slots_count(),
-                'free_slots': daily_schedule.get_free_slots_count(),
-                'workload_percentage': round((daily_schedule.get_occupied_slots_count() / daily_schedule.max_slots) * 100, 1),
+                'occupied_slots': occupied,
+                'free_slots': slot_count - occupied,
+                'workload_percentage': round((occupied / daily_schedule.max_slots) * 100, 1),
                 'is_working_day': daily_schedule.is_working_day
             }
             
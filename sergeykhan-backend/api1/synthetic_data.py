@@ -0,0 +1,359 @@
+"""
+Генерация синтетических данных большого объёма.
+
+Используется тестами с бюджетами SQL-запросов, бенчмарками и командой
+seed_load: создаёт пользователей по ролям, заказы во всех статусах,
+завершения, финансовые записи, расписание (MasterAvailability) и слоты
+(OrderSlot) через bulk_create пачками, детерминированно по seed.
+Заказы генерируются порциями, поэтому память не растёт с объёмом, а каждая
+порция записывается своей транзакцией (вне внешнего atomic - отдельным commit).
+"""
+import random
+from contextlib import contextmanager
+from datetime import time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Balance, BalanceLog, CompanyBalance, CompanyBalanceLog, CustomUser, FinancialTransaction,
+    MasterAvailability, Order, OrderCompletion, OrderLog, OrderSlot, ProfitDistributionSettings,
+    TransactionLog
+)
+
+
+FIRST_NAMES = ['Айбек', 'Сергей', 'Данияр', 'Алексей', 'Ерлан', 'Максим', 'Тимур', 'Руслан']
+LAST_NAMES = ['Ханов', 'Иванов', 'Ахметов', 'Петров', 'Садыков', 'Ким', 'Орлов', 'Жумабаев']
+STREETS = ['Абая', 'Сатпаева', 'Толе би', 'Жандосова', 'Розыбакиева', 'Навои', 'Гагарина']
+SERVICES = ['Ремонт холодильников', 'Ремонт стиральных машин', 'Ремонт микроволновых печей',
+            'Ремонт посудомоечных машин', 'Ремонт духовых шкафов']
+
+# Доли статусов заказов в сгенерированной выборке
+STATUS_WEIGHTS = (
+    ('новый', 15),
+    ('в обработке', 10),
+    ('назначен', 15),
+    ('выполняется', 5),
+    ('ожидает_подтверждения', 10),
+    ('завершен', 35),
+    ('отклонен', 5),
+    ('передан на гарантию', 5),
+)
+
+WORK_START_HOUR = 9
+HISTORY_DAYS = 60
+CENT = Decimal('0.01')
+
+
+@contextmanager
+def without_auto_now(model, *field_names):
+    """Временно отключает auto_now/auto_now_add, чтобы bulk_create сохранил заданные даты"""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = False
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def batched(iterable, size):
+    """Режет итератор на списки по size элементов"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_insert(model, objects, batch_size):
+    """bulk_create для генератора объектов: в памяти не больше одной пачки"""
+    total = 0
+    for chunk in batched(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(chunk, batch_size=batch_size)
+        total += len(chunk)
+    return total
+
+
+def create_users(role, count, prefix, password_hash, batch_size=1000):
+    """Создаёт пользователей роли пачками и возвращает их с заполненными id"""
+    users = [
+        CustomUser(
+            email=f'{prefix}{i}@load.test',
+            password=password_hash,
+            role=role,
+            first_name=FIRST_NAMES[i % len(FIRST_NAMES)],
+            last_name=LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)],
+        )
+        for i in range(count)
+    ]
+    CustomUser.objects.bulk_create(users, batch_size=batch_size)
+    # SQLite и старые бэкенды не возвращают id из bulk_create
+    if users and users[0].pk is None:
+        users = list(CustomUser.objects.filter(email__startswith=prefix, role=role).order_by('id'))
+    return users
+
+
+def split_net_profit(net_profit, percents):
+    """Доли мастера/куратора/компании по глобальным процентам, как в distribute_completion_funds"""
+    return {
+        name: (net_profit * Decimal(percent) / 100).quantize(CENT)
+        for name, percent in percents.items()
+    }
+
+
+def build_dataset(masters=200, orders=3000, curators=5, operators=5, warrant_masters=10,
+                  days=14, slots_per_day=4, seed=42, batch_size=1000, ledger=False, progress=None):
+    """
+    Создаёт реалистичный набор данных и возвращает словарь с пользователями и счётчиками.
+
+    Расписание мастеров: `slots_per_day` часовых слотов с 09:00 на `days` дней вперёд.
+    Назначенные заказы занимают свободные слоты мастеров и получают OrderSlot.
+    С `ledger=True` для одобренных завершений создаются финансовые записи и
+    пересчитываются балансы, как после distribute_completion_funds.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = now.date()
+    password_hash = make_password(None)
+    report = progress or (lambda message: None)
+
+    with transaction.atomic():
+        master_users = create_users('master', masters, f's{seed}-master-', password_hash, batch_size)
+        curator_users = create_users('curator', curators, f's{seed}-curator-', password_hash, batch_size)
+        operator_users = create_users('operator', operators, f's{seed}-operator-', password_hash, batch_size)
+        warranty_users = create_users('warrant-master', warrant_masters, f's{seed}-warranty-', password_hash, batch_size)
+        report(f'users: {len(master_users) + len(curator_users) + len(operator_users) + len(warranty_users)}')
+
+        Balance.objects.bulk_create(
+            [Balance(user=user, amount=Decimal('0.00')) for user in master_users + curator_users],
+            batch_size=batch_size
+        )
+
+    # Расписание: одинаковая сетка часовых слотов на каждый день
+    slot_times = [time(WORK_START_HOUR + i, 0) for i in range(slots_per_day)]
+    availability_count = bulk_insert(MasterAvailability, (
+        MasterAvailability(
+            master=master,
+            date=today + timedelta(days=day),
+            start_time=slot_time,
+            end_time=time(slot_time.hour + 1, 0),
+        )
+        for master in master_users + warranty_users
+        for day in range(days)
+        for slot_time in slot_times
+    ), batch_size)
+    report(f'availability: {availability_count}')
+
+    # Свободные (мастер, дата, слот) для назначенных заказов
+    free_slots = [
+        (master, today + timedelta(days=day), number)
+        for master in master_users
+        for day in range(days)
+        for number in range(1, slots_per_day + 1)
+    ]
+    rng.shuffle(free_slots)
+
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+    global_settings = ProfitDistributionSettings.get_settings()
+    percents = {
+        'master_immediate': global_settings.master_paid_percent,
+        'master_deferred': global_settings.master_balance_percent,
+        'curator_share': global_settings.curator_percent,
+        'company_share': global_settings.company_percent,
+    }
+    balances = {}
+    counts = {'orders': 0, 'slots': 0, 'completions': 0, 'ledger': 0}
+
+    def generate_order(i):
+        status = rng.choices(statuses, weights)[0]
+        order = Order(
+            client_name=f'{FIRST_NAMES[i % len(FIRST_NAMES)]} клиент {i}',
+            client_phone=f'+7700{i:07d}',
+            description=f'{rng.choice(SERVICES)}: заявка #{i}',
+            street=rng.choice(STREETS),
+            house_number=str(rng.randint(1, 300)),
+            apartment=str(rng.randint(1, 120)),
+            status=status,
+            service_type=rng.choice(SERVICES),
+            operator=rng.choice(operator_users) if operator_users else None,
+            estimated_cost=Decimal(rng.randrange(5000, 150000, 500)),
+            created_at=now - timedelta(minutes=rng.randint(5, 60 * 24 * HISTORY_DAYS)),
+        )
+        order.address = order.get_full_address()
+        slot = None
+
+        if status == 'новый':
+            # Новые заказы свежие: видны в ленте мастеров
+            order.created_at = now - timedelta(minutes=rng.randint(5, 60 * 48))
+        elif status == 'передан на гарантию' and warranty_users:
+            order.transferred_to = rng.choice(warranty_users)
+            order.curator = rng.choice(curator_users) if curator_users else None
+        elif status != 'в обработке':
+            order.assigned_master = rng.choice(master_users) if master_users else None
+            order.curator = rng.choice(curator_users) if curator_users else None
+
+        if status in ('назначен', 'выполняется') and free_slots:
+            master, slot_date, number = free_slots.pop()
+            order.assigned_master = master
+            order.scheduled_date = slot_date
+            order.scheduled_time = slot_times[number - 1]
+            slot = (master, slot_date, number)
+
+        if status in ('завершен', 'ожидает_подтверждения', 'отклонен'):
+            order.final_cost = Decimal(rng.randrange(10000, 400000, 1000))
+            order.expenses = Decimal(rng.randrange(0, 20000, 500))
+        return order, slot
+
+    def generate_completion(order):
+        parts = Decimal(rng.randrange(0, 10000, 500))
+        transport = Decimal(rng.randrange(0, 3000, 500))
+        submitted = order.created_at + timedelta(hours=rng.randint(2, 72))
+        approved = order.status == 'завершен'
+        return OrderCompletion(
+            order=order,
+            master_id=order.assigned_master_id,
+            work_description='Работы выполнены',
+            parts_expenses=parts,
+            transport_costs=transport,
+            total_received=order.final_cost,
+            total_expenses=parts + transport,
+            net_profit=order.final_cost - parts - transport,
+            completion_date=submitted,
+            created_at=submitted,
+            status='одобрен' if approved else 'ожидает_проверки',
+            curator_id=order.curator_id if approved else None,
+            review_date=submitted + timedelta(hours=rng.randint(1, 48)) if approved else None,
+            is_distributed=approved,
+        )
+
+    def generate_ledger(completion):
+        """Записи, которые оставляет distribute_completion_funds"""
+        order_id = completion.order_id
+        master_id = completion.master_id
+        curator_id = completion.curator_id
+        shares = split_net_profit(completion.net_profit, percents)
+        at = completion.review_date
+        balances[master_id] = balances.get(master_id, Decimal('0')) + shares['master_immediate']
+        balances[curator_id] = balances.get(curator_id, Decimal('0')) + shares['curator_share']
+        balances[None] = balances.get(None, Decimal('0')) + shares['company_share']
+        transactions = [
+            FinancialTransaction(user_id=master_id, order_completion=completion,
+                                 transaction_type='master_payment', amount=shares['master_immediate'],
+                                 description=f'К выплате за завершение заказа #{order_id}', created_at=at),
+            FinancialTransaction(user_id=master_id, order_completion=completion,
+                                 transaction_type='master_balance_total',
+                                 amount=shares['master_immediate'] + shares['master_deferred'],
+                                 description=f'К балансу за завершение заказа #{order_id}', created_at=at),
+            FinancialTransaction(user_id=curator_id, order_completion=completion,
+                                 transaction_type='curator_payment', amount=shares['curator_share'],
+                                 description=f'Выплата куратору за одобрение заказа #{order_id}', created_at=at),
+            FinancialTransaction(user_id=curator_id, order_completion=completion,
+                                 transaction_type='company_income', amount=shares['company_share'],
+                                 description=f'Доход компании от заказа #{order_id}', created_at=at),
+        ]
+        logs = [
+            TransactionLog(user_id=master_id, transaction_type='master_payment',
+                           amount=shares['master_immediate'], order_id=order_id,
+                           description=f'Выплата мастеру за заказ #{order_id}', created_at=at),
+        ]
+        balance_logs = [
+            BalanceLog(user_id=master_id, action_type='top_up', amount=shares['master_immediate'],
+                       reason=f'К выплате за заказ #{order_id}', performed_by_id=curator_id, created_at=at),
+            BalanceLog(user_id=curator_id, action_type='top_up', amount=shares['curator_share'],
+                       reason=f'Выплата за проверку заказа #{order_id}', performed_by_id=curator_id, created_at=at),
+        ]
+        company_logs = [
+            CompanyBalanceLog(action_type='top_up', amount=shares['company_share'],
+                              reason=f'Доход от завершения заказа #{order_id}',
+                              performed_by_id=curator_id, created_at=at),
+        ]
+        return transactions, logs, balance_logs, company_logs
+
+    def apply_balances():
+        company_income = balances.pop(None, Decimal('0'))
+        user_balances = list(Balance.objects.filter(user_id__in=balances))
+        for balance in user_balances:
+            balance.amount += balances[balance.user_id]
+        Balance.objects.bulk_update(user_balances, ['amount'], batch_size=batch_size)
+        company = CompanyBalance.get_instance()
+        company.amount = Decimal(str(company.amount)) + company_income
+        company.save()
+        balances.clear()
+
+    for start in range(0, orders, batch_size):
+        with transaction.atomic():
+            generated = [generate_order(i) for i in range(start, min(start + batch_size, orders))]
+            chunk = [order for order, _ in generated]
+            with without_auto_now(Order, 'created_at'):
+                Order.objects.bulk_create(chunk, batch_size=batch_size)
+
+            OrderSlot.objects.bulk_create([
+                OrderSlot(
+                    master=master,
+                    order=order,
+                    slot_date=slot_date,
+                    slot_time=slot_times[number - 1],
+                    slot_number=number,
+                    slot_duration=timedelta(hours=1),
+                    status='confirmed',
+                )
+                for order, (master, slot_date, number) in ((o, s) for o, s in generated if s)
+            ], batch_size=batch_size)
+
+            completions = [
+                generate_completion(order) for order in chunk
+                if order.status in ('завершен', 'ожидает_подтверждения') and order.assigned_master_id
+            ]
+            with without_auto_now(OrderCompletion, 'created_at'):
+                OrderCompletion.objects.bulk_create(completions, batch_size=batch_size)
+
+            with without_auto_now(OrderLog, 'created_at'):
+                OrderLog.objects.bulk_create([
+                    OrderLog(
+                        order=order,
+                        action='created',
+                        description=f'Заказ #{order.id} создан',
+                        new_value=f'Статус: {order.status}',
+                        created_at=order.created_at,
+                    )
+                    for order in chunk
+                ], batch_size=batch_size)
+
+            if ledger:
+                rows = [generate_ledger(completion) for completion in completions
+                        if completion.is_distributed and completion.curator_id]
+                for model, index in ((FinancialTransaction, 0), (TransactionLog, 1),
+                                     (BalanceLog, 2), (CompanyBalanceLog, 3)):
+                    objects = [obj for row in rows for obj in row[index]]
+                    with without_auto_now(model, 'created_at'):
+                        model.objects.bulk_create(objects, batch_size=batch_size)
+                    counts['ledger'] += len(objects)
+                # Балансы пополняются в той же транзакции, что и записи порции
+                if balances:
+                    apply_balances()
+
+            counts['orders'] += len(chunk)
+            counts['slots'] += sum(1 for _, slot in generated if slot)
+            counts['completions'] += len(completions)
+            report(f'orders: {counts["orders"]}/{orders}')
+
+    return {
+        'masters': master_users,
+        'curators': curator_users,
+        'operators': operator_users,
+        'warranty_masters': warranty_users,
+        'slots_per_day': slots_per_day,
+        'days': days,
+        'counts': {'availability': availability_count, **counts},
+    }
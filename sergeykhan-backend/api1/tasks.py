@@ -0,0 +1,48 @@
+"""
+Фоновые задачи очереди api1/jobs.py
+"""
+import logging
+from datetime import time
+
+from .jobs import job
+
+logger = logging.getLogger(__name__)
+
+
+@job('completion_photos.renditions')
+def completion_photo_renditions(completion_id, force=False):
+    """Превью и веб-версии фотографий завершения заказа; ошибка фотографии - повтор задачи"""
+    from .completion_photos import process_completion_photos
+    process_completion_photos(completion_id, force, raise_errors=True)
+
+
+@job('distance.update_master')
+def update_master_distance(master_id):
+    """Пересчёт уровня дистанционки мастера"""
+    from .distancionka import update_master_distance_status
+    update_master_distance_status(master_id)
+
+
+@job('schedule.cleanup_completed', daily_at=time(3, 0))
+def cleanup_completed_schedule():
+    """Ночная очистка слотов завершённых заказов"""
+    from .slot_reservation import CLEANUP_BATCH_SIZE, delete_completed_order_slots
+    deleted = delete_completed_order_slots(batch_size=CLEANUP_BATCH_SIZE)
+    logger.info('Schedule cleanup: %s slots of completed orders deleted', deleted)
+
+
+@job('orders.archive', daily_at=time(4, 0))
+def archive_old_orders():
+    """Ночной перенос старых завершённых заказов в архив"""
+    from django.conf import settings
+    from .order_archive import archive_orders
+    if settings.ORDER_ARCHIVE_DAYS > 0:
+        logger.info('Order archive: %s orders archived', archive_orders())
+
+
+@job('capacity.demand_forecast', daily_at=time(2, 30))
+def refresh_demand_forecast():
+    """Ночной пересчёт прогноза спроса на неделю"""
+    from .demand_forecast import refresh_demand_forecast as refresh
+    refresh()
+
@@ -1,6 +1,21 @@
 # Minimal test file to verify distance system functionality
-from django.test import TestCase, Client
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
 from django.urls import reverse
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.utils import load_backend
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 from rest_framework import status
@@ -9,7 +24,13 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 import json
 
-from .models import Order, CustomUser, Balance, BalanceLog
+from .models import (
+    Order, CustomUser, Balance, BalanceLog, MasterAvailability, OrderSlot, OrderCompletion,
+    DistanceSettingsModel, ProfitDistributionSettings, MasterDailySchedule,
+    AvailabilityTemplate, AvailabilityException, PhotoBlob, BackgroundJob, ArchivedOrder, OrderLog,
+    FinancialTransaction, TransactionLog, MasterDailyFinance, CuratorDailyFinance, CompanyDailyFinance,
+    DemandForecast, MasterProfitSettings, ProfitSettingsVersion, CompanyBalance, CompanyBalanceLog
+)
 from .distancionka import (
     calculate_average_check, 
     calculate_daily_revenue, 
@@ -18,6 +39,19 @@ from .distancionka import (
     update_master_distance_status,
     get_visible_orders_for_master
 )
+from .db_router import REPLICA_DB_ALIAS, read_from_replica
+from .slot_reservation import reserve_slot, SlotUnavailable, delete_completed_order_slots
+from .schedule_cache import schedule_version
+from .order_archive import archive_orders, restore_order
+from .finance_rollups import rebuild_rollups
+from .warranty_stats import warranty_master_stats
+from .profit_settings import finish_request, get_resolver, resolve_profit_settings, start_request
+from .demand_forecast import fit_forecast, get_demand_forecast, refresh_demand_forecast
+from .synthetic_data import build_dataset
+from .completion_photos import rendition_path
+from .jobs import JobError, claim_jobs, enqueue, job, run_pending, schedule_daily
+from .availability import get_availability, get_master_slots, first_free_slots
+from benchmarks import runner as bench_runner
 
 User = get_user_model()
 
@@ -352,3 +386,1809 @@ class DistanceSystemMinimalTestCase(TestCase):
         self.assertEqual(order.assigned_master, self.master_user)
         self.assertEqual(order.status, 'назначен')
         self.assertEqual(order.curator, self.master_user)  # Master acts as curator when taking order themselves
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Бюджеты SQL-запросов для списков и дашбордов на больших объёмах данных.
+
+    Бюджет - верхняя граница числа запросов на один HTTP-запрос. Для списков
+    и дашбордов по всем мастерам она постоянная и не зависит ни от количества
+    строк, ни от числа мастеров: запрос на каждого мастера, заказ или слот
+    сразу выходит за бюджет.
+    """
+    MASTERS = 200
+    WARRANTY_MASTERS = 10
+    ORDERS = 3000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = build_dataset(
+            masters=cls.MASTERS,
+            orders=cls.ORDERS,
+            warrant_masters=cls.WARRANTY_MASTERS,
+            seed=26
+        )
+        cls.admin_user = CustomUser.objects.create_user(
+            email='budget-admin@test.com',
+            password='testpass123',
+            role='super-admin'
+        )
+        cls.admin_token = Token.objects.create(user=cls.admin_user)
+        cls.master_user = cls.dataset['masters'][0]
+        cls.master_token = Token.objects.create(user=cls.master_user)
+        # Синглтоны настроек в рабочей базе уже существуют
+        DistanceSettingsModel.get_settings()
+        ProfitDistributionSettings.get_settings()
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        """Как assertNumQueries, но проверяет верхнюю границу"""
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+
+        if len(queries) > budget:
+            sample = '\n'.join(query['sql'] for query in queries.captured_queries[:10])
+            self.fail(
+                f'{len(queries)} queries executed, budget is {budget}. First queries:\n{sample}'
+            )
+
+    def get_within_budget(self, url_name, budget, token=None, **kwargs):
+        token = token or self.admin_token
+        with self.assertMaxQueries(budget):
+            response = self.client.get(
+                reverse(url_name, kwargs=kwargs or None),
+                HTTP_AUTHORIZATION=f'Token {token.key}'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_dataset_volume(self):
+        """Набор данных действительно большой"""
+        self.assertEqual(Order.objects.count(), self.ORDERS)
+        self.assertEqual(CustomUser.objects.filter(role='master').count(), self.MASTERS)
+        self.assertGreater(MasterAvailability.objects.count(), self.MASTERS * 10)
+        self.assertGreater(OrderSlot.objects.count(), 100)
+        self.assertGreater(OrderCompletion.objects.count(), 100)
+
+    def test_order_lists_budget(self):
+        """Списки заказов: токен + один запрос независимо от количества заказов"""
+        for url_name in ['all_orders', 'get_orders_new', 'active_orders', 'non_active_orders',
+                         'get_assigned_orders', 'transferred_orders']:
+            with self.subTest(url_name=url_name):
+                self.get_within_budget(url_name, 2)
+
+    def test_master_order_feeds_budget(self):
+        """Лента заказов мастера с учётом дистанционки"""
+        self.get_within_budget('master_available_orders', 16, token=self.master_token)
+        self.get_within_budget('get_master_available_orders_with_distance', 16, token=self.master_token)
+
+    def test_completion_lists_budget(self):
+        self.get_within_budget('get_pending_completions', 2)
+        self.get_within_budget('get_master_completions', 2, token=self.master_token)
+        # Страница в коротком представлении: тоже токен + один запрос
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('get_all_completions') + '?limit=100',
+                                       HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+        self.assertEqual(len(response.json()['results']), 100)
+
+    def test_logs_and_balances_budget(self):
+        self.get_within_budget('get_all_order_logs', 3)
+        self.get_within_budget('get_all_balances', 2)
+        self.get_within_budget('get_all_financial_transactions', 2)
+        self.get_within_budget('get_masters', 2)
+
+    def test_master_schedule_budget(self):
+        # Конкретные слоты, шаблоны и выходные - по одному запросу на весь горизонт
+        self.get_within_budget('master_schedule_detail', 9, master_id=self.master_user.id)
+        warranty_master = self.dataset['warranty_masters'][0]
+        # Счётчики заказов и заработок - один запрос
+        self.get_within_budget('get_warranty_master_stats', 3, master_id=warranty_master.id)
+        self.get_within_budget('get_warranty_leaderboard', 2)
+
+    def test_masters_workload_budget(self):
+        # Не зависит от числа мастеров и слотов
+        self.get_within_budget('all_masters_workload', 7)
+        self.get_within_budget('master_workload_detail', 8, master_id=self.master_user.id)
+        self.get_within_budget('get_all_masters_workload', 2)
+
+    def test_slots_summary_budget(self):
+        # Мастера, расписания дня и слоты - по одному запросу
+        self.get_within_budget('get_all_masters_slots_summary', 4)
+
+    def test_batched_dashboards_match_per_master_values(self):
+        slot_date = OrderSlot.objects.values_list('slot_date', flat=True).order_by('slot_date').first()
+        summary = self.get_within_budget('get_all_masters_slots_summary_date', 4, schedule_date=str(slot_date)).json()
+        distance = {row['master_id']: row for row in self.get_within_budget('get_all_masters_distance', 4).json()}
+        workload = {row['master_id']: row for row in self.get_within_budget('get_all_masters_workload', 2).json()}
+        for row in sorted(summary['masters'], key=lambda row: -row['occupied_slots'])[:20]:
+            master = CustomUser.objects.get(id=row['master_id'])
+            schedule = MasterDailySchedule.get_or_create_for_master_date(master, slot_date)
+            self.assertEqual((row['occupied_slots'], row['free_slots']),
+                             (schedule.get_occupied_slots_count(), schedule.get_free_slots_count()))
+            self.assertEqual(distance[master.id]['statistics'], {
+                'average_check': float(calculate_average_check(master.id)),
+                'daily_revenue': float(calculate_daily_revenue(master.id)),
+                'net_turnover_10_days': float(calculate_net_turnover(master.id)),
+            })
+            if master.is_active:
+                self.assertEqual(workload[master.id]['occupied_slots'], Order.objects.filter(
+                    assigned_master=master, status__in=['назначен', 'выполняется']
+                ).count())
+        self.assertTrue(any(row['occupied_slots'] for row in summary['masters']))
+        self.assertTrue(any(row['statistics']['average_check'] for row in distance.values()))
+
+    def test_capacity_dashboards_budget(self):
+        # Не зависит от числа мастеров: доступность и заказы дня - фиксированный набор запросов.
+        # Прогноз спроса считает ночная задача, эндпоинты читают его одним запросом
+        refresh_demand_forecast()
+        self.get_within_budget('get_capacity_analysis', 15)
+        self.get_within_budget('get_weekly_capacity_forecast', 41)
+
+    def test_masters_settings_dashboards_budget(self):
+        # Показатели всех мастеров одним оконным запросом
+        self.get_within_budget('get_all_masters_distance', 4)
+        # Настройки всех мастеров одним запросом
+        self.get_within_budget('get_all_masters_with_settings', 4)
+        self.get_within_budget('get_profit_preview_batch', 5)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN-проверки индексов рассчитаны на PostgreSQL')
+class QueryIndexUsageTestCase(TestCase):
+    """
+    Горячие запросы вьюх используют индексы, а не последовательное чтение таблицы.
+
+    На маленькой тестовой базе планировщик и так предпочёл бы Seq Scan, поэтому
+    он отключается: тест проверяет, что индекс подходит под форму запроса.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = build_dataset(
+            masters=20, orders=3000, warrant_masters=5, days=60, slots_per_day=8, seed=29
+        )
+        cls.master = cls.dataset['masters'][0]
+        cls.warranty_master = cls.dataset['warranty_masters'][0]
+        cls.today = timezone.now().date()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+        self.assertTrue(any(name in plan for name in index_names), plan)
+
+    def test_master_feed_uses_partial_index(self):
+        threshold = timezone.now() - timedelta(hours=24)
+        self.assertUsesIndex(
+            Order.objects.filter(status='новый', assigned_master__isnull=True, created_at__gte=threshold)
+            .order_by('-created_at'),
+            'order_new_feed_idx'
+        )
+
+    def test_status_and_created_at(self):
+        self.assertUsesIndex(
+            Order.objects.filter(status='в обработке').order_by('-created_at'),
+            'order_status_created_idx'
+        )
+
+    def test_master_and_status(self):
+        self.assertUsesIndex(
+            Order.objects.filter(assigned_master=self.master, status='завершен', final_cost__isnull=False)
+            .order_by('-created_at')[:10],
+            'order_master_status_idx'
+        )
+
+    def test_master_and_scheduled_date(self):
+        self.assertUsesIndex(
+            Order.objects.filter(assigned_master=self.master, scheduled_date=self.today),
+            'order_master_date_idx'
+        )
+
+    def test_transferred_to_and_status(self):
+        self.assertUsesIndex(
+            Order.objects.filter(transferred_to=self.warranty_master, status='передан на гарантию'),
+            'order_transferred_status_idx'
+        )
+
+    def test_scheduled_date_and_status(self):
+        self.assertUsesIndex(
+            Order.objects.filter(scheduled_date=self.today, status__in=['назначен', 'выполняется']),
+            'order_date_status_idx'
+        )
+
+    def test_order_slots_of_master(self):
+        self.assertUsesIndex(
+            OrderSlot.objects.filter(
+                master=self.master,
+                slot_date=self.today,
+                status__in=['reserved', 'confirmed', 'in_progress']
+            ),
+            'orderslot_master_date_st_idx', 'unique_master_daily_slot'
+        )
+
+    def test_availability_covering_time(self):
+        self.assertUsesIndex(
+            MasterAvailability.objects.filter(
+                master=self.master,
+                date=self.today,
+                start_time__lte='10:30',
+                end_time__gt='10:30'
+            ),
+            'unique_master_availability'
+        )
+
+    def test_pending_completions_page_uses_partial_index(self):
+        self.assertUsesIndex(
+            OrderCompletion.objects.filter(status='ожидает_проверки').order_by('-created_at', '-id')[:50],
+            'completion_pending_idx'
+        )
+
+    def test_availability_by_date(self):
+        self.assertUsesIndex(
+            MasterAvailability.objects.filter(date=self.today),
+            'availability_date_master_idx'
+        )
+
+
+class ReplicaRoutingTestCase(TestCase):
+    """Отчёты читаются из реплики (отдельный файл SQLite), после своей записи - из default"""
+    @classmethod
+    def setUpClass(cls):
+        # Реплика подключается только на время класса, мимо settings.DATABASES,
+        # чтобы остальные тесты продолжали читать из default
+        cls.replica_dir = tempfile.mkdtemp()
+        config = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {'ENGINE': 'django.db.backends.sqlite3'},
+            REPLICA_DB_ALIAS: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+            },
+        })[REPLICA_DB_ALIAS]
+        replica = load_backend(config['ENGINE']).DatabaseWrapper(config, REPLICA_DB_ALIAS)
+        connections[REPLICA_DB_ALIAS] = replica
+        call_command('migrate', database=REPLICA_DB_ALIAS, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(email='replica-admin@test.com', password='x', role='super-admin')
+        cls.other_admin = CustomUser.objects.create_user(email='replica-admin2@test.com', password='x', role='super-admin')
+        cls.master = CustomUser.objects.create_user(email='replica-master@test.com', password='x', role='master')
+        cls.admin_token = Token.objects.create(user=cls.admin)
+        cls.other_admin_token = Token.objects.create(user=cls.other_admin)
+        Balance.objects.create(user=cls.master, amount=Decimal('1000.00'))
+
+        # Реплика отстаёт: баланс мастера в ней ещё старый
+        CustomUser.objects.using(REPLICA_DB_ALIAS).bulk_create([
+            CustomUser(id=user.id, email=user.email, role=user.role, password=user.password)
+            for user in (cls.admin, cls.other_admin, cls.master)
+        ])
+        Balance.objects.using(REPLICA_DB_ALIAS).create(user_id=cls.master.id, amount=Decimal('500.00'))
+
+    def setUp(self):
+        cache.clear()
+
+    def master_balance(self, token, field='current_balance'):
+        response = self.client.get(reverse('get_all_balances'), HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        row = next(row for row in response.json() if row['user_id'] == self.master.id)
+        return Decimal(str(row[field]))
+
+    def test_read_only_view_reads_from_replica(self):
+        self.assertEqual(self.master_balance(self.admin_token), Decimal('500.00'))
+
+    def test_user_reads_own_write_from_primary(self):
+        response = self.client.post(
+            reverse('modify_balance', args=[self.master.id]),
+            {'balance_type': 'paid', 'action_type': 'top_up', 'amount': '100', 'reason': 'Тест'},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.admin_token.key}'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.master_balance(self.admin_token, 'paid_amount'), Decimal('100.00'))
+        self.assertEqual(self.master_balance(self.admin_token), Decimal('1000.00'))
+        # Другой пользователь ничего не писал и продолжает читать реплику
+        self.assertEqual(self.master_balance(self.other_admin_token, 'paid_amount'), Decimal('0.00'))
+
+    def test_reads_after_write_in_same_view_use_primary(self):
+        @read_from_replica
+        def view(request):
+            before = Balance.objects.get(user_id=self.master.id).amount
+            Balance.objects.filter(user_id=self.master.id).update(amount=Decimal('2000.00'))
+            after = Balance.objects.get(user_id=self.master.id).amount
+            return before, after
+
+        self.assertEqual(view(SimpleNamespace(user=self.admin)), (Decimal('500.00'), Decimal('2000.00')))
+        self.assertEqual(Balance.objects.using(REPLICA_DB_ALIAS).get(user_id=self.master.id).amount, Decimal('500.00'))
+
+
+def make_order(**fields):
+    fields.setdefault('status', 'в обработке')
+    return Order.objects.create(
+        client_name='Клиент', client_phone='+77010000000', description='Ремонт',
+        street='Абая', house_number='10', **fields
+    )
+
+
+class SlotReservationTestCase(TestCase):
+    """Слоты занимаются атомарно; занятый слот даёт 400, а не ошибку уникального индекса"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.curator = CustomUser.objects.create_user(email='slots-curator@test.com', password='x', role='curator')
+        cls.master = CustomUser.objects.create_user(email='slots-master@test.com', password='x', role='master')
+        cls.token = Token.objects.create(user=cls.curator)
+        cls.day = timezone.now().date() + timedelta(days=1)
+        MasterAvailability.objects.create(
+            master=cls.master, date=cls.day, start_time=datetime.strptime('09:00', '%H:%M').time(),
+            end_time=datetime.strptime('18:00', '%H:%M').time()
+        )
+
+    def assign(self, order, time_str):
+        return self.client.patch(
+            reverse('assign', args=[order.id]),
+            {'assigned_master': self.master.id, 'scheduled_date': self.day.strftime('%Y-%m-%d'),
+             'scheduled_time': time_str},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def test_assign_master_rejects_taken_time(self):
+        self.assertEqual(self.assign(make_order(), '10:00:00').status_code, 200)
+
+        response = self.assign(make_order(), '10:00:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('уже занят', response.json()['error'])
+        self.assertEqual(OrderSlot.objects.filter(master=self.master, slot_date=self.day).count(), 1)
+
+    def test_cancelled_slot_is_reused(self):
+        OrderSlot.objects.create(
+            master=self.master, order=make_order(), slot_date=self.day,
+            slot_time=datetime.strptime('11:00', '%H:%M').time(), slot_number=2, status='cancelled'
+        )
+        response = self.client.post(
+            reverse('assign_order_to_slot'),
+            {'order_id': make_order().id, 'master_id': self.master.id,
+             'slot_date': self.day.strftime('%Y-%m-%d'), 'slot_number': 2},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OrderSlot.objects.get(master=self.master, slot_date=self.day).status, 'reserved')
+
+    def test_reserve_slot_takes_next_free_number(self):
+        reserve_slot(make_order(), self.master, self.day, [1])
+        order = make_order()
+        slot = reserve_slot(order, self.master, self.day, [1, 2, 3])
+        self.assertEqual(slot.slot_number, 2)
+        self.assertEqual(order.scheduled_time, slot.slot_time)
+        with self.assertRaises(SlotUnavailable):
+            reserve_slot(order, self.master, self.day, [3])
+
+    def test_warranty_transfer_rejects_taken_time(self):
+        warranty_master = CustomUser.objects.create_user(
+            email='slots-warranty@test.com', password='x', role='warrant-master'
+        )
+        MasterAvailability.objects.create(
+            master=warranty_master, date=self.day, start_time=datetime.strptime('09:00', '%H:%M').time(),
+            end_time=datetime.strptime('18:00', '%H:%M').time()
+        )
+
+        def transfer(order, time_str):
+            return self.client.post(
+                reverse('transfer_order_to_warranty_master', args=[order.id]),
+                {'warranty_master_id': warranty_master.id, 'scheduled_date': self.day.strftime('%Y-%m-%d'),
+                 'scheduled_time': time_str},
+                content_type='application/json',
+                HTTP_AUTHORIZATION=f'Token {self.token.key}'
+            )
+
+        self.assertEqual(transfer(make_order(), '10:00').status_code, 200)
+        # Занятое время и время вне доступности - 400, заказ не меняется
+        for time_str in ('10:00', '19:00'):
+            with self.subTest(time_str=time_str):
+                order = make_order()
+                self.assertEqual(transfer(order, time_str).status_code, 400)
+                order.refresh_from_db()
+                self.assertIsNone(order.transferred_to_id)
+                self.assertIsNone(order.scheduled_time)
+        self.assertEqual(Order.objects.filter(transferred_to=warranty_master).count(), 1)
+        self.assertEqual(OrderSlot.objects.filter(master=warranty_master).count(), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Блокировки строк проверяются только на PostgreSQL')
+class SlotReservationConcurrencyTestCase(TransactionTestCase):
+    """Параллельные назначения на один день мастера не занимают один слот дважды"""
+
+    def test_parallel_reservations(self):
+        master = CustomUser.objects.create_user(email='race-master@test.com', password='x', role='master')
+        day = timezone.now().date() + timedelta(days=1)
+        MasterDailySchedule.get_or_create_for_master_date(master, day)
+        orders = [make_order() for _ in range(12)]
+        results = []
+        barrier = threading.Barrier(len(orders))
+
+        def assign(order):
+            try:
+                barrier.wait()
+                results.append(reserve_slot(order, master, day, range(1, 5)).slot_number)
+            except SlotUnavailable:
+                results.append(None)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=assign, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(number for number in results if number), [1, 2, 3, 4])
+        self.assertEqual(results.count(None), 8)
+        self.assertEqual(OrderSlot.objects.filter(master=master, slot_date=day).count(), 4)
+
+
+class MasterScheduleSaveTestCase(TestCase):
+    """Сохранение сетки расписания: diff с текущими слотами за постоянное число запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.curator = CustomUser.objects.create_user(email='grid-curator@test.com', password='x', role='curator')
+        cls.master = CustomUser.objects.create_user(email='grid-master@test.com', password='x', role='master')
+        cls.token = Token.objects.create(user=cls.curator)
+        cls.start = timezone.now().date() + timedelta(days=1)
+
+    def grid(self, days, hours=range(9, 17)):
+        return [
+            {
+                'date': (self.start + timedelta(days=offset)).strftime('%Y-%m-%d'),
+                'slots': [{'start_time': f'{hour:02d}:00', 'end_time': f'{hour + 1:02d}:00'} for hour in hours],
+            }
+            for offset in range(days)
+        ]
+
+    def save(self, schedule):
+        return self.client.post(
+            reverse('master_schedule_detail', args=[self.master.id]),
+            json.dumps({'schedule': schedule}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def count_queries(self, schedule):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.save(schedule)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_grid(self):
+        small = self.count_queries(self.grid(1))
+        MasterAvailability.objects.all().delete()
+        self.assertEqual(self.count_queries(self.grid(14)), small)
+        self.assertEqual(MasterAvailability.objects.filter(master=self.master).count(), 14 * 8)
+
+    def test_unchanged_slots_are_kept(self):
+        self.save(self.grid(2))
+        kept = MasterAvailability.objects.get(master=self.master, date=self.start, start_time='09:00')
+
+        response = self.save(self.grid(2, hours=range(9, 13)) + [
+            {'date': (self.start + timedelta(days=2)).strftime('%Y-%m-%d'),
+             'slots': [{'start_time': '10:00', 'end_time': '12:00'}]},
+        ])
+        data = response.json()
+        self.assertEqual((data['created_slots'], data['deleted_slots'], data['unchanged_slots']), (1, 8, 8))
+        self.assertTrue(MasterAvailability.objects.filter(id=kept.id).exists())
+        self.assertEqual(MasterAvailability.objects.filter(master=self.master).count(), 9)
+
+    def test_overlapping_slots_rejected(self):
+        response = self.save([{
+            'date': self.start.strftime('%Y-%m-%d'),
+            'slots': [{'start_time': '09:00', 'end_time': '11:00'}, {'start_time': '10:00', 'end_time': '12:00'}],
+        }])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('overlap', response.json()['error'])
+        self.assertFalse(MasterAvailability.objects.filter(master=self.master).exists())
+
+
+class AvailabilityTemplateTestCase(TestCase):
+    """Еженедельные шаблоны разворачиваются на лету; слоты на дату и выходные их переопределяют"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.curator = CustomUser.objects.create_user(email='tpl-curator@test.com', password='x', role='curator')
+        cls.master = CustomUser.objects.create_user(email='tpl-master@test.com', password='x', role='master')
+        cls.token = Token.objects.create(user=cls.curator)
+        today = timezone.now().date()
+        # Ближайший понедельник в будущем
+        cls.monday = today + timedelta(days=7 - today.weekday())
+        for weekday in range(5):
+            AvailabilityTemplate.objects.create(
+                master=cls.master, weekday=weekday,
+                start_time=datetime.strptime('09:00', '%H:%M').time(),
+                end_time=datetime.strptime('13:00', '%H:%M').time()
+            )
+
+    def auth(self):
+        return {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def test_templates_expand_for_weekdays_only(self):
+        availability = get_availability([self.master], self.monday, self.monday + timedelta(days=6))
+        self.assertEqual(sorted(day for _, day in availability), [self.monday + timedelta(days=i) for i in range(5)])
+        self.assertEqual(len(availability[(self.master.id, self.monday)]), 4)
+        self.assertIsNone(availability[(self.master.id, self.monday)][0].availability_id)
+
+    def test_override_and_day_off_beat_template(self):
+        tuesday = self.monday + timedelta(days=1)
+        override = MasterAvailability.objects.create(
+            master=self.master, date=self.monday,
+            start_time=datetime.strptime('15:00', '%H:%M').time(),
+            end_time=datetime.strptime('18:00', '%H:%M').time()
+        )
+        AvailabilityException.objects.create(master=self.master, date=tuesday, reason='Отпуск')
+
+        slots = get_master_slots(self.master, self.monday, tuesday)
+        self.assertEqual([slot.availability_id for slot in slots], [override.id])
+
+    def test_range_costs_constant_queries(self):
+        with self.assertNumQueries(3):
+            get_availability([self.master], self.monday, self.monday + timedelta(days=90))
+
+    def test_assign_master_accepts_template_time(self):
+        response = self.client.patch(
+            reverse('assign', args=[make_order().id]),
+            {'assigned_master': self.master.id, 'scheduled_date': self.monday.strftime('%Y-%m-%d'),
+             'scheduled_time': '10:00:00'},
+            content_type='application/json', **self.auth()
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(MasterAvailability.objects.filter(master=self.master).exists())
+
+    def test_grid_matching_template_stores_nothing(self):
+        response = self.client.post(
+            reverse('master_schedule_detail', args=[self.master.id]),
+            json.dumps({'schedule': [
+                {'date': self.monday.strftime('%Y-%m-%d'),
+                 'slots': [{'start_time': f'{hour:02d}:00', 'end_time': f'{hour + 1:02d}:00'} for hour in range(9, 13)]},
+                {'date': (self.monday + timedelta(days=1)).strftime('%Y-%m-%d'), 'slots': []},
+            ]}),
+            content_type='application/json', **self.auth()
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(MasterAvailability.objects.filter(master=self.master).exists())
+        self.assertTrue(
+            AvailabilityException.objects.filter(master=self.master, date=self.monday + timedelta(days=1)).exists()
+        )
+
+    def test_template_and_calendar_endpoints(self):
+        response = self.client.put(
+            reverse('master_availability_templates', args=[self.master.id]),
+            [{'weekday': 5, 'start_time': '10:00', 'end_time': '12:00', 'slot_duration': '01:00:00'}],
+            content_type='application/json', **self.auth()
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(AvailabilityTemplate.objects.filter(master=self.master).count(), 1)
+
+        response = self.client.get(
+            reverse('master_availability_calendar', args=[self.master.id]),
+            {'from': self.monday.strftime('%Y-%m-%d'), 'to': (self.monday + timedelta(days=6)).strftime('%Y-%m-%d')},
+            **self.auth()
+        )
+        self.assertEqual(response.status_code, 200)
+        slots = response.json()['slots']
+        self.assertEqual([(slot['start_time'], slot['source']) for slot in slots], [('10:00', 'template'), ('11:00', 'template')])
+
+        response = self.client.put(
+            reverse('master_availability_templates', args=[self.master.id]),
+            [{'weekday': 1, 'start_time': '12:00', 'end_time': '10:00'}],
+            content_type='application/json', **self.auth()
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_overlapping_templates_rejected(self):
+        response = self.client.put(
+            reverse('master_availability_templates', args=[self.master.id]),
+            [{'weekday': 2, 'start_time': '09:00', 'end_time': '13:00'},
+             {'weekday': 2, 'start_time': '12:00', 'end_time': '15:00'}],
+            content_type='application/json', **self.auth()
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(AvailabilityTemplate.objects.filter(master=self.master).count(), 5)
+
+        # Разные сроки действия на тот же день недели не пересекаются
+        response = self.client.put(
+            reverse('master_availability_templates', args=[self.master.id]),
+            [{'weekday': 2, 'start_time': '09:00', 'end_time': '13:00', 'valid_until': '2026-06-30'},
+             {'weekday': 2, 'start_time': '10:00', 'end_time': '14:00', 'valid_from': '2026-07-01'}],
+            content_type='application/json', **self.auth()
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        from django.core.exceptions import ValidationError
+        with self.assertRaises(ValidationError):
+            AvailabilityTemplate.objects.create(
+                master=self.master, weekday=2, start_time=datetime.strptime('12:00', '%H:%M').time(),
+                end_time=datetime.strptime('13:00', '%H:%M').time(), valid_from=self.monday
+            )
+
+    def test_workload_and_schedule_include_template_slots(self):
+        override = MasterAvailability.objects.create(
+            master=self.master, date=self.monday,
+            start_time=datetime.strptime('15:00', '%H:%M').time(),
+            end_time=datetime.strptime('16:00', '%H:%M').time()
+        )
+        tuesday = (self.monday + timedelta(days=1)).isoformat()
+
+        detail = self.client.get(reverse('master_workload_detail', args=[self.master.id]), **self.auth()).json()
+        slots = [slot for slot in detail['availability_slots'] if slot['date'] in (self.monday.isoformat(), tuesday)]
+        self.assertEqual([(slot['id'], slot['source']) for slot in slots],
+                         [(override.id, 'override')] + [(None, 'template')] * 4)
+        self.assertEqual(slots[1]['start_time'], '09:00:00')
+
+        schedule = self.client.get(
+            reverse('master_schedule_detail', args=[self.master.id]),
+            {'from': self.monday.isoformat(), 'to': tuesday}, **self.auth()
+        ).json()['schedule']
+        self.assertEqual([(slot['id'], bool(slot['created_at'])) for slot in schedule[0]['slots']], [(override.id, True)])
+        self.assertEqual({(slot['id'], slot['created_at']) for slot in schedule[1]['slots']}, {(None, None)})
+
+
+class MasterScheduleCacheTestCase(TestCase):
+    """Ответ расписания кэшируется и сбрасывается при изменении доступности, слотов и заказов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.master = CustomUser.objects.create_user(email='cache-master@test.com', password='x', role='master')
+        cls.curator = CustomUser.objects.create_user(email='cache-curator@test.com', password='x', role='curator')
+        cls.master_token = Token.objects.create(user=cls.master)
+        cls.curator_token = Token.objects.create(user=cls.curator)
+        cls.day = timezone.now().date() + timedelta(days=1)
+        for hour in (9, 10):
+            MasterAvailability.objects.create(
+                master=cls.master, date=cls.day,
+                start_time=datetime.strptime(f'{hour:02d}:00', '%H:%M').time(),
+                end_time=datetime.strptime(f'{hour + 1:02d}:00', '%H:%M').time()
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_schedule(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('master_schedule'), params, HTTP_AUTHORIZATION=f'Token {self.master_token.key}'
+            )
+        return response, len(queries)
+
+    def day_slots(self, response):
+        return {day['date']: day['slots'] for day in response.json()['schedule']}[self.day.strftime('%Y-%m-%d')]
+
+    def test_repeated_get_is_served_from_cache(self):
+        first, first_queries = self.get_schedule()
+        second, second_queries = self.get_schedule()
+        self.assertEqual(first.content, second.content)
+        # Остаётся только аутентификация по токену
+        self.assertEqual(second_queries, 2)
+        self.assertGreater(first_queries, second_queries)
+
+    def test_slot_and_availability_changes_invalidate(self):
+        self.get_schedule()
+        order = make_order(assigned_master=self.master, status='назначен')
+        OrderSlot.objects.create(
+            master=self.master, order=order, slot_date=self.day,
+            slot_time=datetime.strptime('09:00', '%H:%M').time(), slot_number=1
+        )
+        response, _ = self.get_schedule()
+        self.assertEqual([slot['status'] for slot in self.day_slots(response)], ['occupied', 'free'])
+
+        MasterAvailability.objects.filter(master=self.master, start_time='10:00').get().delete()
+        response, _ = self.get_schedule()
+        self.assertEqual(len(self.day_slots(response)), 1)
+
+    def test_grid_save_invalidates(self):
+        self.get_schedule()
+        response = self.client.post(
+            reverse('master_schedule_detail', args=[self.master.id]),
+            json.dumps({'schedule': [{'date': self.day.strftime('%Y-%m-%d'),
+                                      'slots': [{'start_time': '12:00', 'end_time': '13:00'}]}]}),
+            content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.curator_token.key}'
+        )
+        self.assertEqual(response.status_code, 200)
+        response, _ = self.get_schedule()
+        self.assertEqual([slot['start_time'] for slot in self.day_slots(response)], ['12:00'])
+
+    def test_date_window(self):
+        MasterAvailability.objects.create(
+            master=self.master, date=self.day + timedelta(days=10),
+            start_time=datetime.strptime('09:00', '%H:%M').time(),
+            end_time=datetime.strptime('10:00', '%H:%M').time()
+        )
+        response, _ = self.get_schedule(**{'from': self.day.strftime('%Y-%m-%d'),
+                                           'to': (self.day + timedelta(days=6)).strftime('%Y-%m-%d')})
+        self.assertEqual([day['date'] for day in response.json()['schedule']], [self.day.strftime('%Y-%m-%d')])
+
+        response, _ = self.get_schedule(**{'from': '2030-01-10', 'to': '2030-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MastersWorkloadTestCase(TestCase):
+    """Ближайший свободный слот мастеров считается одним проходом по слотам и заказам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.curator = CustomUser.objects.create_user(email='load-curator@test.com', password='x', role='curator')
+        cls.token = Token.objects.create(user=cls.curator)
+        cls.busy = CustomUser.objects.create_user(email='load-busy@test.com', password='x', role='master')
+        cls.templated = CustomUser.objects.create_user(email='load-tpl@test.com', password='x', role='master')
+        cls.day = timezone.now().date() + timedelta(days=1)
+        for hour in (9, 10, 11):
+            MasterAvailability.objects.create(
+                master=cls.busy, date=cls.day,
+                start_time=datetime.strptime(f'{hour:02d}:00', '%H:%M').time(),
+                end_time=datetime.strptime(f'{hour + 1:02d}:00', '%H:%M').time()
+            )
+        AvailabilityTemplate.objects.create(
+            master=cls.templated, weekday=cls.day.weekday(),
+            start_time=datetime.strptime('14:00', '%H:%M').time(),
+            end_time=datetime.strptime('16:00', '%H:%M').time()
+        )
+        for time_str in ('09:30', '10:00'):
+            make_order(assigned_master=cls.busy, status='назначен', scheduled_date=cls.day,
+                       scheduled_time=datetime.strptime(time_str, '%H:%M').time())
+
+    def test_sweep_skips_booked_slots(self):
+        availability = get_availability([self.busy], self.day)
+        free = first_free_slots(availability, {self.busy.id: [(self.day, datetime.strptime('09:30', '%H:%M').time()),
+                                                              (self.day, datetime.strptime('10:00', '%H:%M').time())]})
+        self.assertEqual(free[self.busy.id].start_time.strftime('%H:%M'), '11:00')
+        self.assertEqual(first_free_slots(availability, {self.busy.id: [(self.day, slot.start_time)
+                                                                        for slot in availability[(self.busy.id, self.day)]]}), {})
+
+    def test_all_masters_workload(self):
+        response = self.client.get(reverse('all_masters_workload'), HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        by_master = {item['master_id']: item['next_available_slot'] for item in response.json()}
+        self.assertEqual(by_master[self.busy.id]['start_time'], '11:00:00')
+        self.assertEqual(by_master[self.templated.id]['start_time'], '14:00:00')
+
+    def validate_batch(self, payload):
+        return self.client.post(
+            reverse('validate_order_scheduling_batch'), payload,
+            content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def test_batch_validation_candidates(self):
+        day = self.day.strftime('%Y-%m-%d')
+        candidates = [
+            {'master_id': self.busy.id, 'scheduled_date': day, 'scheduled_time': '09:30:00'},
+            {'master_id': self.busy.id, 'scheduled_date': day, 'scheduled_time': '11:15:00'},
+            {'master_id': self.busy.id, 'scheduled_date': day, 'scheduled_time': '18:00:00'},
+            {'master_id': self.templated.id, 'scheduled_date': day, 'scheduled_time': '14:00:00'},
+        ]
+        # Токен, мастера, индекс доступности (3) и заказы - независимо от числа кандидатов
+        with self.assertNumQueries(6):
+            response = self.validate_batch({'candidates': candidates})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['valid'] for result in response.json()['results']], [False, True, False, True])
+
+    def test_batch_validation_matrix(self):
+        day = self.day.strftime('%Y-%m-%d')
+        response = self.validate_batch({'date_from': day, 'date_to': day, 'master_ids': [self.busy.id]})
+        self.assertEqual(response.status_code, 200)
+        slots = response.json()['matrix'][str(self.busy.id)][day]
+        self.assertEqual([(slot['start_time'], slot['valid']) for slot in slots],
+                         [('09:00:00', True), ('10:00:00', False), ('11:00:00', True)])
+        self.assertEqual(self.validate_batch({'date_from': day, 'date_to': '2000-01-01'}).status_code, 400)
+
+
+def make_image(name='photo.png', size=(2000, 1500), image_format='PNG'):
+    from io import BytesIO
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+class CompletionPhotoPipelineTestCase(TestCase):
+    """Фотографии завершения: оригиналы в хранилище, превью после commit, превью в списках"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.master = CustomUser.objects.create_user(email='photo-master@test.com', password='x', role='master')
+        cls.token = Token.objects.create(user=cls.master)
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, JOBS_RUN_INLINE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+    def complete(self, photos):
+        order = make_order(assigned_master=self.master, status='назначен')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('complete_order', args=[order.id]),
+                {'work_description': 'Готово', 'total_received': '10000', 'completion_photos': photos},
+                HTTP_AUTHORIZATION=f'Token {self.token.key}'
+            )
+        return order, response
+
+    def test_renditions_generated_and_used_in_lists(self):
+        order, response = self.complete([make_image('a.png'), make_image('b.jpg', image_format='JPEG')])
+        self.assertEqual(response.status_code, 201, response.content)
+        completion = OrderCompletion.objects.get(order=order)
+        self.assertEqual(len(completion.completion_photos), 2)
+        self.assertTrue(completion.photo_renditions_ready)
+
+        from PIL import Image
+        with default_storage.open(rendition_path(completion.completion_photos[0], 'thumb')) as thumb:
+            self.assertLessEqual(max(Image.open(thumb).size), 320)
+
+        listed = self.client.get(reverse('get_master_completions'), HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        photos = listed.json()[0]['completion_photos']
+        self.assertTrue(all('/completion_photos/thumb/' in url for url in photos))
+        self.assertNotIn('photo_renditions', listed.json()[0])
+
+        detail = self.client.get(
+            reverse('get_completion_detail', args=[completion.id]), HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        ).json()
+        self.assertFalse(any('/thumb/' in url for url in detail['completion_photos']))
+        self.assertIn('/completion_photos/web/', detail['photo_renditions'][0]['web'])
+
+    def test_too_many_photos_rejected_before_create(self):
+        order, response = self.complete([make_image(f'{i}.png', size=(10, 10)) for i in range(6)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OrderCompletion.objects.filter(order=order).exists())
+
+    def test_duplicate_uploads_share_one_file(self):
+        photo = make_image('same.png', size=(50, 50))
+        first_order, _ = self.complete([photo, make_image('same-again.png', size=(50, 50))])
+        second_order, _ = self.complete([make_image('renamed.jpg', size=(50, 50))])
+
+        first = OrderCompletion.objects.get(order=first_order)
+        second = OrderCompletion.objects.get(order=second_order)
+        self.assertEqual(first.completion_photos, second.completion_photos)
+        blob = PhotoBlob.objects.get()
+        self.assertEqual((blob.path, blob.ref_count), (first.completion_photos[0], 2))
+        self.assertEqual(len(default_storage.listdir(os.path.dirname(blob.path))[1]), 1)
+
+    def test_gc_removes_unreferenced_files(self):
+        order, _ = self.complete([make_image('gc.png', size=(50, 50))])
+        path = OrderCompletion.objects.get(order=order).completion_photos[0]
+
+        order.delete()
+        self.assertEqual(PhotoBlob.objects.get(path=path).ref_count, 0)
+        call_command('gc_completion_photos', grace_hours=1, stdout=StringIO())
+        self.assertTrue(default_storage.exists(path))
+
+        PhotoBlob.objects.update(last_referenced_at=timezone.now() - timedelta(hours=2))
+        call_command('gc_completion_photos', grace_hours=1, stdout=StringIO())
+        self.assertFalse(PhotoBlob.objects.exists())
+        self.assertFalse(default_storage.exists(path))
+        self.assertFalse(default_storage.exists(rendition_path(path, 'thumb')))
+
+    def test_released_file_survives_grace_period(self):
+        order, _ = self.complete([make_image('released.png', size=(50, 50))])
+        path = OrderCompletion.objects.get(order=order).completion_photos[0]
+        PhotoBlob.objects.update(last_referenced_at=timezone.now() - timedelta(hours=2))
+
+        order.delete()
+        call_command('gc_completion_photos', grace_hours=1, stdout=StringIO())
+        self.assertEqual(PhotoBlob.objects.get(path=path).ref_count, 0)
+        self.assertTrue(default_storage.exists(path))
+
+    def test_rolled_back_upload_removes_file(self):
+        with mock.patch('api1.serializers.enqueue_renditions', side_effect=RuntimeError('queue is down')):
+            order, response = self.complete([make_image('rollback.png', size=(50, 50))])
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(OrderCompletion.objects.filter(order=order).exists())
+        self.assertFalse(PhotoBlob.objects.exists())
+        self.assertEqual([files for _, _, files in os.walk(self.media_root) if files], [])
+
+    def test_broken_photo_job_is_retried(self):
+        order, _ = self.complete([make_image('broken.png', size=(50, 50))])
+        completion = OrderCompletion.objects.get(order=order)
+        with default_storage.open(completion.completion_photos[0], 'wb') as broken:
+            broken.write(b'not an image')
+
+        with override_settings(JOBS_RUN_INLINE=False):
+            background_job = enqueue('completion_photos.renditions', completion_id=completion.id, force=True)
+            run_pending()
+        background_job.refresh_from_db()
+        self.assertEqual((background_job.status, background_job.attempts), ('pending', 1))
+        self.assertIn('cannot identify image', background_job.last_error)
+
+
+JOB_CALLS = []
+
+
+@job('tests.record')
+def record_job(value):
+    JOB_CALLS.append(value)
+
+
+@job('tests.flaky', max_attempts=2)
+def flaky_job():
+    raise RuntimeError('boom')
+
+
+class BackgroundJobQueueTestCase(TestCase):
+    """Очередь задач в БД: идемпотентность, повторы с задержкой, возврат зависших задач"""
+
+    def setUp(self):
+        JOB_CALLS.clear()
+
+    def test_enqueue_and_run(self):
+        first = enqueue('tests.record', idempotency_key='record-1', value=1)
+        again = enqueue('tests.record', idempotency_key='record-1', value=2)
+        enqueue('tests.record', value=3)
+        self.assertEqual(first.pk, again.pk)
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(JOB_CALLS, [1, 3])
+        self.assertEqual(set(BackgroundJob.objects.values_list('status', flat=True)), {'done'})
+        with self.assertRaises(JobError):
+            enqueue('tests.unknown')
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        background_job = enqueue('tests.flaky')
+        run_pending()
+        background_job.refresh_from_db()
+        self.assertEqual((background_job.status, background_job.attempts), ('pending', 1))
+        self.assertGreater(background_job.run_at, timezone.now())
+        self.assertIn('boom', background_job.last_error)
+
+        BackgroundJob.objects.update(run_at=timezone.now())
+        run_pending()
+        background_job.refresh_from_db()
+        self.assertEqual((background_job.status, background_job.attempts), ('failed', 2))
+
+    def test_stale_running_job_is_reclaimed(self):
+        background_job = enqueue('tests.record', value='stale')
+        self.assertEqual(len(claim_jobs('dead-worker')), 1)
+        self.assertEqual(claim_jobs('other-worker'), [])
+
+        BackgroundJob.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(JOB_CALLS, ['stale'])
+        background_job.refresh_from_db()
+        self.assertEqual((background_job.status, background_job.attempts), ('done', 2))
+
+    def test_run_workers_once(self):
+        enqueue('tests.record', value='cli')
+        call_command('run_workers', once=True, stdout=StringIO())
+        self.assertEqual(JOB_CALLS, ['cli'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED проверяется только на PostgreSQL')
+class BackgroundJobConcurrencyTestCase(TransactionTestCase):
+    """Параллельные воркеры не получают одну и ту же задачу"""
+
+    def test_each_job_claimed_once(self):
+        for value in range(40):
+            enqueue('tests.record', value=value)
+        claimed = []
+        lock = threading.Lock()
+
+        def worker(number):
+            try:
+                while True:
+                    jobs = claim_jobs(f'worker-{number}', limit=3)
+                    if not jobs:
+                        return
+                    with lock:
+                        claimed.extend(background_job.id for background_job in jobs)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(claimed), 40)
+        self.assertEqual(len(set(claimed)), 40)
+
+
+class ScheduleCleanupTestCase(TestCase):
+    """Слоты завершённых заказов удаляются одним DELETE или частями, кэш расписания сбрасывается"""
+
+    def setUp(self):
+        self.curator = CustomUser.objects.create_user(email='cleanup-curator@test.com', password='x', role='curator')
+        self.token = Token.objects.create(user=self.curator)
+        self.master = CustomUser.objects.create_user(email='cleanup-master@test.com', password='x', role='master')
+        self.day = timezone.now().date() + timedelta(days=1)
+        for number, order_status in enumerate(['завершен', 'completed', 'принят', 'назначен'], start=1):
+            OrderSlot.objects.create(
+                master=self.master, order=make_order(assigned_master=self.master, status=order_status),
+                slot_date=self.day, slot_time=datetime.strptime(f'{8 + number:02d}:00', '%H:%M').time(),
+                slot_number=number
+            )
+
+    def test_single_delete(self):
+        version = schedule_version(self.master.id)
+        with self.assertNumQueries(4):  # SAVEPOINT, мастера, DELETE, RELEASE
+            self.assertEqual(delete_completed_order_slots(), 3)
+        self.assertEqual(list(OrderSlot.objects.values_list('order__status', flat=True)), ['назначен'])
+        self.assertNotEqual(schedule_version(self.master.id), version)
+        self.assertEqual(delete_completed_order_slots(), 0)
+
+    def test_batched_delete_and_command(self):
+        self.assertEqual(delete_completed_order_slots(batch_size=2), 3)
+        self.assertEqual(OrderSlot.objects.count(), 1)
+
+        OrderSlot.objects.create(
+            master=self.master, order=make_order(assigned_master=self.master, status='завершен'),
+            slot_date=self.day, slot_time=datetime.strptime('15:00', '%H:%M').time(), slot_number=7
+        )
+        out = StringIO()
+        call_command('cleanup_schedule', dry_run=True, stdout=out)
+        self.assertIn('1', out.getvalue())
+        call_command('cleanup_schedule', batch_size=0, stdout=StringIO())
+        self.assertEqual(OrderSlot.objects.count(), 1)
+
+    def test_endpoint(self):
+        response = self.client.post('/api/schedule/cleanup/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['deleted_slots_count'], 3)
+        self.assertEqual(response.json()['completed_orders_count'], 3)
+
+    def test_nightly_job_reschedules_itself(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        first = schedule_daily(names=['schedule.cleanup_completed'], now=yesterday)[0]
+        self.assertEqual(schedule_daily(names=['schedule.cleanup_completed'], now=yesterday)[0].pk, first.pk)
+        self.assertEqual(timezone.localtime(first.run_at).strftime('%H:%M'), '03:00')
+        self.assertLessEqual(first.run_at, timezone.now())
+
+        self.assertEqual(run_pending(names=['schedule.cleanup_completed']), 1)
+        self.assertEqual(OrderSlot.objects.count(), 1)
+        jobs = BackgroundJob.objects.filter(name='schedule.cleanup_completed').order_by('id')
+        self.assertEqual([background_job.status for background_job in jobs], ['done', 'pending'])
+        self.assertGreater(jobs[1].run_at, timezone.now())
+
+
+class OrderArchiveTestCase(TestCase):
+    """Перенос старых заказов в архив и чтение архива только по запросу истории"""
+
+    def setUp(self):
+        self.curator = CustomUser.objects.create_user(email='archive-curator@test.com', password='x', role='curator')
+        self.token = Token.objects.create(user=self.curator)
+        self.master = CustomUser.objects.create_user(email='archive-master@test.com', password='x', role='master')
+        old = timezone.now() - timedelta(days=400)
+
+        self.archived = make_order(assigned_master=self.master, status='завершен', final_cost=Decimal('5000'))
+        self.completion = OrderCompletion.objects.create(
+            order=self.archived, master=self.master, work_description='Замена фильтра',
+            total_received=Decimal('5000'), completion_date=old, status='одобрен', is_distributed=True,
+            completion_photos=['completion_photos/ab/abc.jpg']
+        )
+        OrderSlot.objects.create(master=self.master, order=self.archived, slot_date=old.date(),
+                                 slot_time=datetime.strptime('10:00', '%H:%M').time(), slot_number=1)
+        OrderLog.objects.create(order=self.archived, action='completed', performed_by=self.master, description='done')
+        self.payment = FinancialTransaction.objects.create(
+            user=self.master, order_completion=self.completion, transaction_type='master_payment',
+            amount=Decimal('1500'), description='Выплата'
+        )
+        self.transaction_log = TransactionLog.objects.create(
+            user=self.master, transaction_type='master_payment', amount=Decimal('1500'),
+            description='Выплата', order=self.archived
+        )
+
+        self.under_review = make_order(assigned_master=self.master, status='завершен')
+        OrderCompletion.objects.create(order=self.under_review, master=self.master, work_description='-',
+                                       total_received=Decimal('100'), completion_date=old)
+        self.recent = make_order(assigned_master=self.master, status='завершен')
+        self.new = make_order(status='новый')
+        Order.objects.exclude(pk=self.recent.pk).update(created_at=old)
+
+    def auth(self):
+        return {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def test_archive_moves_only_finished_old_orders(self):
+        self.assertEqual(archive_orders(batch_size=1), 1)
+
+        self.assertFalse(Order.objects.filter(pk=self.archived.pk).exists())
+        self.assertFalse(OrderCompletion.objects.filter(pk=self.completion.pk).exists())
+        self.assertFalse(OrderSlot.objects.filter(order_id=self.archived.pk).exists())
+        self.assertFalse(OrderLog.objects.filter(order_id=self.archived.pk).exists())
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)),
+                         {self.under_review.pk, self.recent.pk, self.new.pk})
+
+        self.payment.refresh_from_db()
+        self.transaction_log.refresh_from_db()
+        self.assertIsNone(self.payment.order_completion_id)
+        self.assertIsNone(self.transaction_log.order_id)
+
+        archived = ArchivedOrder.objects.get(pk=self.archived.pk)
+        self.assertEqual((archived.status, archived.assigned_master_id), ('завершен', self.master.id))
+        self.assertEqual(archived.completion['transactions'], [self.payment.pk])
+        self.assertEqual(archived.logs.count(), 1)
+        self.assertEqual(archive_orders(), 0)
+
+    def test_archive_keeps_photo_references_and_resets_schedule_cache(self):
+        blob = PhotoBlob.objects.create(sha256='abc', path='completion_photos/ab/abc.jpg', size=10, ref_count=1)
+        version = schedule_version(self.master.id)
+        self.assertEqual(archive_orders(), 1)
+        # Фотографии остаются на учёте у архивного завершения, расписание мастера перечитывается
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertNotEqual(schedule_version(self.master.id), version)
+
+    def test_archive_is_read_only_for_history_requests(self):
+        archive_orders()
+
+        response = self.client.get(f'/api/orders/{self.archived.pk}/detail/', **self.auth())
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f'/api/orders/{self.archived.pk}/detail/?include_archived=1', **self.auth())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['is_archived'])
+        self.assertEqual(response.json()['assigned_master_email'], self.master.email)
+        self.assertEqual(response.json()['completion']['work_description'], 'Замена фильтра')
+
+        response = self.client.get(f'/api/logs/orders/{self.archived.pk}/?include_archived=1', **self.auth())
+        self.assertEqual([log['action'] for log in response.json()], ['completed'])
+
+        hot_ids = [order['id'] for order in self.client.get('/api/orders/all/', **self.auth()).json()]
+        all_ids = [order['id'] for order in
+                   self.client.get('/api/orders/all/?include_archived=1', **self.auth()).json()]
+        self.assertNotIn(self.archived.pk, hot_ids)
+        self.assertEqual(all_ids, hot_ids + [self.archived.pk])
+
+    def test_restore_round_trip(self):
+        archive_orders()
+        self.assertTrue(restore_order(self.archived.pk))
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+        order = Order.objects.select_related('completion', 'slot').get(pk=self.archived.pk)
+        self.assertEqual(order.completion.pk, self.completion.pk)
+        self.assertEqual(order.completion.completion_photos, ['completion_photos/ab/abc.jpg'])
+        self.assertEqual(order.slot.slot_number, 1)
+        self.assertEqual(order.logs.count(), 1)
+        self.payment.refresh_from_db()
+        self.transaction_log.refresh_from_db()
+        self.assertEqual(self.payment.order_completion_id, self.completion.pk)
+        self.assertEqual(self.transaction_log.order_id, self.archived.pk)
+        self.assertFalse(restore_order(self.archived.pk))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_orders', dry_run=True, stdout=out)
+        self.assertIn('1', out.getvalue())
+        call_command('archive_orders', days=10000, stdout=StringIO())
+        self.assertFalse(ArchivedOrder.objects.exists())
+        call_command('archive_orders', stdout=StringIO())
+        self.assertTrue(ArchivedOrder.objects.filter(pk=self.archived.pk).exists())
+
+
+class FinanceRollupTestCase(TestCase):
+    """Дневные финансовые итоги обновляются при распределении и совпадают с пересчётом"""
+
+    ROLLUP_FIELDS = ['orders_count', 'gross', 'expenses', 'net_profit', 'master_paid', 'master_balance',
+                     'curator_share', 'company_share']
+
+    def setUp(self):
+        self.curator = CustomUser.objects.create_user(email='rollup-curator@test.com', password='x', role='curator')
+        self.curator_token = Token.objects.create(user=self.curator)
+        self.master = CustomUser.objects.create_user(email='rollup-master@test.com', password='x', role='master')
+        self.master_token = Token.objects.create(user=self.master)
+        ProfitDistributionSettings.get_settings()
+        for received in (Decimal('10000'), Decimal('20000')):
+            order = make_order(assigned_master=self.master, status='ожидает_подтверждения')
+            completion = OrderCompletion.objects.create(
+                order=order, master=self.master, work_description='-', total_received=received,
+                parts_expenses=Decimal('1000'), completion_date=timezone.now()
+            )
+            response = self.client.post(f'/api/completions/{completion.id}/review/', {'action': 'approve'},
+                                        HTTP_AUTHORIZATION=f'Token {self.curator_token.key}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('distribution_error', response.json())
+        self.today = timezone.localdate()
+
+    def rollups(self):
+        return {
+            model.__name__: list(model.objects.order_by('id').values(*self.ROLLUP_FIELDS))
+            for model in (MasterDailyFinance, CuratorDailyFinance, CompanyDailyFinance)
+        }
+
+    def test_distribution_updates_rollups(self):
+        day = MasterDailyFinance.objects.get(master=self.master, date=self.today)
+        self.assertEqual(day.orders_count, 2)
+        self.assertEqual(day.gross, Decimal('30000'))
+        self.assertEqual(day.net_profit, Decimal('28000'))
+        self.assertEqual(day.master_paid, Decimal('8400'))
+        self.assertEqual(day.master_balance, Decimal('8400'))
+        self.assertEqual(CuratorDailyFinance.objects.get(curator=self.curator).curator_share, Decimal('1400'))
+        self.assertEqual(CompanyDailyFinance.objects.get(date=self.today).company_share, Decimal('9800'))
+
+    def test_rebuild_matches_incremental_and_covers_archive(self):
+        incremental = self.rollups()
+        self.assertEqual(rebuild_rollups(self.today, self.today), 1)
+        self.assertEqual(self.rollups(), incremental)
+
+        Order.objects.update(created_at=timezone.now() - timedelta(days=400))
+        self.assertEqual(archive_orders(), 2)
+        self.assertEqual(ArchivedOrder.objects.filter(review_date__date=self.today).count(), 2)
+        call_command('rebuild_finance_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+        # Архив отбирается по review_date в SQL, транзакции - пачками
+        self.assertEqual(rebuild_rollups(self.today - timedelta(days=1), self.today - timedelta(days=1)), 0)
+        with mock.patch('api1.finance_rollups.ARCHIVE_CHUNK_SIZE', 1):
+            self.assertEqual(rebuild_rollups(self.today, self.today), 1)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_report_endpoint(self):
+        with self.assertNumQueries(2):  # токен, итоги
+            response = self.client.get('/api/finance/report/', HTTP_AUTHORIZATION=f'Token {self.curator_token.key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['totals']['orders_count'], 2)
+        self.assertEqual(Decimal(response.json()['totals']['company_share']), Decimal('9800'))
+
+        response = self.client.get('/api/finance/report/?scope=master',
+                                   HTTP_AUTHORIZATION=f'Token {self.master_token.key}')
+        self.assertEqual(Decimal(response.json()['totals']['master_paid']), Decimal('8400'))
+        self.assertEqual(len(response.json()['days']), 1)
+
+        response = self.client.get('/api/finance/report/', HTTP_AUTHORIZATION=f'Token {self.master_token.key}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/api/finance/report/?from=2024-01-01&to=2025-06-01',
+                                   HTTP_AUTHORIZATION=f'Token {self.curator_token.key}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AnalyticsDashboardTestCase(TestCase):
+    """Аналитика супер админа: по одному сгруппированному запросу на раздел и кэш с TTL"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(email='analytics-admin@test.com', password='x', role='super-admin')
+        self.token = Token.objects.create(user=self.admin)
+        self.master = CustomUser.objects.create_user(email='analytics-master@test.com', password='x', role='master')
+        created = timezone.make_aware(datetime(2026, 3, 2, 10, 0))  # понедельник
+        done = make_order(assigned_master=self.master, status='завершен', final_cost=Decimal('8000'))
+        started = make_order(assigned_master=self.master, status='выполняется')
+        make_order(status='новый')
+        Order.objects.update(created_at=created)
+        Order.objects.filter(pk=started.pk).update(started_at=created + timedelta(hours=2))
+        completion = OrderCompletion.objects.create(
+            order=done, master=self.master, work_description='-', total_received=Decimal('8000'),
+            completion_date=created, status='одобрен'
+        )
+        OrderCompletion.objects.filter(pk=completion.pk).update(
+            created_at=created + timedelta(hours=5), review_date=created + timedelta(hours=7)
+        )
+
+    def get(self, query=''):
+        return self.client.get(f'/api/analytics/dashboard/?from=2026-03-01&to=2026-03-31{query}',
+                               HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_dashboard(self):
+        with self.assertNumQueries(5):  # токен, мастера, их email, спрос, проверка
+            response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+
+        [master] = data['masters']
+        self.assertEqual((master['total_orders'], master['completed_orders'], master['completion_rate']), (2, 1, 50.0))
+        self.assertEqual(master['average_check'], 8000.0)
+        self.assertEqual(master['avg_hours_to_start'], 2.0)
+        self.assertEqual(master['avg_hours_to_complete'], 5.0)
+
+        self.assertEqual(data['demand']['matrix'][0][10], 3)
+        self.assertEqual(data['demand']['by_weekday'][0], 3)
+        self.assertEqual(sum(data['demand']['by_hour']), 3)
+
+        latency = data['approval_latency']
+        self.assertEqual((latency['total_reviewed'], latency['approved'], latency['avg_hours']), (1, 1, 2.0))
+        self.assertEqual([bucket['count'] for bucket in latency['histogram']], [0, 1, 0, 0, 0, 0])
+
+        with self.assertNumQueries(1):  # только токен, разделы из кэша
+            self.assertEqual(self.get().json(), data)
+
+    def test_validation_and_access(self):
+        self.assertEqual(self.get('&sections=demand,unknown').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(self.get('&sections=demand').json()), ['from', 'to', 'demand'])
+        response = self.client.get('/api/analytics/dashboard/?from=2025-01-01&to=2026-03-01',
+                                   HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        master_token = Token.objects.create(user=self.master)
+        response = self.client.get('/api/analytics/dashboard/', HTTP_AUTHORIZATION=f'Token {master_token.key}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DemandForecastTestCase(TestCase):
+    """Прогноз спроса и нехватка мощности по дням"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.user = CustomUser.objects.create_user(email='forecast-admin@test.com', password='pass', role='super-admin')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_fit_recovers_weekly_pattern(self):
+        # Понедельник - 10 заказов в 10:00, остальные дни - 2 в 15:00
+        history = {}
+        for offset in range(1, 8 * 7 + 1):
+            day = self.today - timedelta(days=offset)
+            hours = [0] * 24
+            if day.weekday() == 0:
+                hours[10] = 10
+            else:
+                hours[15] = 2
+            history[day] = hours
+
+        forecast = fit_forecast(history, self.today)
+        self.assertEqual(len(forecast), 7)
+        for day, expected, hourly in forecast:
+            self.assertAlmostEqual(expected, 10 if day.weekday() == 0 else 2, places=1)
+            self.assertAlmostEqual(sum(hourly), expected, places=1)
+            self.assertEqual(hourly.index(max(hourly)), 10 if day.weekday() == 0 else 15)
+
+    def test_empty_history(self):
+        self.assertEqual({expected for _, expected, _ in fit_forecast({}, self.today)}, {0.0})
+
+    def test_nightly_job_and_weekly_shortfall(self):
+        created = timezone.now() - timedelta(days=7)
+        for _ in range(3):
+            make_order()
+        Order.objects.update(created_at=created)
+
+        enqueue('capacity.demand_forecast')
+        run_pending()
+        self.assertEqual(DemandForecast.objects.count(), 7)
+        self.assertGreater(get_demand_forecast([self.today])[self.today], 0)
+
+        response = self.client.get('/api/capacity/weekly-forecast/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        # Мастеров нет - весь прогноз спроса не обеспечен
+        for day in data['week_forecast']:
+            self.assertEqual(day['projected_shortfall'], day['projected_demand'])
+        self.assertGreater(data['total_projected_shortfall'], 0)
+        self.assertEqual(DemandForecast.objects.count(), 7)
+
+    def test_missing_forecast_is_not_written(self):
+        make_order()
+        Order.objects.update(created_at=timezone.now() - timedelta(days=7))
+        tomorrow = self.today + timedelta(days=1)
+        forecast = get_demand_forecast([self.today, tomorrow])
+        self.assertEqual(set(forecast), {self.today, tomorrow})
+        self.assertFalse(DemandForecast.objects.exists())
+
+        response = self.client.get('/api/capacity/analysis/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(DemandForecast.objects.exists())
+
+
+class DistanceSimulationTestCase(TestCase):
+    """Симуляция порогов дистанционки совпадает с check_distance_level и ничего не меняет"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email='sim-admin@test.com', password='pass', role='super-admin')
+        self.token = Token.objects.create(user=self.admin)
+        DistanceSettingsModel.get_settings()
+        now = timezone.now()
+        self.masters = []
+        # (стоимость заказов, расходы, сколько дней назад): средний чек, сутки, вал за 10 дней
+        for index, (cost, expenses, days_ago) in enumerate([
+            (70000, 60000, 30), (400000, 0, 0), (20000, 0, 3), (200000, 0, 5), (10000, 0, 40)
+        ]):
+            master = CustomUser.objects.create_user(email=f'sim-master{index}@test.com', password='pass', role='master')
+            for _ in range(10):
+                order = make_order(status='завершен', assigned_master=master, final_cost=cost, expenses=expenses)
+                Order.objects.filter(id=order.id).update(created_at=now - timedelta(days=days_ago, hours=1))
+            self.masters.append(master)
+        self.masters[4].dist = 2
+        self.masters[4].distance_manual_override = True
+        self.masters[4].save()
+        for hours in (2, 30, 40, 60):
+            order = make_order(status='новый')
+            Order.objects.filter(id=order.id).update(created_at=now - timedelta(hours=hours))
+
+    def simulate(self, candidates):
+        return self.client.post('/api/distance/settings/simulate/', {'candidates': candidates},
+                                content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_matches_distance_levels(self):
+        with self.assertNumQueries(5):  # токен, настройки, мастера, заказы, лента
+            response = self.simulate([{}, {'averageCheckThreshold': 15000, 'visiblePeriodDaily': 72}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data['total_masters'], data['manual_override']), (5, 1))
+
+        expected = [check_distance_level(master.id) for master in self.masters[:4]] + [2]
+        current, cheaper = data['candidates']
+        self.assertEqual(current['levels'], {str(level): expected.count(level) for level in range(3)})
+        self.assertEqual(current['changes'], {'promoted': sum(level > 0 for level in expected[:4]), 'demoted': 0})
+        self.assertEqual(current['visibility']['visible_new_orders'], {'0': 1, '1': 1, '2': 3})
+
+        # Порог среднего чека 15000 поднимает мастера с чеком 20000 на уровень 1
+        self.assertEqual(cheaper['levels']['1'], current['levels']['1'] + 1)
+        self.assertEqual(cheaper['visibility']['visible_new_orders']['2'], 4)
+        self.assertGreater(cheaper['visibility']['avg_visible_change'], current['visibility']['avg_visible_change'])
+
+        self.assertEqual(list(CustomUser.objects.filter(role='master').order_by('id').values_list('dist', flat=True)),
+                         [0, 0, 0, 0, 2])
+
+    def test_validation_and_access(self):
+        self.assertEqual(self.simulate([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.simulate([{'averageCheckThreshold': 'много'}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.simulate([{'unknownThreshold': 1}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.simulate([{}] * 51).status_code, status.HTTP_400_BAD_REQUEST)
+        master_token = Token.objects.create(user=self.masters[0])
+        response = self.client.post('/api/distance/settings/simulate/', {'candidates': [{}]},
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Token {master_token.key}')
+        self.assertEqual(response.status_code, 403)
+
+
+class ProfitPreviewBatchTestCase(TestCase):
+    """Предпросмотр распределения для многих заказов: настройки мастеров одним запросом"""
+
+    def setUp(self):
+        self.curator = CustomUser.objects.create_user(email='preview-curator@test.com', password='pass', role='curator')
+        self.token = Token.objects.create(user=self.curator)
+        ProfitDistributionSettings.get_settings()
+        self.individual = CustomUser.objects.create_user(email='preview-ind@test.com', password='pass', role='master')
+        self.regular = CustomUser.objects.create_user(email='preview-reg@test.com', password='pass', role='master')
+        MasterProfitSettings.objects.create(
+            master=self.individual, master_paid_percent=40, master_balance_percent=20,
+            curator_percent=7, company_percent=33
+        )
+        self.orders = [
+            make_order(assigned_master=self.individual, final_cost=Decimal('10000.55')),
+            make_order(assigned_master=self.regular, estimated_cost=Decimal('3333.33')),
+            make_order(),
+        ]
+
+    def get(self, query=''):
+        return self.client.get(f'/api/orders/profit-preview/{query}', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_orders_match_single_preview(self):
+        ids = ','.join(str(order.id) for order in self.orders)
+        with self.assertNumQueries(4):  # токен, заказы, проверка версии и версии настроек (изменились в setUp)
+            response = self.get(f'?order_ids={ids}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        for order, item in zip(self.orders, data['items']):
+            single = self.client.get(f'/api/orders/{order.id}/profit-preview/',
+                                     HTTP_AUTHORIZATION=f'Token {self.token.key}').json()
+            self.assertEqual(item['estimated_distribution'], single['estimated_distribution'])
+        self.assertTrue(data['items'][0]['estimated_distribution']['settings_used']['is_individual'])
+        self.assertEqual(data['items'][0]['estimated_distribution']['master_paid'], '4000.22')
+        self.assertIsNone(data['items'][2]['estimated_distribution'])
+        self.assertEqual(data['totals']['total_amount'], '13333.88')
+        with self.assertNumQueries(3):  # настройки уже в памяти, только проверка версии
+            self.get(f'?order_ids={ids}')
+
+    def test_pending_completions(self):
+        for order in self.orders[:2]:
+            OrderCompletion.objects.create(
+                order=order, master=order.assigned_master, work_description='Готово',
+                completion_date=timezone.now(), parts_expenses=Decimal('1000'), transport_costs=Decimal('0'),
+                total_received=Decimal('11000')
+            )
+        data = self.get().json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual({item['estimated_distribution']['total_amount'] for item in data['items']}, {'10000.00'})
+        self.assertEqual(data['totals']['company_amount'], str(Decimal('3300.00') + Decimal('3500.00')))
+
+    def test_validation_and_access(self):
+        self.assertEqual(self.get('?order_ids=1,x').status_code, status.HTTP_400_BAD_REQUEST)
+        master_token = Token.objects.create(user=self.regular)
+        response = self.client.get('/api/orders/profit-preview/', HTTP_AUTHORIZATION=f'Token {master_token.key}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProfitSettingsVersionTestCase(TestCase):
+    """Версии настроек прибыли: история изменений, разрешение без запросов и сверка раз за запрос"""
+
+    def setUp(self):
+        self.global_settings = ProfitDistributionSettings.get_settings()
+        self.master = CustomUser.objects.create_user(email='versions-master@test.com', password='pass', role='master')
+        self.order = make_order(assigned_master=self.master, status='завершен')
+        self.completion = OrderCompletion.objects.create(
+            order=self.order, master=self.master, work_description='Готово', completion_date=timezone.now(),
+            total_received=Decimal('10000'), status='одобрен', review_date=timezone.now()
+        )
+
+    def test_history_is_reproduced(self):
+        # Настройки поменялись после проверки завершения - распределение считается по старым
+        self.global_settings.master_paid_percent, self.global_settings.company_percent = 40, 25
+        self.global_settings.save()
+        MasterProfitSettings.objects.create(master=self.master, master_paid_percent=50, master_balance_percent=20,
+                                            curator_percent=5, company_percent=25)
+
+        distribution = self.completion.calculate_distribution()
+        self.assertEqual(distribution['settings_used'], 'global')
+        self.assertEqual(distribution['master_immediate'], Decimal('3000'))
+        self.assertEqual(resolve_profit_settings(None)['master_paid_percent'], 40)
+        self.assertTrue(resolve_profit_settings(self.master.id)['is_individual'])
+
+        # Проверка после изменения - по новым индивидуальным настройкам
+        self.completion.review_date = timezone.now()
+        self.assertEqual(self.completion.calculate_distribution()['master_immediate'], Decimal('5000'))
+
+    def test_deleted_individual_settings_fall_back_to_global(self):
+        settings = MasterProfitSettings.objects.create(
+            master=self.master, master_paid_percent=50, master_balance_percent=20, curator_percent=5, company_percent=25
+        )
+        during, settings_id = timezone.now(), settings.id
+        settings.delete()
+        self.assertFalse(resolve_profit_settings(self.master.id)['is_individual'])
+        self.assertEqual(resolve_profit_settings(self.master.id, at=during)['settings_id'], settings_id)
+        self.assertEqual(ProfitSettingsVersion.objects.filter(master=self.master).count(), 2)
+
+    def test_resolution_without_reloading(self):
+        resolver = get_resolver()
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                resolver.resolve(self.master.id)
+                resolver.resolve(self.master.id, at=timezone.now() - timedelta(days=30))
+
+        # В запросе (сигналы request_started/request_finished) отпечаток версий сверяется
+        # один раз, дальше разрешения без запросов
+        start_request()
+        self.addCleanup(finish_request)
+        with self.assertNumQueries(1):
+            resolve_profit_settings(self.master.id)
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                resolve_profit_settings(self.master.id)
+            MasterProfitSettings.get_settings_for_masters([self.master.id, None])
+
+    def test_change_from_another_process_is_seen(self):
+        start_request()
+        resolve_profit_settings(None)
+        finish_request()
+        # Версия, записанная другим процессом: ни сигналов, ни общего кэша
+        ProfitSettingsVersion.objects.create(
+            effective_from=timezone.now(), master_paid_percent=45, master_balance_percent=25,
+            curator_percent=5, company_percent=25
+        )
+        start_request()
+        self.addCleanup(finish_request)
+        self.assertEqual(resolve_profit_settings(None)['master_paid_percent'], 45)
+
+    def test_change_in_this_process_is_seen_within_request(self):
+        start_request()
+        self.addCleanup(finish_request)
+        self.assertFalse(resolve_profit_settings(self.master.id)['is_individual'])
+        MasterProfitSettings.objects.create(master=self.master, master_paid_percent=50, master_balance_percent=20,
+                                            curator_percent=5, company_percent=25)
+        self.assertTrue(resolve_profit_settings(self.master.id)['is_individual'])
+
+
+class CompletionListingTestCase(TestCase):
+    """Постраничные списки завершений: keyset-курсор, фильтры, короткое представление"""
+
+    def setUp(self):
+        self.curator = CustomUser.objects.create_user(email='list-curator@test.com', password='pass', role='curator')
+        self.token = Token.objects.create(user=self.curator)
+        self.masters = [
+            CustomUser.objects.create_user(email=f'list-master{i}@test.com', password='pass', role='master')
+            for i in range(2)
+        ]
+        created = timezone.now() - timedelta(days=3)
+        self.completions = []
+        for index in range(7):
+            master = self.masters[index % 2]
+            completion = OrderCompletion.objects.create(
+                order=make_order(assigned_master=master), master=master, work_description='Готово',
+                completion_date=created, total_received=Decimal('1000'),
+                status='одобрен' if index == 6 else 'ожидает_проверки', completion_photos=['completion_photos/ab/x.jpg']
+            )
+            # Одинаковое время у двух завершений: порядок между ними задаёт id
+            OrderCompletion.objects.filter(id=completion.id).update(created_at=created + timedelta(hours=index // 2))
+            self.completions.append(completion)
+
+    def get(self, url, query):
+        return self.client.get(f'{url}?{query}', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_pages_cover_queue_once(self):
+        expected = [c.id for c in OrderCompletion.objects.filter(status='ожидает_проверки').order_by('-created_at', '-id')]
+        self.assertEqual(len(expected), 6)
+        ids, query = [], 'limit=4'
+        while True:
+            with self.assertNumQueries(2):  # токен и страница
+                data = self.get('/api/completions/pending/', query).json()
+            ids += [row['id'] for row in data['results']]
+            if not data['next_cursor']:
+                break
+            query = f"limit=4&cursor={data['next_cursor']}"
+        self.assertEqual(ids, expected)
+
+        row = data['results'][0]
+        self.assertEqual(set(row['order']), {'id', 'client_name', 'address', 'status'})
+        self.assertNotIn('work_description', row)
+        self.assertEqual(len(row['photo_thumbs']), 1)
+
+    def test_filters(self):
+        master = self.masters[0]
+        data = self.get('/api/completions/all/', f'limit=50&master={master.id}&status=одобрен').json()
+        self.assertEqual([row['id'] for row in data['results']], [self.completions[6].id])
+        today = timezone.localdate()
+        self.assertEqual(self.get('/api/completions/all/', f'limit=50&date_from={today}').json()['results'], [])
+        self.assertEqual(len(self.get('/api/completions/all/', f'limit=50&date_to={today}').json()['results']), 7)
+        # Без limit и cursor - прежний полный список
+        self.assertEqual(len(self.get('/api/completions/pending/', '').json()), 6)
+
+    def test_invalid_parameters(self):
+        for query in ('limit=0', 'limit=x', 'cursor=broken', 'limit=5&date_from=2026-13-01', 'limit=5&master=x'):
+            with self.subTest(query=query):
+                self.assertEqual(self.get('/api/completions/all/', query).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WarrantyStatsTestCase(TestCase):
+    """Статистика гарантийных мастеров одним запросом и рейтинг"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email='warranty-admin@test.com', password='pass', role='super-admin')
+        self.token = Token.objects.create(user=self.admin)
+        self.first = CustomUser.objects.create_user(email='warranty1@test.com', password='pass', role='warrant-master')
+        self.second = CustomUser.objects.create_user(email='warranty2@test.com', password='pass', role='warrant-master')
+        old = timezone.now() - timedelta(days=10)
+        for status_value in ('завершен гарантийным', 'одобрен', 'передан на гарантию', 'в работе'):
+            make_order(transferred_to=self.first, status=status_value)
+        old_order = make_order(transferred_to=self.second, status='завершен гарантийный')
+        Order.objects.filter(id=old_order.id).update(created_at=old)
+        make_order(transferred_to=self.second, status='передан на гарантию')
+        for user, amount in ((self.first, '1000'), (self.second, '2500'), (self.second, '500')):
+            TransactionLog.objects.create(user=user, transaction_type='master_payment', amount=Decimal(amount),
+                                          description='Выплата')
+        TransactionLog.objects.create(user=self.first, transaction_type='balance_top_up', amount=Decimal('9000'),
+                                      description='Пополнение')
+        TransactionLog.objects.filter(user=self.second, amount=Decimal('2500')).update(created_at=old)
+
+    def get(self, url, query=''):
+        return self.client.get(f'{url}?{query}', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_stats_in_one_query(self):
+        with self.assertNumQueries(1):
+            first, second = warranty_master_stats()
+        self.assertEqual(first['master_id'], self.first.id)
+        self.assertEqual((first['total_orders'], first['completed_orders'], first['pending_orders']), (4, 2, 1))
+        self.assertEqual(first['completion_rate'], 50.0)
+        self.assertEqual(first['total_earnings'], 1000.0)
+        self.assertEqual((second['total_orders'], second['completed_orders'], second['total_earnings']), (2, 1, 3000.0))
+
+    def test_period(self):
+        today = timezone.localdate()
+        [second] = warranty_master_stats([self.second.id], date_from=today - timedelta(days=1))
+        self.assertEqual((second['total_orders'], second['completed_orders'], second['total_earnings']), (1, 0, 500.0))
+        [second] = warranty_master_stats([self.second.id], date_to=today - timedelta(days=5))
+        self.assertEqual((second['total_orders'], second['total_earnings']), (1, 2500.0))
+
+        data = self.get(f'/api/warranty-masters/{self.second.id}/stats/', f'date_from={today}').json()
+        self.assertEqual((data['total_orders'], data['total_earnings']), (1, 500.0))
+
+    def test_leaderboard(self):
+        data = self.get('/api/warranty-masters/stats/').json()
+        self.assertEqual([(row['rank'], row['master_id']) for row in data['masters']],
+                         [(1, self.second.id), (2, self.first.id)])
+        data = self.get('/api/warranty-masters/stats/', 'sort=completed_orders').json()
+        self.assertEqual([row['master_id'] for row in data['masters']], [self.first.id, self.second.id])
+
+    def test_leaderboard_validation_and_access(self):
+        for query in ('sort=email', 'date_from=2026-13-01', 'date_from=2026-05-02&date_to=2026-05-01'):
+            with self.subTest(query=query):
+                self.assertEqual(self.get('/api/warranty-masters/stats/', query).status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+        master_token = Token.objects.create(user=self.first)
+        response = self.client.get('/api/warranty-masters/stats/', HTTP_AUTHORIZATION=f'Token {master_token.key}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SeedLoadCommandTestCase(TestCase):
+    """seed_load пишет данные пачками, балансы сходятся с финансовыми записями"""
+
+    def test_counts_and_balances(self):
+        out = StringIO()
+        call_command('seed_load', masters=4, warranty_masters=1, curators=2, operators=1, orders=60,
+                     days=2, slots_per_day=3, batch_size=25, seed=7, stdout=out)
+
+        users = CustomUser.objects.filter(email__startswith='s7-')
+        self.assertEqual(
+            {role: users.filter(role=role).count() for role in ('master', 'warrant-master', 'curator', 'operator')},
+            {'master': 4, 'warrant-master': 1, 'curator': 2, 'operator': 1}
+        )
+        self.assertEqual(Order.objects.count(), 60)
+        self.assertEqual(MasterAvailability.objects.count(), 5 * 2 * 3)
+        self.assertEqual(OrderLog.objects.filter(action='created').count(), 60)
+        self.assertIn(f'60 заказов, {OrderCompletion.objects.count()} завершений, '
+                      f'{OrderSlot.objects.count()} слотов, 30 записей расписания', out.getvalue())
+
+        self.assertTrue(FinancialTransaction.objects.exists())
+        self.assertEqual(
+            sum(Balance.objects.filter(user__in=users).values_list('amount', flat=True)),
+            sum(BalanceLog.objects.values_list('amount', flat=True))
+        )
+        self.assertEqual(CompanyBalance.get_instance().amount,
+                         sum(CompanyBalanceLog.objects.values_list('amount', flat=True)))
+
+    def test_same_seed_rejected(self):
+        call_command('seed_load', masters=1, warranty_masters=0, curators=1, operators=0, orders=5,
+                     days=1, slots_per_day=1, seed=8, no_ledger=True, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_load', masters=1, orders=5, seed=8, stdout=StringIO())
+
+
+class BenchmarkRunnerTestCase(TestCase):
+    """Статистика замеров, отчёт и сравнение с базовой линией (benchmarks/runner.py)"""
+
+    def test_summarize(self):
+        stats = bench_runner.summarize([0.004, 0.001, 0.003, 0.002, 0.010])
+        self.assertEqual((stats['iterations'], stats['p50_ms'], stats['p95_ms']), (5, 3.0, 10.0))
+        self.assertEqual((stats['min_ms'], stats['max_ms'], stats['mean_ms']), (1.0, 10.0, 4.0))
+        self.assertEqual(stats['throughput_per_s'], 250.0)
+        self.assertEqual(bench_runner.summarize([])['p95_ms'], 0.0)
+
+    def test_run_scenario_warms_up_and_closes(self):
+        calls = []
+
+        def prepare(context, total):
+            calls.append(('prepare', total))
+
+            def run():
+                print('debug output')
+                calls.append('run')
+            run.close = lambda: calls.append('close')
+            return run
+
+        with mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            stats = bench_runner.run_scenario(prepare, {}, iterations=3, warmup=2)
+        self.assertEqual(stats['iterations'], 3)
+        self.assertEqual(calls, [('prepare', 5)] + ['run'] * 5 + ['close'])
+        self.assertEqual(stdout.getvalue(), '')
+
+    def test_run_all_skips_other_vendors(self):
+        skipped = []
+        with mock.patch.dict(bench_runner.SCENARIOS, clear=True):
+            @bench_runner.scenario('tests.any')
+            def any_vendor(context, total):
+                return lambda: None
+
+            @bench_runner.scenario('tests.other', vendors=['oracle'])
+            def other_vendor(context, total):
+                return lambda: None
+
+            results = bench_runner.run_all({}, ['tests.any', 'tests.other'], 1,
+                                           skipped=lambda name, vendors: skipped.append(name))
+        self.assertEqual(list(results), ['tests.any'])
+        self.assertEqual(skipped, ['tests.other'])
+
+    def test_report_round_trip_and_comparison(self):
+        baseline = bench_runner.build_report({
+            'orders': {'p50_ms': 10.0, 'p95_ms': 20.0},
+            'slots': {'p50_ms': 0.0, 'p95_ms': 5.0},
+        }, orders=100)
+        self.assertEqual((baseline['meta']['database'], baseline['meta']['orders']), (connection.vendor, 100))
+
+        path = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), True)
+        bench_runner.save_report(baseline, path)
+        self.assertEqual(bench_runner.load_report(path), baseline)
+
+        current = bench_runner.build_report({
+            'orders': {'p50_ms': 11.0, 'p95_ms': 30.0},
+            'slots': {'p50_ms': 3.0, 'p95_ms': 5.0},
+            'new': {'p50_ms': 1.0, 'p95_ms': 1.0},
+        })
+        rows = {(row['scenario'], row['metric']): row
+                for row in bench_runner.compare_reports(bench_runner.load_report(path), current, threshold=0.2)}
+        self.assertEqual(rows[('orders', 'p50_ms')]['change'], 0.1)
+        self.assertFalse(rows[('orders', 'p50_ms')]['regression'])
+        self.assertEqual(rows[('orders', 'p95_ms')]['change'], 0.5)
+        self.assertTrue(rows[('orders', 'p95_ms')]['regression'])
+        # Нулевая базовая линия не считается регрессией
+        self.assertFalse(rows[('slots', 'p50_ms')]['regression'])
+        self.assertEqual(rows[('new', None)], {'scenario': 'new', 'metric': None, 'regression': False})
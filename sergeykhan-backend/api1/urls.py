@@ -13,12 +13,14 @@ from .balance_views import (
     get_company_balance,
     modify_company_balance,
     get_company_balance_logs,
-    get_user_balance_detailed_for_super_admin
+    get_user_balance_detailed_for_super_admin,
+    get_finance_report
 )
 from .calendar_views import get_master_events
 from .distancionka import (
     get_distance_settings,
     update_distance_settings,
+    simulate_distance_settings_view,
     get_master_distance_info,
     get_all_masters_distance,
     get_master_available_orders_with_distance,
@@ -30,11 +32,17 @@ from .distancionka import (
 from .master_workload_views import (
     master_availability_list,
     master_availability_detail,
+    master_availability_templates,
+    master_availability_exceptions,
+    master_availability_calendar,
     master_workload_detail,
     all_masters_workload,
-    validate_order_scheduling
+    validate_order_scheduling,
+    validate_order_scheduling_batch
 )
 from .views.auth_views import get_masters, get_operators, get_curators
+from .analytics import get_analytics_dashboard
+from .warranty_stats import get_warranty_leaderboard
 from .capacity_analysis import (
     get_capacity_analysis,
     get_weekly_capacity_forecast
@@ -139,6 +147,7 @@ urlpatterns = [
     path('api/orders/<int:order_id>/warranty/approve/', approve_warranty_order, name='approve_warranty_order'),
     path('api/warranty-masters/<int:master_id>/stats/', get_warranty_master_stats, name='get_warranty_master_stats'),
     path('api/warranty-masters/my-stats/', get_warranty_master_stats, name='get_my_warranty_stats'),
+    path('api/warranty-masters/stats/', get_warranty_leaderboard, name='get_warranty_leaderboard'),
     
     # Валидация ролей
     path('api/validate-role/', validate_user_role, name='validate_user_role'),
@@ -150,6 +159,7 @@ urlpatterns = [
       # Distance endpoints
     path('api/distance/settings/', get_distance_settings, name='get_distance_settings'),
     path('api/distance/settings/update/', update_distance_settings, name='update_distance_settings'),
+    path('api/distance/settings/simulate/', simulate_distance_settings_view, name='simulate_distance_settings'),
     path('api/distance/master/<int:master_id>/', get_master_distance_info, name='get_master_distance_info'),
     path('api/distance/masters/all/', get_all_masters_distance, name='get_all_masters_distance'),    path('api/distance/orders/available/', get_master_available_orders_with_distance, name='get_master_available_orders_with_distance'),    path('api/distance/force-update/', force_update_all_masters_distance, name='force_update_all_masters_distance'),    path('api/distance/master/<int:master_id>/set/', set_master_distance_manually, name='set_master_distance_manually'),
     path('api/distance/master/<int:master_id>/reset/', reset_master_distance_to_automatic, name='reset_master_distance_to_automatic'),
@@ -159,6 +169,7 @@ urlpatterns = [
     path('api/company-balance/', get_company_balance, name='get_company_balance'),
     path('api/company-balance/modify/', modify_company_balance, name='modify_company_balance'),
     path('api/company-balance/logs/', get_company_balance_logs, name='get_company_balance_logs'),
+    path('api/finance/report/', get_finance_report, name='get_finance_report'),
     
     # Universal balance endpoint for dashboard (returns company balance for super-admin, personal balance for others)
     path('api/balance/<int:user_id>/dashboard/', get_user_balance_detailed_for_super_admin, name='get_user_balance_detailed_for_super_admin'),
@@ -166,11 +177,16 @@ urlpatterns = [
     # Master Workload and Availability endpoints
     path('api/masters/<int:master_id>/availability/', master_availability_list, name='master_availability_list'),
     path('api/masters/<int:master_id>/availability/<int:availability_id>/', master_availability_detail, name='master_availability_detail'),
+    path('api/masters/<int:master_id>/availability/templates/', master_availability_templates, name='master_availability_templates'),
+    path('api/masters/<int:master_id>/availability/exceptions/', master_availability_exceptions, name='master_availability_exceptions'),
+    path('api/masters/<int:master_id>/availability/calendar/', master_availability_calendar, name='master_availability_calendar'),
     path('api/masters/<int:master_id>/workload/', master_workload_detail, name='master_workload_detail'),    path('api/masters/workload/all/', all_masters_workload, name='all_masters_workload'),
     path('api/orders/validate-scheduling/', validate_order_scheduling, name='validate_order_scheduling'),
+    path('api/orders/validate-scheduling/batch/', validate_order_scheduling_batch, name='validate_order_scheduling_batch'),
       # Capacity Analysis endpoints
     path('api/capacity/analysis/', get_capacity_analysis, name='get_capacity_analysis'),
     path('api/capacity/weekly-forecast/', get_weekly_capacity_forecast, name='get_weekly_capacity_forecast'),
+    path('api/analytics/dashboard/', get_analytics_dashboard, name='get_analytics_dashboard'),
     
     # Master Schedule endpoints
     path('api/master/schedule/', master_schedule_view, name='master_schedule'),
@@ -179,6 +195,7 @@ urlpatterns = [
     path('api/orders/<int:order_id>/complete/', complete_order, name='complete_order'),
     path('api/completions/master/', get_master_completions, name='get_master_completions'),
     path('api/completions/pending/', get_pending_completions, name='get_pending_completions'),
+    path('api/completions/all/', get_all_completions, name='get_all_completions'),
     path('api/completions/<int:completion_id>/', get_completion_detail, name='get_completion_detail'),
     path('api/completions/<int:completion_id>/review/', review_completion, name='review_completion'),
     path('api/schedule/cleanup/', cleanup_completed_orders_from_schedule, name='cleanup_schedule'),
@@ -189,6 +206,7 @@ urlpatterns = [
     path('api/profit-settings/master/<int:master_id>/', get_master_profit_settings, name='get_master_profit_settings'),
     path('api/profit-settings/master/<int:master_id>/set/', set_master_profit_settings, name='set_master_profit_settings'),    path('api/profit-settings/master/<int:master_id>/delete/', delete_master_profit_settings, name='delete_master_profit_settings'),
     path('api/orders/<int:order_id>/profit-preview/', get_order_profit_preview, name='get_order_profit_preview'),
+    path('api/orders/profit-preview/', get_profit_preview_batch, name='get_profit_preview_batch'),
     
     # Order Slots Management endpoints
     path('api/slots/master/<int:master_id>/schedule/', get_master_daily_schedule, name='get_master_daily_schedule'),
@@ -3,6 +3,9 @@ API представления для завершения заказов
 Updated: 2025-09-13 - Fixed import issues
 """
 from .utils import *
+from ..analytics import period_bounds
+from ..pagination import keyset_page, wants_page
+from ..serializers import OrderCompletionListSerializer
 
 
 # ----------------------------------------
@@ -74,10 +77,9 @@ def complete_order(request, order_id):
 @permission_classes([IsAuthenticated])
 @role_required([ROLES['CURATOR'], ROLES['SUPER_ADMIN']])
 def get_pending_completions(request):
-    """Получение завершений, ожидающих проверки куратором"""
-    completions = OrderCompletion.objects.filter(status='ожидает_проверки').order_by('-created_at')
-    serializer = OrderCompletionSerializer(completions, many=True, context={'request': request})
-    return Response(serializer.data)
+    """Получение завершений, ожидающих проверки куратором (частичный индекс completion_pending_idx)"""
+    completions = OrderCompletion.objects.filter(status='ожидает_проверки')
+    return completion_list_response(request, completions, filters=('master', 'date_from', 'date_to'))
 
 
 @api_view(['POST'])
@@ -292,6 +294,15 @@ def distribute_completion_funds(completion, curator):
         # Отмечаем как распределено
         completion.is_distributed = True
         completion.save()
+
+        # Дневные итоги для отчётов (api1/finance_rollups.py)
+        from api1.finance_rollups import record_distribution
+        record_distribution(completion, curator, {
+            'master_paid': master_immediate,
+            'master_balance': master_deferred,
+            'curator_share': curator_share,
+            'company_share': company_share,
+        })
         
         # Логируем успешное завершение
         total_to_balance = master_immediate + master_deferred
@@ -327,19 +338,68 @@ def distribute_completion_funds(completion, curator):
 @permission_classes([IsAuthenticated])
 def get_master_completions(request):
     """Получение завершений мастера"""
-    completions = OrderCompletion.objects.filter(master=request.user).order_by('-created_at')
-    serializer = OrderCompletionSerializer(completions, many=True, context={'request': request})
-    return Response(serializer.data)
+    completions = OrderCompletion.objects.filter(master=request.user)
+    return completion_list_response(request, completions, filters=('status', 'date_from', 'date_to'))
 
 
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
+@role_required([ROLES['CURATOR'], ROLES['SUPER_ADMIN']])
 def get_all_completions(request):
     """Получение всех завершений (для админов)"""
-    completions = OrderCompletion.objects.all().order_by('-created_at')
-    serializer = OrderCompletionSerializer(completions, many=True, context={'request': request})
-    return Response(serializer.data)
+    return completion_list_response(
+        request, OrderCompletion.objects.all(), filters=('status', 'master', 'date_from', 'date_to')
+    )
+
+
+def filter_completions(completions, params, filters):
+    """
+    Фильтры списка завершений: ?status=a,b ?master=<id> ?date_from=&date_to=YYYY-MM-DD (дата отправки).
+    ValueError при неверных значениях.
+    """
+    if 'status' in filters and params.get('status'):
+        completions = completions.filter(status__in=params['status'].split(','))
+    if 'master' in filters and params.get('master'):
+        completions = completions.filter(master_id=int(params['master']))
+    for key, lookup in (('date_from', 'created_at__gte'), ('date_to', 'created_at__lt')):
+        if key in filters and params.get(key):
+            day = datetime.strptime(params[key], '%Y-%m-%d').date()
+            start, end = period_bounds(day, day)
+            completions = completions.filter(**{lookup: start if key == 'date_from' else end})
+    return completions
+
+
+def completion_list_response(request, completions, filters=()):
+    """
+    Список завершений. С ?limit= или ?cursor= - страница в коротком представлении
+    (keyset-пагинация, api1/pagination.py): {'results', 'next_cursor'}; без них - полный
+    список в прежнем формате.
+    """
+    try:
+        completions = filter_completions(completions, request.query_params, filters)
+        if not wants_page(request):
+            completions = completions.select_related('order', 'master', 'curator').order_by('-created_at')
+            serializer = OrderCompletionSerializer(completions, many=True, context={'request': request})
+            return Response(serializer.data)
+        rows, next_cursor = keyset_page(completions.select_related('order', 'master').only(
+            *COMPLETION_LIST_FIELDS
+        ), request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'results': OrderCompletionListSerializer(rows, many=True, context={'request': request}).data,
+        'next_cursor': next_cursor
+    })
+
+
+# Поля, которые читает OrderCompletionListSerializer
+COMPLETION_LIST_FIELDS = (
+    'id', 'status', 'total_received', 'total_expenses', 'net_profit', 'completion_date', 'review_date',
+    'is_distributed', 'created_at', 'completion_photos', 'photo_renditions_ready',
+    'order__id', 'order__client_name', 'order__address', 'order__status',
+    'master__id', 'master__first_name', 'master__last_name', 'master__email',
+)
 
 
 @api_view(['GET'])
@@ -360,27 +420,24 @@ def get_completion_detail(request, completion_id):
 @permission_classes([IsAuthenticated])
 @role_required([ROLES['SUPER_ADMIN'], ROLES['CURATOR']])
 def cleanup_completed_orders_from_schedule(request):
-    """Очистка завершенных заказов из расписания"""
+    """
+    Очистка завершенных заказов из расписания.
+
+    Ночью то же делает задача schedule.cleanup_completed (manage.py run_workers)
+    или команда cleanup_schedule.
+    """
     try:
-        # Находим все завершенные заказы
-        completed_orders = Order.objects.filter(
-            status__in=['завершен', 'completed', 'принят']
+        from api1.slot_reservation import (
+            CLEANUP_BATCH_SIZE, COMPLETED_ORDER_STATUSES, delete_completed_order_slots
         )
-        
-        # Удаляем связанные слоты расписания для завершенных заказов
-        from api1.models import OrderSlot
-        deleted_slots = 0
-        
-        for order in completed_orders:
-            slots_deleted, _ = OrderSlot.objects.filter(order=order).delete()
-            deleted_slots += slots_deleted
-        
+        deleted_slots = delete_completed_order_slots(batch_size=CLEANUP_BATCH_SIZE)
+
         return Response({
             'message': 'Очистка расписания завершена',
-            'completed_orders_count': completed_orders.count(),
+            'completed_orders_count': Order.objects.filter(status__in=COMPLETED_ORDER_STATUSES).count(),
             'deleted_slots_count': deleted_slots
         }, status=status.HTTP_200_OK)
-        
+
     except Exception as e:
         return Response({
             'error': f'Ошибка при очистке расписания: {str(e)}'
@@ -2,6 +2,7 @@
 API представления для логирования
 """
 from .utils import *
+from ..order_repository import OrderRepository
 
 
 # ----------------------------------------
@@ -14,19 +15,19 @@ from .utils import *
 def get_order_logs(request, order_id):
     """
     Получить логи для конкретного заказа
+    (?include_archived=1 - и для архивного заказа)
     """
-    try:
-        order = Order.objects.get(id=order_id)
-        logs = OrderLog.objects.filter(order=order).order_by('-created_at')
-        serializer = OrderLogSerializer(logs, many=True)
-        return Response(serializer.data)
-    except Order.DoesNotExist:
+    logs = OrderRepository.for_request(request).logs(order_id)
+    if logs is None:
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    serializer = OrderLogSerializer(logs, many=True)
+    return Response(serializer.data)
 
 
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def get_all_order_logs(request):
     """
     Получить все логи заказов (с пагинацией)
@@ -3,6 +3,8 @@
 Позволяет администраторам настраивать процентные ставки для каждого мастера индивидуально.
 """
 
+from decimal import Decimal
+
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes
@@ -12,6 +14,32 @@ from rest_framework import status
 from ..models import CustomUser, MasterProfitSettings, ProfitDistributionSettings
 from ..serializers import MasterProfitSettingsSerializer
 
+PREVIEW_MAX_ORDERS = 500
+
+
+def distribution_preview(total_amount, profit_settings):
+    """Распределение суммы по процентам настроек (Decimal, до копейки) или None, если суммы нет"""
+    if not total_amount or total_amount <= 0:
+        return None
+    percents = {
+        key: Decimal(profit_settings[f'{key}_percent'])
+        for key in ('master_paid', 'master_balance', 'curator', 'company')
+    }
+
+    def share(key):
+        return str((total_amount * percents[key] / Decimal('100')).quantize(Decimal('0.01')))
+
+    # Правильная логика: master_paid и master_balance - разные части
+    return {
+        'total_amount': str(total_amount),
+        'master_paid': share('master_paid'),
+        'master_balance': share('master_balance'),
+        'master_total_percent': str(percents['master_paid'] + percents['master_balance']),
+        'curator_amount': share('curator'),
+        'company_amount': share('company'),
+        'settings_used': profit_settings
+    }
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -164,11 +192,13 @@ def get_all_masters_with_settings(request):
         )
     
     try:
-        masters = CustomUser.objects.filter(role='master').order_by('first_name', 'last_name')
+        masters = list(CustomUser.objects.filter(role='master').order_by('first_name', 'last_name'))
         masters_data = []
+        # Настройки всех мастеров одним запросом (+ глобальные один раз)
+        all_settings = MasterProfitSettings.get_settings_for_masters([master.id for master in masters])
         
         for master in masters:
-            settings_data = MasterProfitSettings.get_settings_for_master(master)
+            settings_data = all_settings[master.id]
             masters_data.append({
                 'id': master.id,
                 'name': master.get_full_name() or master.email,
@@ -198,7 +228,6 @@ def get_order_profit_preview(request, order_id):
     """
     try:
         from ..models import Order
-        from decimal import Decimal
         
         order = get_object_or_404(Order, id=order_id)
         
@@ -216,24 +245,7 @@ def get_order_profit_preview(request, order_id):
         total_amount = order.final_cost or order.estimated_cost or Decimal('0')
         
         # Рассчитываем распределение только если есть сумма
-        estimated_distribution = None
-        if total_amount > 0:
-            # Правильная логика: master_paid и master_balance - разные части
-            master_paid_amount = total_amount * Decimal(profit_settings['master_paid_percent']) / Decimal('100')
-            master_balance_amount = total_amount * Decimal(profit_settings['master_balance_percent']) / Decimal('100')
-            
-            curator_amount = total_amount * Decimal(profit_settings['curator_percent']) / Decimal('100')
-            company_amount = total_amount * Decimal(profit_settings['company_percent']) / Decimal('100')
-            
-            estimated_distribution = {
-                'total_amount': str(total_amount),
-                'master_paid': str(master_paid_amount.quantize(Decimal('0.01'))),
-                'master_balance': str(master_balance_amount.quantize(Decimal('0.01'))),
-                'master_total_percent': str((Decimal(profit_settings['master_paid_percent']) + Decimal(profit_settings['master_balance_percent']))),
-                'curator_amount': str(curator_amount.quantize(Decimal('0.01'))),
-                'company_amount': str(company_amount.quantize(Decimal('0.01'))),
-                'settings_used': profit_settings
-            }
+        estimated_distribution = distribution_preview(total_amount, profit_settings)
         
         return Response({
             'order_id': order.id,
@@ -251,3 +263,77 @@ def get_order_profit_preview(request, order_id):
             {'error': f'Ошибка получения предварительного расчета: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_profit_preview_batch(request):
+    """
+    Предварительный расчет распределения прибыли для многих заказов сразу.
+    ?order_ids=1,2,3 - заказы (сумма: final_cost -> estimated_cost);
+    без order_ids - все завершения, ожидающие проверки (сумма: чистая прибыль завершения).
+    Доступно: администраторам и кураторам.
+    """
+    from ..models import Order, OrderCompletion
+    
+    if request.user.role not in ['super-admin', 'curator']:
+        return Response(
+            {'error': 'У вас нет прав для просмотра этой информации'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    order_ids = request.query_params.get('order_ids')
+    if order_ids:
+        try:
+            order_ids = {int(order_id) for order_id in order_ids.split(',')}
+        except ValueError:
+            return Response({'error': 'order_ids - список id через запятую'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(order_ids) > PREVIEW_MAX_ORDERS:
+            return Response(
+                {'error': f'Не больше {PREVIEW_MAX_ORDERS} заказов за запрос'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        orders = Order.objects.filter(id__in=order_ids).select_related('assigned_master').order_by('id')
+        rows = [
+            (order, None, order.assigned_master, order.final_cost or order.estimated_cost or Decimal('0'))
+            for order in orders
+        ]
+    else:
+        completions = OrderCompletion.objects.filter(status='ожидает_проверки').select_related(
+            'order__assigned_master', 'order__transferred_to'
+        ).order_by('created_at')
+        rows = [
+            (completion.order, completion, completion.order.assigned_master or completion.order.transferred_to,
+             completion.net_profit)
+            for completion in completions
+        ]
+    
+    # Настройки всех мастеров одним запросом, глобальные (ключ None - без мастера) - один раз
+    master_settings = MasterProfitSettings.get_settings_for_masters(
+        {master.id if master else None for _, _, master, _ in rows}
+    )
+    items = []
+    totals = {key: Decimal('0') for key in ('total_amount', 'master_paid', 'master_balance',
+                                             'curator_amount', 'company_amount')}
+    for order, completion, master, total_amount in rows:
+        profit_settings = master_settings[master.id if master else None]
+        distribution = distribution_preview(total_amount, profit_settings)
+        if distribution:
+            for key in totals:
+                totals[key] += Decimal(distribution[key])
+        items.append({
+            'order_id': order.id,
+            'completion_id': completion.id if completion else None,
+            'assigned_master': {
+                'id': master.id if master else None,
+                'name': master.get_full_name() if master else None
+            },
+            'estimated_distribution': distribution
+        })
+    
+    return Response({
+        'items': items,
+        'count': len(items),
+        'totals': {key: str(value) for key, value in totals.items()}
+    })
+
@@ -2,9 +2,13 @@
 API представления для заказов
 """
 from .utils import *
-from ..models import MasterAvailability, OrderSlot, OrderCompletion
+from ..models import OrderSlot, OrderCompletion
 from ..serializers import OrderCompletionCreateSerializer
-from django.db import models
+from ..slot_reservation import reserve_slot, SlotUnavailable
+from ..availability import is_master_available, has_availability_from
+from ..order_repository import OrderRepository
+from django.db import models, transaction
+from datetime import time
 
 
 # ----------------------------------------
@@ -52,15 +56,8 @@ def create_order(request):
                 # Check if master exists
                 master = CustomUser.objects.get(id=assigned_master_id, role='master')
                 
-                # Check if master has availability at this time
-                availability_slots = MasterAvailability.objects.filter(
-                    master=master,
-                    date=schedule_date,
-                    start_time__lte=schedule_time,
-                    end_time__gt=schedule_time
-                )
-                
-                if not availability_slots.exists():
+                # Check if master has availability at this time (слоты или шаблон)
+                if not is_master_available(master, schedule_date, schedule_time):
                     return Response(
                         {'error': 'Master is not available at the requested time'}, 
                         status=status.HTTP_400_BAD_REQUEST
@@ -147,34 +144,13 @@ def assign_master(request, order_id):
             schedule_date = datetime.strptime(scheduled_date, '%Y-%m-%d').date()
             schedule_time = datetime.strptime(scheduled_time, '%H:%M:%S').time()
             
-            # Проверяем есть ли у мастера рабочий слот в это время
-            availability_slots = MasterAvailability.objects.filter(
-                master=master,
-                date=schedule_date,
-                start_time__lte=schedule_time,
-                end_time__gt=schedule_time
-            )
-            
-            if not availability_slots.exists():
+            # Проверяем есть ли у мастера рабочий слот в это время (слоты или шаблон)
+            if not is_master_available(master, schedule_date, schedule_time):
                 return Response({
                     'error': f'Мастер {master.email} недоступен {scheduled_date} в {scheduled_time}. Выберите другое время из доступных слотов.'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Проверяем нет ли уже заказа в это время (для обычных и гарантийных мастеров)
-            conflicting_orders = Order.objects.filter(
-                models.Q(assigned_master=master) | models.Q(transferred_to=master),
-                scheduled_date=schedule_date,
-                scheduled_time=schedule_time
-            ).exclude(id=order_id)
-            
-            if conflicting_orders.exists():
-                return Response({
-                    'error': f'У мастера {master.email} уже есть заказ на {scheduled_date} в {scheduled_time}'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Устанавливаем дату и время заказа
-            order.scheduled_date = schedule_date
-            order.scheduled_time = schedule_time
+            # Пересечение с другими заказами мастера проверяется при резервировании слота
             
         except ValueError:
             return Response({'error': 'Invalid date or time format'}, status=status.HTTP_400_BAD_REQUEST)
@@ -182,12 +158,7 @@ def assign_master(request, order_id):
         # Если дата и время не указаны, проверяем есть ли вообще доступные слоты
         from django.utils import timezone
         
-        available_slots = MasterAvailability.objects.filter(
-            master=master,
-            date__gte=timezone.now().date()
-        )
-        
-        if not available_slots.exists():
+        if not has_availability_from(master, timezone.now().date()):
             return Response({
                 'error': f'Мастер {master.email} не имеет доступных рабочих слотов. Создайте расписание для мастера.'
             }, status=status.HTTP_400_BAD_REQUEST)
@@ -197,56 +168,45 @@ def assign_master(request, order_id):
     old_transferred_to = order.transferred_to.email if order.transferred_to else None
     old_status = order.status
 
-    # Для гарантийных мастеров используем transferred_to, для обычных мастеров - assigned_master
-    if master.role == 'warrant-master':
-        order.transferred_to = master
-        order.status = 'передан на гарантию'
-        # Сбрасываем assigned_master если он был установлен
-        order.assigned_master = None
-    else:
-        order.assigned_master = master
-        order.status = 'назначен'
-        # Сбрасываем transferred_to если он был установлен
-        order.transferred_to = None
-    
-    order.curator = request.user
-    order.save()
-
-    # Создаем OrderSlot если указана дата и время
-    if scheduled_date and scheduled_time:
-        from datetime import timedelta
-        
-        # Определяем номер слота в дне (основан на времени начала)
-        time_to_slot_number = {
-            '09:00:00': 1, '10:00:00': 2, '11:00:00': 3, '12:00:00': 4,
-            '13:00:00': 5, '14:00:00': 6, '15:00:00': 7, '16:00:00': 8, 
-            '17:00:00': 9, '18:00:00': 10, '19:00:00': 11, '20:00:00': 12
-        }
-        
-        slot_number = time_to_slot_number.get(scheduled_time, 1)
-        
-        # Создаем или обновляем OrderSlot
-        order_slot, created = OrderSlot.objects.get_or_create(
-            order=order,
-            defaults={
-                'master': master,
-                'slot_date': schedule_date,
-                'slot_time': schedule_time,
-                'slot_number': slot_number,
-                'slot_duration': timedelta(hours=1),  # 1 час по умолчанию
-                'status': 'confirmed',
-                'notes': f'Автоматически создан при назначении заказа #{order.id}'
+    # Слот и заказ меняются в одной транзакции: проверка занятости и запись
+    # идут под блокировкой дня мастера, параллельное назначение не займёт то же время
+    with transaction.atomic():
+        if scheduled_date and scheduled_time:
+            # Определяем номер слота в дне (основан на времени начала)
+            time_to_slot_number = {
+                '09:00:00': 1, '10:00:00': 2, '11:00:00': 3, '12:00:00': 4,
+                '13:00:00': 5, '14:00:00': 6, '15:00:00': 7, '16:00:00': 8, 
+                '17:00:00': 9, '18:00:00': 10, '19:00:00': 11, '20:00:00': 12
             }
-        )
-        
-        if not created and order_slot.master != master:
-            # Обновляем существующий слот если изменился мастер
-            order_slot.master = master
-            order_slot.slot_date = schedule_date
-            order_slot.slot_time = schedule_time
-            order_slot.slot_number = slot_number
-            order_slot.status = 'confirmed'
-            order_slot.save()
+            slot_number = time_to_slot_number.get(scheduled_time, 1)
+
+            try:
+                reserve_slot(
+                    order, master, schedule_date, [slot_number],
+                    slot_time=schedule_time,
+                    status='confirmed',
+                    slot_duration=timedelta(hours=1),  # 1 час по умолчанию
+                    notes=f'Автоматически создан при назначении заказа #{order.id}',
+                    move_existing=True,
+                    check_time_conflict=True
+                )
+            except SlotUnavailable as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Для гарантийных мастеров используем transferred_to, для обычных мастеров - assigned_master
+        if master.role == 'warrant-master':
+            order.transferred_to = master
+            order.status = 'передан на гарантию'
+            # Сбрасываем assigned_master если он был установлен
+            order.assigned_master = None
+        else:
+            order.assigned_master = master
+            order.status = 'назначен'
+            # Сбрасываем transferred_to если он был установлен
+            order.transferred_to = None
+        
+        order.curator = request.user
+        order.save()
 
     # Логируем назначение мастера
     action_type = 'warranty_transfer' if master.role == 'warrant-master' else 'master_assigned'
@@ -307,7 +267,8 @@ def delete_order(request, order_id):
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
 def get_all_orders(request):
-    orders = Order.objects.all()
+    # ?include_archived=1 - вместе с архивными заказами
+    orders = OrderRepository.for_request(request).filter(order_by='id')
     serializer = OrderSerializer(orders, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -319,7 +280,7 @@ def get_orders_new(request):
     """
     Получить список заказов со статусом 'новый'
     """
-    orders = Order.objects.filter(status='новый').order_by('-created_at')
+    orders = Order.objects.filter(status='новый').select_related('completion').order_by('-created_at')
     serializer = OrderSerializer(orders, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -330,13 +291,13 @@ def get_orders_new(request):
 def get_order_detail(request, order_id):
     """
     Получить детальную информацию о заказе
+    (?include_archived=1 - искать и среди архивных заказов)
     """
-    try:
-        order = Order.objects.get(id=order_id)
-        serializer = OrderDetailSerializer(order, context={'request': request})
-        return Response(serializer.data)
-    except Order.DoesNotExist:
+    order = OrderRepository.for_request(request).get(order_id)
+    if order is None:
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    serializer = OrderDetailSerializer(order, context={'request': request})
+    return Response({**serializer.data, 'is_archived': getattr(order, 'is_archived', False)})
 
 
 @api_view(['PATCH'])
@@ -450,7 +411,7 @@ def get_orders_last_day(request):
 @permission_classes([IsAuthenticated])
 def get_active_orders(request):
     active_statuses = ['в обработке', 'назначен', 'выполняется']
-    orders = Order.objects.filter(status__in=active_statuses)
+    orders = Order.objects.filter(status__in=active_statuses).select_related('completion')
     serializer = OrderSerializer(orders, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -460,7 +421,7 @@ def get_active_orders(request):
 @permission_classes([IsAuthenticated])
 def get_non_active_orders(request):
     inactive_statuses = ['завершен', 'новый']
-    orders = Order.objects.filter(status__in=inactive_statuses)
+    orders = OrderRepository.for_request(request).filter(status__in=inactive_statuses, order_by='id')
     serializer = OrderSerializer(orders, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -476,7 +437,7 @@ def get_master_available_orders(request):
     # Импортируем функцию из distancionka.py
     from ..distancionka import get_visible_orders_for_master
     
-    orders = get_visible_orders_for_master(request.user.id)
+    orders = get_visible_orders_for_master(request.user.id).select_related('completion')
     serializer = OrderSerializer(orders, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -558,6 +519,7 @@ def start_order(request, order_id):
         
         # Start the order
         order.status = 'выполняется'
+        order.started_at = timezone.now()
         order.save()
         
         return Response({
@@ -720,111 +682,45 @@ def transfer_order_to_warranty_master(request, order_id):
                 'error': 'Гарантийный мастер не найден'
             }, status=status.HTTP_404_NOT_FOUND)
         
+        # Слот проверяется до изменения заказа: без свободного слота заказ не передаётся
+        if scheduled_date and scheduled_time:
+            try:
+                slot_date = datetime.strptime(scheduled_date, '%Y-%m-%d').date()
+                slot_time = datetime.strptime(scheduled_time, '%H:%M').time()
+            except ValueError:
+                return Response({'error': 'Invalid date or time format'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Check if warranty master has availability at this time
+            # Двухчасовые слоты с 09:00: 09-11 = 1, 11-13 = 2, ... 19-21 = 6
+            if not (time(9, 0) <= slot_time < time(21, 0)) or not is_master_available(warranty_master, slot_date, slot_time):
+                return Response({
+                    'error': f'Гарантийный мастер {warranty_master.email} недоступен {scheduled_date} в {scheduled_time}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
         # Update order
         old_status = order.status
         order.transferred_to = warranty_master
         order.status = 'передан на гарантию'
         
-        # Update slot information if provided
-        if scheduled_date and scheduled_time:
-            order.scheduled_date = scheduled_date
-            order.scheduled_time = scheduled_time
+        # Слот и заказ сохраняются в одной транзакции, слот занимается атомарно
+        with transaction.atomic():
+            if scheduled_date and scheduled_time:
+                # Только слот запрошенного времени: другой номер слота с тем же временем
+                # дал бы мастеру два заказа одновременно
+                try:
+                    reserve_slot(
+                        order, warranty_master, slot_date, [(slot_time.hour - 9) // 2 + 1],
+                        slot_time=slot_time,
+                        status='confirmed',
+                        slot_duration=timedelta(hours=1),
+                        notes=f'Автоматически создан при передаче заказа #{order.id} гарантийному мастеру',
+                        move_existing=True,
+                        check_time_conflict=True
+                    )
+                except SlotUnavailable as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Try to create or update OrderSlot for warranty master
-            try:
-                from datetime import datetime, timedelta
-                from ..models import OrderSlot, MasterDailySchedule
-                
-                # Parse date and time
-                slot_date = datetime.strptime(scheduled_date, '%Y-%m-%d').date()
-                slot_time = datetime.strptime(scheduled_time, '%H:%M').time()
-                
-                # Check if warranty master has availability at this time
-                from ..models import MasterAvailability
-                availability_slots = MasterAvailability.objects.filter(
-                    master=warranty_master,
-                    date=slot_date,
-                    start_time__lte=slot_time,
-                    end_time__gt=slot_time
-                )
-                
-                if availability_slots.exists():
-                    # Get or create OrderSlot
-                    daily_schedule = MasterDailySchedule.get_or_create_for_master_date(warranty_master, slot_date)
-                    
-                    # Find the appropriate slot number for the requested time
-                    slot_number = None
-                    
-                    # Simple slot calculation based on time ranges
-                    time_to_slot_map = {
-                        # 09:00-11:00 = slot 1
-                        (datetime.strptime("09:00", "%H:%M").time(), datetime.strptime("11:00", "%H:%M").time()): 1,
-                        # 11:00-13:00 = slot 2  
-                        (datetime.strptime("11:00", "%H:%M").time(), datetime.strptime("13:00", "%H:%M").time()): 2,
-                        # 13:00-15:00 = slot 3
-                        (datetime.strptime("13:00", "%H:%M").time(), datetime.strptime("15:00", "%H:%M").time()): 3,
-                        # 15:00-17:00 = slot 4
-                        (datetime.strptime("15:00", "%H:%M").time(), datetime.strptime("17:00", "%H:%M").time()): 4,
-                        # 17:00-19:00 = slot 5
-                        (datetime.strptime("17:00", "%H:%M").time(), datetime.strptime("19:00", "%H:%M").time()): 5,
-                        # 19:00-21:00 = slot 6
-                        (datetime.strptime("19:00", "%H:%M").time(), datetime.strptime("21:00", "%H:%M").time()): 6,
-                    }
-                    
-                    # Find which slot the requested time falls into
-                    for (start_time, end_time), slot_num in time_to_slot_map.items():
-                        if start_time <= slot_time < end_time:
-                            # Check if this slot is available
-                            existing_slots = OrderSlot.objects.filter(
-                                master=warranty_master,
-                                slot_date=slot_date,
-                                slot_number=slot_num
-                            )
-                            
-                            if not existing_slots.exists():
-                                slot_number = slot_num
-                                break
-                    
-                    # Fallback to first available slot if time-specific slot not found
-                    if slot_number is None:
-                        available_slots = OrderSlot.get_available_slots_for_master(warranty_master, slot_date)
-                        if available_slots:
-                            slot_number = available_slots[0]
-                    
-                    if slot_number is not None:
-                        
-                        order_slot, created = OrderSlot.objects.get_or_create(
-                            order=order,
-                            defaults={
-                                'master': warranty_master,
-                                'slot_date': slot_date,
-                                'slot_time': slot_time,
-                                'slot_number': slot_number,
-                                'slot_duration': timedelta(hours=1),
-                                'status': 'confirmed',
-                                'notes': f'Автоматически создан при передаче заказа #{order.id} гарантийному мастеру'
-                            }
-                        )
-                        
-                        if not created and order_slot.master != warranty_master:
-                            # Update existing slot
-                            order_slot.master = warranty_master
-                            order_slot.slot_date = slot_date
-                            order_slot.slot_time = slot_time
-                            order_slot.slot_number = slot_number
-                            order_slot.status = 'confirmed'
-                            order_slot.save()
-                            
-                        print(f"✅ Создан/обновлен слот для гарантийного мастера: {slot_date} {slot_time}")
-                    else:
-                        print(f"⚠️ Нет доступных слотов у гарантийного мастера на {slot_date}")
-                else:
-                    print(f"⚠️ Гарантийный мастер недоступен в указанное время: {slot_date} {slot_time}")
-                    
-            except Exception as slot_error:
-                print(f"Ошибка создания слота для гарантийного мастера: {slot_error}")
-        
-        order.save()
+            order.save()
         
         # Create log entry
         try:
@@ -27,6 +27,7 @@ from ..serializers import (
     OrderCompletionReviewSerializer, FinancialTransactionSerializer, OrderCompletionDistributionSerializer
 )
 from ..middleware import role_required, RolePermission
+from ..db_router import read_from_replica
 
 # Константы ролей
 ROLES = {
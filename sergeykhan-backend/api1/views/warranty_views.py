@@ -2,6 +2,7 @@
 API представления для гарантийных мастеров
 """
 from .utils import *
+from ..warranty_stats import parse_period, warranty_master_stats
 
 
 # ----------------------------------------
@@ -179,9 +180,10 @@ def get_all_warranty_masters(request):
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def get_warranty_master_stats(request, master_id=None):
     """
-    Получить статистику для гарантийного мастера
+    Получить статистику для гарантийного мастера (?date_from=&date_to=YYYY-MM-DD - за период)
     """
     if master_id:
         try:
@@ -193,26 +195,13 @@ def get_warranty_master_stats(request, master_id=None):
         if master.role != 'warrant-master':
             return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
 
-    # Статистика заказов
-    total_orders = Order.objects.filter(transferred_to=master).count()
-    completed_orders = Order.objects.filter(transferred_to=master, status__in=['завершен гарантийный', 'одобрен']).count()
-    pending_orders = Order.objects.filter(transferred_to=master, status='передан на гарантию').count()
-    
-    # Финансовая статистика
-    total_earnings = TransactionLog.objects.filter(
-        user=master,
-        transaction_type='master_payment'
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-    return Response({
-        'master_id': master.id,
-        'master_email': master.email,
-        'total_orders': total_orders,
-        'completed_orders': completed_orders,
-        'pending_orders': pending_orders,
-        'completion_rate': round((completed_orders / total_orders * 100) if total_orders > 0 else 0, 2),
-        'total_earnings': float(total_earnings)
-    })
+    # Статистика заказов и заработка - одним запросом (api1/warranty_stats.py)
+    try:
+        date_from, date_to = parse_period(request.query_params)
+    except ValueError:
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    [stats] = warranty_master_stats([master.id], date_from, date_to)
+    return Response(stats)
 
 
 @api_view(['POST'])
@@ -61,21 +61,17 @@ def get_master_workload(request, master_id):
     
     # Add availability slots for master
     try:
-        from ..models import MasterAvailability
+        from ..availability import get_master_slots
         from datetime import date, timedelta
         
-        # Get availability for the next 7 days
+        # Get availability for the next 7 days (concrete slots, days off and weekly templates)
         today = date.today()
         end_date = today + timedelta(days=7)
         
-        availability_slots = MasterAvailability.objects.filter(
-            master=master,
-            date__gte=today,
-            date__lte=end_date
-        ).order_by('date', 'start_time')
+        availability_slots = get_master_slots(master, today, end_date)
         
         workload_data['availability_slots'] = [{
-            'id': slot.id,
+            'id': slot.availability_id,
             'date': slot.date.strftime('%Y-%m-%d'),
             'start_time': slot.start_time.strftime('%H:%M'),
             'end_time': slot.end_time.strftime('%H:%M')
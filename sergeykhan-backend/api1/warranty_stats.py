@@ -0,0 +1,121 @@
+"""
+Статистика гарантийных мастеров.
+
+Счётчики переданных заказов (всего, завершено, ожидает) считаются условными
+агрегатами по transferred_orders, заработок - подзапросом по TransactionLog,
+всё одним запросом сразу для всех гарантийных мастеров (или для выбранных).
+Период необязателен: заказы - по дате создания, заработок - по дате операции.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .analytics import period_bounds
+from .db_router import read_from_replica
+from .middleware import role_required
+from .models import CustomUser, TransactionLog
+
+WARRANTY_ROLE = 'warrant-master'
+# 'завершен гарантийным' ставят complete_warranty_order и complete_transferred_order
+WARRANTY_COMPLETED_STATUSES = ['завершен гарантийным', 'завершен гарантийный', 'одобрен']
+WARRANTY_PENDING_STATUS = 'передан на гарантию'
+LEADERBOARD_SORT_FIELDS = ['total_earnings', 'completed_orders', 'completion_rate', 'total_orders']
+
+
+def warranty_master_stats(master_ids=None, date_from=None, date_to=None):
+    """
+    Статистика гарантийных мастеров (всех или master_ids) за период [date_from, date_to]
+    (любая граница может отсутствовать), по мастеру на строку.
+    """
+    orders_in_period = Q()
+    earnings = TransactionLog.objects.filter(user=OuterRef('pk'), transaction_type='master_payment')
+    if date_from:
+        start, _ = period_bounds(date_from, date_from)
+        orders_in_period &= Q(transferred_orders__created_at__gte=start)
+        earnings = earnings.filter(created_at__gte=start)
+    if date_to:
+        _, end = period_bounds(date_to, date_to)
+        orders_in_period &= Q(transferred_orders__created_at__lt=end)
+        earnings = earnings.filter(created_at__lt=end)
+
+    masters = CustomUser.objects.filter(role=WARRANTY_ROLE)
+    if master_ids is not None:
+        masters = masters.filter(id__in=master_ids)
+    rows = masters.annotate(
+        total_orders=Count('transferred_orders', filter=orders_in_period),
+        completed_orders=Count('transferred_orders', filter=orders_in_period & Q(
+            transferred_orders__status__in=WARRANTY_COMPLETED_STATUSES
+        )),
+        pending_orders=Count('transferred_orders', filter=orders_in_period & Q(
+            transferred_orders__status=WARRANTY_PENDING_STATUS
+        )),
+        total_earnings=Coalesce(
+            Subquery(earnings.values('user').annotate(total=Sum('amount')).values('total')),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+    ).order_by('id').values('id', 'email', 'total_orders', 'completed_orders', 'pending_orders', 'total_earnings')
+
+    return [
+        {
+            'master_id': row['id'],
+            'master_email': row['email'],
+            'total_orders': row['total_orders'],
+            'completed_orders': row['completed_orders'],
+            'pending_orders': row['pending_orders'],
+            'completion_rate': round(
+                (row['completed_orders'] / row['total_orders'] * 100) if row['total_orders'] > 0 else 0, 2
+            ),
+            'total_earnings': float(row['total_earnings']),
+        }
+        for row in rows
+    ]
+
+
+def parse_period(params):
+    """?date_from=&date_to=YYYY-MM-DD -> (date или None, date или None); ValueError при неверном формате"""
+    return tuple(
+        datetime.strptime(params[key], '%Y-%m-%d').date() if params.get(key) else None
+        for key in ('date_from', 'date_to')
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@role_required(['super-admin', 'curator'])
+@read_from_replica
+def get_warranty_leaderboard(request):
+    """
+    Статистика всех гарантийных мастеров одним запросом, места по ?sort=
+    (total_earnings по умолчанию, completed_orders, completion_rate, total_orders).
+    ?date_from=&date_to=YYYY-MM-DD - период.
+    """
+    try:
+        date_from, date_to = parse_period(request.query_params)
+    except ValueError:
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if date_from and date_to and date_to < date_from:
+        return Response({'error': 'date_to is earlier than date_from'}, status=status.HTTP_400_BAD_REQUEST)
+    sort = request.query_params.get('sort', 'total_earnings')
+    if sort not in LEADERBOARD_SORT_FIELDS:
+        return Response({'error': f'sort must be one of: {", ".join(LEADERBOARD_SORT_FIELDS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    stats = sorted(warranty_master_stats(date_from=date_from, date_to=date_to),
+                   key=lambda row: (-row[sort], row['master_id']))
+    for rank, row in enumerate(stats, start=1):
+        row['rank'] = rank
+    return Response({
+        'date_from': date_from,
+        'date_to': date_to,
+        'sort': sort,
+        'masters': stats,
+    })
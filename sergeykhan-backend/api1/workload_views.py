@@ -6,12 +6,16 @@ from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from collections import defaultdict
+import logging
 
 from .models import CustomUser, Order
 
+logger = logging.getLogger(__name__)
+
 
 @api_view(['GET'])
 @authentication_classes([TokenAuthentication])
@@ -94,18 +98,15 @@ def get_all_masters_workload(request):
     """
     Получить информацию о нагрузке всех мастеров
     """
+    # Активные заказы всех мастеров - одним запросом
     masters = CustomUser.objects.filter(
         role__in=['master', 'garant-master', 'warrant-master'], 
         is_active=True
-    )
+    ).annotate(active_orders=Count('orders', filter=Q(orders__status__in=['назначен', 'выполняется'])))
     workload_data = []
     
     for master in masters:
-        # Подсчитываем активные заказы
-        assigned_orders = Order.objects.filter(
-            assigned_master=master,
-            status__in=['назначен', 'выполняется']
-        ).count()
+        assigned_orders = master.active_orders
         
         # Получаем настройки мастера
         max_orders_per_day = getattr(master, 'max_orders_per_day', 8)
@@ -210,23 +211,14 @@ def assign_order_with_workload_check(request, order_id):
     from .models import OrderSlot, MasterDailySchedule
     from datetime import date
     
-    print(f"🎯 assign_order_with_workload_check: order_id={order_id}")
-    print(f"   request.user: {request.user} (ID: {request.user.id if request.user.is_authenticated else 'не авторизован'})")
-    print(f"   request.data: {request.data}")
-    
     try:
         order = Order.objects.get(id=order_id)
-        print(f"   ✅ Заказ найден: {order.client_name} (статус: {order.status})")
     except Order.DoesNotExist:
-        print("   ❌ Заказ не найден")
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
     
     master_id = request.data.get('master_id')
     slot_date_str = request.data.get('slot_date')  # Опциональная дата слота
     
-    print(f"   master_id из запроса: {master_id}")
-    print(f"   slot_date из запроса: {slot_date_str}")
-    
     if not master_id:
         return Response({'error': 'master_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
@@ -235,9 +227,7 @@ def assign_order_with_workload_check(request, order_id):
             id=master_id, 
             role__in=['master', 'garant-master', 'warrant-master']
         )
-        print(f"   ✅ Мастер найден: {master.get_full_name() if hasattr(master, 'get_full_name') else master.email} (ID: {master.id})")
     except CustomUser.DoesNotExist:
-        print(f"   ❌ Мастер с ID {master_id} не найден")
         return Response({'error': 'Master not found'}, status=status.HTTP_404_NOT_FOUND)
     
     # Определяем дату для слота
@@ -250,18 +240,13 @@ def assign_order_with_workload_check(request, order_id):
     else:
         slot_date = date.today()
     
-    print(f"   📅 Дата слота: {slot_date}")
-    
     # Получаем расписание дня мастера
     daily_schedule = MasterDailySchedule.get_or_create_for_master_date(master, slot_date)
-    print(f"   � Расписание дня: {daily_schedule.max_slots} слотов")
     
     # Проверяем доступность слотов
     available_slots = OrderSlot.get_available_slots_for_master(master, slot_date)
-    print(f"   🆓 Доступные слоты: {available_slots}")
     
     if not available_slots:
-        print(f"   ❌ Нет свободных слотов на {slot_date}!")
         return Response({
             'error': f'У мастера нет свободных слотов на {slot_date}',
             'available_slots': available_slots,
@@ -270,7 +255,6 @@ def assign_order_with_workload_check(request, order_id):
     
     # Проверяем, что заказ еще не назначен на слот
     if hasattr(order, 'slot') and order.slot:
-        print(f"   ⚠️ Заказ уже назначен на слот {order.slot.slot_number}")
         return Response({
             'error': f'Order is already assigned to slot {order.slot.slot_number}',
             'existing_slot': {
@@ -280,36 +264,27 @@ def assign_order_with_workload_check(request, order_id):
             }
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Берем первый доступный слот
-    slot_number = available_slots[0]
-    print(f"   🎯 Назначаем на слот номер: {slot_number}")
-    
-    # Вычисляем время слота
-    from datetime import datetime, timedelta
-    start_datetime = datetime.combine(slot_date, daily_schedule.work_start_time)
-    slot_datetime = start_datetime + (daily_schedule.slot_duration * (slot_number - 1))
-    slot_time = slot_datetime.time()
-    
-    print(f"   ⏰ Время слота: {slot_time}")
-    
     try:
-        # Создаем слот и назначаем заказ в транзакции
+        # Занимаем первый свободный слот и назначаем заказ в одной транзакции;
+        # если слот успели занять параллельно, берётся следующий свободный
         from django.db import transaction
+        from .slot_reservation import reserve_slot, SlotUnavailable
         with transaction.atomic():
-            order_slot = OrderSlot.create_slot_for_order(
-                order=order,
-                master=master,
-                slot_date=slot_date,
-                slot_number=slot_number,
-                slot_time=slot_time
-            )
+            try:
+                order_slot = reserve_slot(order, master, slot_date, available_slots)
+            except SlotUnavailable as e:
+                return Response({
+                    'error': str(e),
+                    'max_slots': daily_schedule.max_slots
+                }, status=status.HTTP_400_BAD_REQUEST)
+            slot_number = order_slot.slot_number
             
             # Обновляем статус заказа
             order.assigned_master = master
             order.status = 'назначен'
             order.save()
             
-        print(f"   ✅ Заказ #{order.id} назначен мастеру {master.get_full_name() if hasattr(master, 'get_full_name') else master.email} на слот {slot_number}")
+        logger.info('Order %s assigned to master %s, slot %s on %s', order.id, master.id, slot_number, slot_date)
         
         # Подсчитываем оставшиеся слоты
         remaining_slots = len(OrderSlot.get_available_slots_for_master(master, slot_date))
@@ -329,5 +304,5 @@ def assign_order_with_workload_check(request, order_id):
         })
         
     except Exception as e:
-        print(f"   ❌ Ошибка при создании слота: {str(e)}")
+        logger.exception('Order %s: failed to assign slot', order.id)
         return Response({'error': f'Failed to create slot: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,6 @@
+"""
+Бенчмарки основных эндпоинтов и доменных функций.
+
+Запуск: python manage.py run_benchmarks --output bench.json
+Сравнение с базовой линией: python manage.py run_benchmarks --compare bench.json
+"""
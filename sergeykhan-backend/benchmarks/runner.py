@@ -0,0 +1,140 @@
+"""
+Замер времени сценариев, статистика и сравнение с базовой линией
+"""
+import contextlib
+import io
+import json
+import math
+import platform
+import time
+
+import django
+from django.db import connection
+from django.utils import timezone
+
+
+SCENARIOS = {}
+
+
+def scenario(name, vendors=None):
+    """
+    Регистрирует сценарий бенчмарка.
+
+    Сценарий получает контекст и число итераций, готовит данные (не замеряется)
+    и возвращает функцию без аргументов, время вызова которой замеряется.
+    Если у функции есть атрибут close, он вызывается после замера.
+    vendors - базы, на которых сценарий имеет смысл (например, только PostgreSQL).
+    """
+    def decorator(func):
+        func.vendors = vendors
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(timings):
+    """Статистика по списку длительностей в секундах"""
+    ordered = sorted(timings)
+    total = sum(ordered)
+    return {
+        'iterations': len(ordered),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'mean_ms': round(total / len(ordered) * 1000, 3) if ordered else 0.0,
+        'min_ms': round(ordered[0] * 1000, 3) if ordered else 0.0,
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        'throughput_per_s': round(len(ordered) / total, 2) if total else 0.0,
+    }
+
+
+def run_scenario(func, context, iterations, warmup=0):
+    """Готовит сценарий и замеряет `iterations` вызовов после прогрева"""
+    run = func(context, iterations + warmup)
+    # Отладочные print() во вьюхах не должны попадать в замер и вывод
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(warmup):
+                run()
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+    finally:
+        # Сценарий может держать ресурсы (потоки, соединения) до конца замера
+        close = getattr(run, 'close', None)
+        if close:
+            close()
+    return summarize(timings)
+
+
+def run_all(context, names, iterations, warmup=0, progress=None, skipped=None):
+    results = {}
+    for name in names:
+        func = SCENARIOS[name]
+        if func.vendors and connection.vendor not in func.vendors:
+            if skipped:
+                skipped(name, func.vendors)
+            continue
+        if progress:
+            progress(name)
+        results[name] = run_scenario(func, context, iterations, warmup)
+    return results
+
+
+def build_report(results, **meta):
+    return {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            **meta,
+        },
+        'results': results,
+    }
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+def compare_reports(baseline, current, threshold=0.2):
+    """
+    Сравнивает p50/p95 с базовой линией.
+
+    Возвращает список строк сравнения; регрессия - рост метрики больше чем на threshold.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            rows.append({'scenario': name, 'metric': None, 'regression': False})
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            before = base.get(metric) or 0.0
+            after = result[metric]
+            change = (after - before) / before if before else 0.0
+            rows.append({
+                'scenario': name,
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change': round(change, 4),
+                'regression': change > threshold,
+            })
+    return rows
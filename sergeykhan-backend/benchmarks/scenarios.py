@@ -0,0 +1,303 @@
+"""
+Сценарии бенчмарков.
+
+Эндпоинты вызываются через тестовый клиент Django, то есть с аутентификацией,
+сериализацией и middleware - так же, как их видит фронтенд.
+"""
+import itertools
+import queue
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from api1.distancionka import check_distance_level
+from api1.models import MasterAvailability, Order, OrderCompletion
+
+from .runner import scenario
+
+
+def auth(context, role):
+    return {'HTTP_AUTHORIZATION': f"Token {context['tokens'][role].key}"}
+
+
+def expect(response, status_code):
+    if response.status_code != status_code:
+        raise AssertionError(
+            f'{response.request["PATH_INFO"]}: {response.status_code} != {status_code}: '
+            f'{response.content[:300]!r}'
+        )
+
+
+def make_orders(count, status, **fields):
+    """Заказы-заготовки для сценариев, которые меняют состояние"""
+    return Order.objects.bulk_create([
+        Order(
+            client_name=f'Бенчмарк {i}',
+            client_phone=f'+7701{i:07d}',
+            description='Ремонт стиральной машины',
+            street='Абая',
+            house_number='10',
+            status=status,
+            **fields
+        )
+        for i in range(count)
+    ])
+
+
+@scenario('create_order')
+def create_order(context, iterations):
+    client = context['client']
+    url = reverse('create_order')
+    payload = {
+        'client_name': 'Бенчмарк',
+        'client_phone': '+77010000000',
+        'description': 'Ремонт холодильника',
+        'street': 'Абая',
+        'house_number': '10',
+        'apartment': '5',
+        'estimated_cost': '25000.00',
+    }
+
+    def run():
+        expect(client.post(url, payload, content_type='application/json'), 201)
+    return run
+
+
+def free_slots(count):
+    """(мастер, дата, время) из расписания, на которые ещё нет заказов"""
+    today = timezone.now().date()
+    booked = set(
+        Order.objects.filter(scheduled_date__gte=today, assigned_master__isnull=False)
+        .values_list('assigned_master_id', 'scheduled_date', 'scheduled_time')
+    )
+    free = (
+        (slot.master_id, slot.date, slot.start_time)
+        for slot in MasterAvailability.objects.filter(
+            date__gte=today, master__role='master'
+        ).order_by('date', 'start_time', 'master_id').iterator()
+        if (slot.master_id, slot.date, slot.start_time) not in booked
+    )
+    plan = list(itertools.islice(free, count))
+    if len(plan) < count:
+        raise AssertionError(f'Not enough free slots: {len(plan)} < {count}')
+    return plan
+
+
+def assign_request(client, headers, order, master_id, slot_date, slot_time):
+    return client.patch(
+        reverse('assign', args=[order.id]),
+        {
+            'assigned_master': master_id,
+            'scheduled_date': slot_date.strftime('%Y-%m-%d'),
+            'scheduled_time': slot_time.strftime('%H:%M:%S'),
+        },
+        content_type='application/json',
+        **headers
+    )
+
+
+@scenario('assign_master')
+def assign_master(context, iterations):
+    client = context['client']
+    headers = auth(context, 'curator')
+    plan = free_slots(iterations)
+    orders = make_orders(iterations, 'в обработке')
+    jobs = iter(zip(orders, plan))
+
+    def run():
+        order, (master_id, slot_date, slot_time) = next(jobs)
+        expect(assign_request(client, headers, order, master_id, slot_date, slot_time), 200)
+    return run
+
+
+CONCURRENT_ASSIGNERS = 50
+CONTENDED_SLOTS = 10
+
+
+@scenario('assign_master_concurrent', vendors=('postgresql',))
+def assign_master_concurrent(context, iterations):
+    """
+    Волна из 50 параллельных назначений на 10 слотов (по 5 претендентов на слот).
+
+    Назначают 50 постоянных потоков со своими соединениями, как воркеры сервера.
+    Одна итерация - вся волна, то есть 50 запросов. Проверяется, что каждый слот
+    достался ровно одному заказу, а остальные получили 400, а не 500.
+    """
+    headers = auth(context, 'curator')
+    plan = free_slots(iterations * CONTENDED_SLOTS)
+    orders = make_orders(iterations * CONCURRENT_ASSIGNERS, 'в обработке')
+    waves = iter(range(iterations))
+    results = queue.Queue()
+
+    def worker(jobs):
+        client = Client()
+        try:
+            for order, (master_id, slot_date, slot_time) in iter(jobs.get, None):
+                response = assign_request(client, headers, order, master_id, slot_date, slot_time)
+                results.put(response.status_code)
+        finally:
+            connections.close_all()
+
+    inboxes = [queue.Queue() for _ in range(CONCURRENT_ASSIGNERS)]
+    workers = [threading.Thread(target=worker, args=(inbox,), daemon=True) for inbox in inboxes]
+    for thread in workers:
+        thread.start()
+
+    def run():
+        wave = next(waves)
+        targets = plan[wave * CONTENDED_SLOTS:(wave + 1) * CONTENDED_SLOTS]
+        wave_orders = orders[wave * CONCURRENT_ASSIGNERS:(wave + 1) * CONCURRENT_ASSIGNERS]
+        for inbox, job in zip(inboxes, zip(wave_orders, itertools.cycle(targets))):
+            inbox.put(job)
+        statuses = [results.get() for _ in wave_orders]
+
+        if sorted(set(statuses)) != [200, 400] or statuses.count(200) != CONTENDED_SLOTS:
+            raise AssertionError(f'Expected {CONTENDED_SLOTS} assignments, got statuses {sorted(statuses)}')
+        booked = Order.objects.filter(id__in=[order.id for order in wave_orders], status='назначен').count()
+        if booked != CONTENDED_SLOTS:
+            raise AssertionError(f'{booked} orders assigned to {CONTENDED_SLOTS} slots')
+
+    def close():
+        for inbox in inboxes:
+            inbox.put(None)
+        for thread in workers:
+            thread.join()
+
+    run.close = close
+    return run
+
+
+@scenario('get_master_available_orders_with_distance')
+def master_available_orders_with_distance(context, iterations):
+    client = context['client']
+    url = reverse('get_master_available_orders_with_distance')
+    headers = auth(context, 'master')
+
+    def run():
+        expect(client.get(url, **headers), 200)
+    return run
+
+
+@scenario('review_completion')
+def review_completion(context, iterations):
+    """Одобрение завершения с распределением средств"""
+    client = context['client']
+    headers = auth(context, 'curator')
+    masters = itertools.cycle(context['dataset']['masters'])
+    orders = make_orders(iterations, 'ожидает_подтверждения', final_cost=Decimal('60000'))
+    completions = []
+    for order in orders:
+        master = next(masters)
+        Order.objects.filter(id=order.id).update(assigned_master=master)
+        completions.append(OrderCompletion.objects.create(
+            order=order,
+            master=master,
+            work_description='Замена подшипника',
+            parts_expenses=Decimal('5000'),
+            transport_costs=Decimal('1000'),
+            total_received=Decimal('60000'),
+            completion_date=timezone.now() - timedelta(hours=1),
+        ))
+    pending = iter(completions)
+
+    def run():
+        completion = next(pending)
+        response = client.post(
+            reverse('review_completion', args=[completion.id]),
+            {'action': 'approve'},
+            content_type='application/json',
+            **headers
+        )
+        expect(response, 200)
+    return run
+
+
+@scenario('get_all_masters_slots_summary')
+def all_masters_slots_summary(context, iterations):
+    client = context['client']
+    url = reverse('get_all_masters_slots_summary')
+    headers = auth(context, 'admin')
+
+    def run():
+        expect(client.get(url, **headers), 200)
+    return run
+
+
+@scenario('get_capacity_analysis')
+def capacity_analysis(context, iterations):
+    client = context['client']
+    url = reverse('get_capacity_analysis')
+    headers = auth(context, 'admin')
+
+    def run():
+        expect(client.get(url, **headers), 200)
+    return run
+
+
+@scenario('check_distance_level')
+def distance_level(context, iterations):
+    masters = itertools.cycle([master.id for master in context['dataset']['masters']])
+
+    def run():
+        check_distance_level(next(masters))
+    return run
+
+
+@scenario('request_new_connection')
+def request_new_connection(context, iterations):
+    """Лёгкий запрос, когда соединение открывается заново (CONN_MAX_AGE=0 без пула)"""
+    client = context['client']
+    url = reverse('get_user_by_token')
+    headers = auth(context, 'master')
+
+    def run():
+        # На in-memory SQLite close() ничего не делает - разница видна на PostgreSQL
+        connection.close()
+        expect(client.get(url, **headers), 200)
+    return run
+
+
+@scenario('request_persistent_connection')
+def request_persistent_connection(context, iterations):
+    """Тот же запрос с переиспользованием открытого соединения (CONN_MAX_AGE>0 или пул)"""
+    client = context['client']
+    url = reverse('get_user_by_token')
+    headers = auth(context, 'master')
+
+    def run():
+        expect(client.get(url, **headers), 200)
+    return run
+
+
+@scenario('analytics_dashboard')
+def analytics_dashboard(context, iterations):
+    """Аналитика за год без кэша: все три раздела считаются заново"""
+    client = context['client']
+    headers = auth(context, 'admin')
+    date_to = timezone.localdate()
+    url = f"{reverse('get_analytics_dashboard')}?from={date_to - timedelta(days=365)}&to={date_to}"
+
+    def run():
+        cache.clear()
+        expect(client.get(url, **headers), 200)
+    return run
+
+
+@scenario('distance_simulation')
+def distance_simulation(context, iterations):
+    """Симуляция пяти наборов порогов дистанционки по всем мастерам"""
+    client = context['client']
+    headers = auth(context, 'admin')
+    url = reverse('simulate_distance_settings')
+    payload = {'candidates': [{'averageCheckThreshold': 20000 * step, 'netTurnoverThreshold': 500000 * step}
+                              for step in range(1, 6)]}
+
+    def run():
+        expect(client.post(url, payload, content_type='application/json', **headers), 200)
+    return run
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_settings.settings')
+# settings.py включает режим соединений для ASGI (пул вместо постоянных соединений)
+os.environ.setdefault('DJANGO_ASGI', 'True')
 
 application = get_asgi_application()
@@ -11,9 +11,11 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 import dj_database_url
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -85,6 +87,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api1.db_router.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'project_settings.urls'
@@ -119,10 +122,66 @@ DATABASES = {
     }
 }
 
+# Соединения с базой:
+# DB_CONN_MAX_AGE - сколько секунд держать соединение между запросами (0 - новое на каждый запрос)
+# DB_CONN_HEALTH_CHECKS - проверять постоянное соединение перед переиспользованием
+# DB_POOL - нативный пул psycopg (Django 5.1+, PostgreSQL, нужен пакет psycopg[pool])
+# Под ASGI постоянные соединения не переиспользуются, поэтому там по умолчанию пул
+# (если установлен psycopg_pool), а без него - соединение на запрос.
+RUNNING_ASGI = config('DJANGO_ASGI', default=False, cast=bool)
+DB_POOL_AVAILABLE = importlib.util.find_spec('psycopg_pool') is not None
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+DB_POOL = config('DB_POOL', default=RUNNING_ASGI and DB_POOL_AVAILABLE, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)
+
 # Use PostgreSQL on Railway if DATABASE_URL is provided
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
-    DATABASES['default'] = dj_database_url.parse(DATABASE_URL)
+    DATABASES['default'] = dj_database_url.parse(
+        DATABASE_URL,
+        conn_max_age=0 if RUNNING_ASGI else DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+    if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        if not DB_POOL_AVAILABLE:
+            raise ImproperlyConfigured('DB_POOL=True requires the psycopg[pool] package')
+        # Пул сам управляет соединениями, CONN_MAX_AGE с ним должен быть 0
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+
+# Реплика для тяжёлых отчётов (вьюхи с @read_from_replica), запись всегда в default.
+# DB_REPLICA_STICKY_SECONDS - сколько после своей записи пользователь читает из default;
+# при нескольких воркерах закрепление хранится в кэше, поэтому нужен общий CACHES.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=15, cast=int)
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=0 if RUNNING_ASGI else DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+    # В тестах реплика - та же база, что и default
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api1.db_router.ReplicaRouter']
+
+# Сколько секунд хранить готовый ответ расписания мастера; кэш сбрасывается при
+# любом изменении его доступности, слотов или заказов (см. api1/schedule_cache.py)
+SCHEDULE_CACHE_SECONDS = config('SCHEDULE_CACHE_SECONDS', default=600, cast=int)
+
+# Сколько секунд хранить посчитанные разделы аналитики (api1/analytics.py)
+ANALYTICS_CACHE_SECONDS = config('ANALYTICS_CACHE_SECONDS', default=300, cast=int)
+
+# Вне HTTP-запросов (команды, воркеры) резолвер настроек прибыли сверяется с базой
+# не чаще раза в N секунд (api1/profit_settings.py); 0 - при каждом обращении
+PROFIT_SETTINGS_RECHECK_SECONDS = config('PROFIT_SETTINGS_RECHECK_SECONDS', default=0, cast=int)
 
 
 # REST framework configuration
@@ -232,6 +291,18 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Фоновая очередь задач (api1/jobs.py, manage.py run_workers)
+# JOB_WORKERS - потоков в процессе воркера; JOB_LOCK_TIMEOUT - через сколько секунд
+# задача упавшего воркера снова выдаётся; JOBS_RUN_INLINE - выполнять задачи сразу
+# после commit в процессе веб-сервера (без отдельного воркера)
+JOB_WORKERS = config('JOB_WORKERS', default=2, cast=int)
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=600, cast=int)
+JOBS_RUN_INLINE = config('JOBS_RUN_INLINE', default=False, cast=bool)
+
+# Завершённые и отклонённые заказы старше стольких дней ночная задача orders.archive
+# переносит в архив (api1/order_archive.py); 0 - не архивировать
+ORDER_ARCHIVE_DAYS = config('ORDER_ARCHIVE_DAYS', default=365, cast=int)
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB